@@ -0,0 +1,84 @@
+"""
+Concurrent kline fetches over the async engine.
+
+A job that needs many (symbol, month) ranges issues all of its queries at once,
+bounded by the connection pool, instead of one round trip after another:
+
+    frames = load_ranges([(s, m) for s in symbols for m in months])
+
+Works against any DATABASE_URL with an async driver (asyncpg for PostgreSQL,
+aiosqlite for a local SQLite file).
+"""
+import asyncio
+import time
+import pandas as pd
+from loguru import logger
+from sqlalchemy.sql import text
+from connection import DB_POOL_SIZE, DB_MAX_OVERFLOW, get_async_engine
+from trading_algorithm import kline_query, month_bounds, resample_klines
+
+
+async def fetch_klines(symbol, start_open_time=None, end_close_time=None, timeframe=None, engine=None):
+    """Async counterpart of TradingSystem.fetch_data_from_db for one range."""
+    engine = engine or get_async_engine()
+    query, params = kline_query(symbol, start_open_time, end_close_time)
+    async with engine.connect() as connection:
+        result = await connection.execute(text(query), params)
+        df = pd.DataFrame(result.fetchall(), columns=list(result.keys()))
+    # SQLite hands DATETIME columns back as text
+    df['open_time'] = pd.to_datetime(df['open_time'])
+    df['close_time'] = pd.to_datetime(df['close_time'])
+    if timeframe and not df.empty:
+        return resample_klines(df, timeframe)
+    return df
+
+
+def _bounds(key):
+    """(symbol, month) or (symbol, start, end) -> (symbol, start_open_time, end_close_time)."""
+    if len(key) == 2:
+        symbol, month = key
+        return (symbol, *month_bounds(month))
+    symbol, start, end = key
+    return symbol, start, end
+
+
+async def fetch_ranges(ranges, timeframe=None, max_concurrency=None, engine=None):
+    """
+    Fetch every range of `ranges` concurrently and return {range: DataFrame}.
+
+    Ranges are (symbol, "YYYY-MM") or (symbol, start, end) tuples. At most
+    `max_concurrency` queries are in flight (the pool size plus overflow by
+    default), so a large job queues on a semaphore rather than on pool timeouts.
+    """
+    engine = engine or get_async_engine()
+    limit = asyncio.Semaphore(max_concurrency or DB_POOL_SIZE + DB_MAX_OVERFLOW)
+
+    async def fetch(key):
+        async with limit:
+            return await fetch_klines(*_bounds(key), timeframe=timeframe, engine=engine)
+
+    started = time.perf_counter()
+    frames = await asyncio.gather(*(fetch(key) for key in ranges))
+    logger.info(f"Fetched {len(ranges)} ranges ({sum(len(f) for f in frames)} rows) "
+                f"in {time.perf_counter() - started:.2f}s")
+    return dict(zip(ranges, frames))
+
+
+def load_ranges(ranges, timeframe=None, max_concurrency=None):
+    """Blocking wrapper of fetch_ranges for synchronous callers."""
+    async def run():
+        try:
+            return await fetch_ranges(ranges, timeframe, max_concurrency)
+        finally:
+            # Connections belong to this event loop; close them before it ends
+            await get_async_engine().dispose()
+
+    return asyncio.run(run())
+
+
+if __name__ == "__main__":
+    symbols = ["kline_btc", "kline_eth", "kline_bnb", "kline_ada", "kline_dot"]
+    months = [f"2024-{m:02d}" for m in range(1, 13)]
+    frames = load_ranges([(s, m) for s in symbols for m in months])
+    for key, frame in frames.items():
+        print(key, len(frame))
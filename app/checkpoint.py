@@ -0,0 +1,108 @@
+import hashlib
+import json
+import os
+import pickle
+import time
+import zlib
+from loguru import logger
+
+
+def save_checkpoint(path, state, level=1):
+    """
+    Write `state` as a zlib-compressed pickle, atomically: the previous checkpoint
+    stays intact until the new one is completely on disk.
+    """
+    blob = zlib.compress(pickle.dumps(state, protocol=pickle.HIGHEST_PROTOCOL), level)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as file:
+        file.write(blob)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(tmp_path, path)
+    return len(blob)
+
+
+def load_checkpoint(path):
+    """Return the state saved at `path`, or None if there is no checkpoint."""
+    try:
+        with open(path, "rb") as file:
+            return pickle.loads(zlib.decompress(file.read()))
+    except FileNotFoundError:
+        return None
+
+
+class Checkpointer:
+    """
+    Periodic checkpoints of a long run, at most one every `every_seconds`.
+
+    Keeps count of the checkpoints written, their size and the time spent writing
+    them, so the overhead can be compared with the run time and tuned.
+    """
+
+    def __init__(self, path, every_seconds=60.0, level=1):
+        self.path = path
+        self.every_seconds = every_seconds
+        self.level = level
+        self.saves = 0
+        self.bytes = 0
+        self.seconds = 0.0
+        self.last_save = time.perf_counter()
+
+    def due(self):
+        return time.perf_counter() - self.last_save >= self.every_seconds
+
+    def save(self, state):
+        started = time.perf_counter()
+        self.bytes = save_checkpoint(self.path, state, self.level)
+        self.last_save = time.perf_counter()
+        self.seconds += self.last_save - started
+        self.saves += 1
+
+    def load(self):
+        return load_checkpoint(self.path)
+
+    def stats(self):
+        return {"saves": self.saves, "last_bytes": self.bytes, "seconds": self.seconds}
+
+
+def task_key(task):
+    """Stable key of a sweep task (any JSON-serializable description of it)."""
+    return hashlib.sha256(json.dumps(task, sort_keys=True, default=str).encode()).hexdigest()
+
+
+class CompletedJournal:
+    """
+    Append-only JSONL journal of finished sweep tasks.
+
+    Each line holds a task key and its result. A restarted sweep looks keys up
+    here and only runs the tasks that are missing; a line torn by a crash is ignored.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.results = {}
+        if os.path.exists(path):
+            with open(path) as file:
+                lines = file.read().split("\n")
+            for line in lines:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                self.results[entry["key"]] = entry["result"]
+            if lines[-1]:
+                # Torn last line: start the next record on a fresh line
+                with open(path, "a") as file:
+                    file.write("\n")
+            logger.info(f"{len(self.results)} completed tasks found in {path}")
+
+    def __contains__(self, key):
+        return key in self.results
+
+    def get(self, key):
+        return self.results.get(key)
+
+    def record(self, key, result):
+        self.results[key] = result
+        with open(self.path, "a") as file:
+            file.write(json.dumps({"key": key, "result": result}, default=str) + "\n")
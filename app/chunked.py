@@ -0,0 +1,243 @@
+import math
+import time
+import numpy as np
+import pandas as pd
+from pandas.tseries.frequencies import to_offset
+from loguru import logger
+from checkpoint import Checkpointer
+from trade_log import TradeLogWriter
+from indicators import Strategy
+from metrics import MetricsAccumulator
+from trading_algorithm import TradingSystem, kline_chunks, resample_klines
+
+KLINE_COLUMNS = ['open_time', 'close_time', 'open_price', 'high_price', 'low_price', 'close_price', 'volume']
+
+
+def ewm_warmup(length, tolerance):
+    """Rows after which the weight of older values in an RMA of `length` falls below `tolerance`."""
+    return math.ceil(math.log(tolerance) / math.log(1 - 1 / length))
+
+
+def warmup_rows(rsi_length=14, sma_short_length=50, sma_long_length=200, atr_length=14,
+                support_resistance_window=10, tolerance=1e-12):
+    """
+    History a chunk needs in front of it so its indicators match a run over the
+    whole range: the longest rolling window, or the rows after which RSI/ATR
+    (recursive averages over all past bars) differ by less than `tolerance`.
+    """
+    return 1 + max(
+        sma_short_length,
+        sma_long_length,
+        support_resistance_window,
+        ewm_warmup(rsi_length, tolerance),
+        ewm_warmup(atr_length, tolerance),
+    )
+
+
+class ChunkedTradingSystem(TradingSystem):
+    """
+    TradingSystem over an arbitrary start/end range, read `chunk_rows` klines at a
+    time.
+
+    Every chunk is prefixed with the last warm-up bars of the previous one before
+    the indicators are computed, then only its own bars go through process_bar,
+    so balance and open cycles carry across chunk boundaries and memory is bounded
+    by chunk_rows + warm-up; the metrics are accumulated chunk by chunk
+    (metrics.MetricsAccumulator) rather than from every bar at the end. Trades
+    are the same as in a single in-memory run; RSI/ATR differ from it by less than
+    `warmup_tolerance`, so P&L agrees up to float rounding. With a
+    `timeframe`, the 1m rows of a bucket split by a chunk boundary wait for the
+    next chunk; the timeframe should divide a day so every chunk uses the same
+    bucket grid.
+
+    With `checkpoint_path`, the run state is saved there at most every
+    `checkpoint_every` seconds and at the end, and a new run with the same
+    parameters continues from it instead of starting over (a run that starts over
+    clears the trade log of its run_id first). The checkpoint holds the
+    metric sums, not the trades or bars already simulated: after a resume,
+    trade_cycles only lists the trades of this call (all of them are in the trade
+    log), while calculate_metrics() covers the whole run.
+    """
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.chunk_rows = kwargs.get('chunk_rows', 100_000)
+        # Only the indicator lengths size the warm-up, not e.g. the backend
+        self.warmup = kwargs.get('warmup') or warmup_rows(
+            **Strategy(None, **self.strategy_params).params(), tolerance=kwargs.get('warmup_tolerance', 1e-12)
+        )
+        # Whether a last bucket cut short by the end of the data becomes a bar; when
+        # False it waits for the rest of its 1m rows (see refresh.py)
+        self.partial_last_bar = kwargs.get('partial_last_bar', True)
+        self.chunks = 0
+        self.bars_read = 0  # Bars simulated by this call, not counting resumed ones
+        # Position in the range, enough to continue the run from here
+        self.cursor = None       # open_time of the last 1m kline read
+        self.history = None      # Warm-up bars in front of the next chunk
+        self.leftover = None     # 1m rows of a bucket not complete yet
+        self.metrics = MetricsAccumulator(self.initial_investment)  # Metrics of every bar simulated so far
+        self.skip_first = True   # The in-memory loop starts at the second prepared bar
+        # Periodic snapshots of that state; pass checkpoint_path to enable them
+        checkpoint_path = kwargs.get('checkpoint_path')
+        self.checkpointer = None
+        if checkpoint_path:
+            self.checkpointer = Checkpointer(checkpoint_path, every_seconds=kwargs.get('checkpoint_every', 60.0))
+
+    def iter_bars(self):
+        """Yield the bars of the range chunk by chunk, resampled when a timeframe is set."""
+        start_open_time, end_close_time = self.time_bounds()
+        if self.cursor is not None:
+            start_open_time = self.cursor + pd.Timedelta(microseconds=1)
+        for chunk in kline_chunks(self.symbol, start_open_time, end_close_time, self.chunk_rows):
+            if chunk.empty:
+                continue
+            chunk = chunk[KLINE_COLUMNS]
+            self.cursor = chunk['open_time'].iloc[-1]
+            if not self.timeframe:
+                yield chunk
+                continue
+            if self.leftover is not None:
+                chunk = pd.concat([self.leftover, chunk], ignore_index=True)
+            bars = resample_klines(chunk, self.timeframe)
+            # The last bucket may continue in the next chunk
+            self.leftover = chunk[chunk['open_time'] >= bars['open_time'].iloc[-1]]
+            yield bars.iloc[:-1]
+        if self.leftover is not None and not self.leftover.empty:
+            bars = resample_klines(self.leftover, self.timeframe)
+            if self.partial_last_bar or self.bucket_complete(bars, self.leftover):
+                self.leftover = None
+                yield bars
+
+    def bucket_complete(self, bars, rows):
+        """Whether the 1m `rows` of the single bucket in `bars` cover the whole bucket."""
+        bucket_end = bars['open_time'].iloc[0] + to_offset(self.timeframe)
+        return rows['close_time'].iloc[-1] + pd.Timedelta(milliseconds=1) >= bucket_end
+
+    def process_chunk(self, bars):
+        """Compute the indicators of a chunk behind its warm-up and run its bars."""
+        if bars.empty:
+            return
+        self.chunks += 1
+        self.bars_read += len(bars)
+        frame = bars if self.history is None else pd.concat([self.history, bars], ignore_index=True)
+        self.history = frame.iloc[-self.warmup:]
+
+        data = Strategy(frame.copy(), **self.strategy_params).get_decision()
+        data = data[data['open_time'] >= bars['open_time'].iloc[0]]
+        if 'Signal' not in data:
+            data = data.assign(Signal=np.nan, type=None)
+        if data.empty:
+            return
+
+        closed_before = len(self.trade_cycles)
+        for i in range(1 if self.skip_first else 0, len(data)):
+            self.process_bar(data.iloc[i])
+        self.skip_first = False
+        self.metrics.update(data['close_time'], self.trade_cycles[closed_before:], self.open_positions())
+        logger.info(f"Chunk {self.chunks} up to {bars['close_time'].iloc[-1]}: balance {self.current_balance:.2f}")
+
+    def config(self):
+        """Parameters a checkpoint must have been taken with to be resumed by this run."""
+        return {
+            "symbol": self.symbol, "month": self.month, "start": str(self.start), "end": str(self.end),
+            "timeframe": self.timeframe, "partial_last_bar": self.partial_last_bar,
+            "strategy_params": self.strategy_params,
+            "target_profit": self.target_profit, "stoploss": self.stoploss, "fees": self.fees,
+            "leverage": self.leverage, "initial_investment": self.initial_investment,
+            "state_format": 2,  # Checkpoints hold metric sums instead of trades and bar times
+        }
+
+    def snapshot(self):
+        """Everything needed to continue the run: balance, books, indicator warm-up and cursor."""
+        return {
+            "config": self.config(),
+            "run_id": self.run_id,
+            "current_balance": self.current_balance,
+            "profits": self.profits,
+            "losses": self.losses,
+            "is_cycle": self.is_cycle,
+            "chunks": self.chunks,
+            "cursor": self.cursor,
+            "history": self.history,
+            "leftover": self.leftover,
+            "metrics": self.metrics,
+            "skip_first": self.skip_first,
+            "trade_log": self.trade_log.mark() if self.trade_log else None,
+        }
+
+    def restore(self, state):
+        """Continue from a snapshot(); trades logged after it was taken are dropped."""
+        for name in ("run_id", "current_balance", "profits", "losses", "is_cycle",
+                     "chunks", "cursor", "history", "leftover", "metrics", "skip_first"):
+            setattr(self, name, state[name])
+        if self.trade_log:
+            # Keep appending to the log of the run the checkpoint belongs to
+            self.trade_log = TradeLogWriter(self.run_id, symbol=self.symbol, directory=self.trade_log.directory,
+                                            format=self.trade_log.format)
+            if state["trade_log"] is not None:
+                self.trade_log.rollback(state["trade_log"])
+
+    def resume(self):
+        """Load the checkpoint of this run, if any. Returns whether the run was resumed."""
+        state = self.checkpointer.load() if self.checkpointer else None
+        if state is None:
+            return False
+        if state["config"] != self.config():
+            logger.warning(f"Ignoring checkpoint {self.checkpointer.path} taken with other parameters")
+            return False
+        self.restore(state)
+        logger.info(f"Resumed from {self.checkpointer.path} after {self.cursor} "
+                    f"({self.metrics.n_closed} trades, balance {self.current_balance:.2f})")
+        return True
+
+    def run_trading_cycle(self, data=None):
+        if data is not None:
+            return super().run_trading_cycle(data)
+
+        started = time.perf_counter()
+        if not self.resume() and self.trade_log:
+            # Starting over: trades a previous run logged under this run_id would be logged twice
+            self.trade_log.rollback((0, 0))
+        for bars in self.iter_bars():
+            self.process_chunk(bars)
+            if self.checkpointer and self.checkpointer.due():
+                self.checkpointer.save(self.snapshot())
+
+        if self.trade_log:
+            self.trade_log.flush()
+        if self.checkpointer:
+            self.checkpointer.save(self.snapshot())
+            stats = self.checkpointer.stats()
+            elapsed = time.perf_counter() - started
+            logger.info(f"Checkpoint overhead: {stats['seconds']:.3f}s over {stats['saves']} saves "
+                        f"({100 * stats['seconds'] / elapsed:.2f}% of {elapsed:.1f}s), {stats['last_bytes']} bytes each")
+
+    def calculate_metrics(self, open_positions=None):
+        """Metrics of the whole run, resumed parts included, from the accumulated sums."""
+        if not self.metrics.bars:
+            return super().calculate_metrics(open_positions)  # An in-memory run_trading_cycle(data)
+        if open_positions is None:
+            open_positions = self.open_positions()
+        if not self.metrics.n_closed and not open_positions:
+            logger.error("No trades to analyze.")
+            return {}
+
+        if self.trade_log:
+            self.trade_log.close()
+
+        logger.info(f"Final balance: {self.current_balance:.2f}")
+        return self.metrics.result(open_positions)
+
+
+if __name__ == "__main__":
+    trading_system = ChunkedTradingSystem(
+        symbol="kline_btc",
+        start="2021-01-01",
+        end="2024-12-31 23:59:59",
+        chunk_rows=200_000,
+        checkpoint_path="kline_btc_2021_2024.ckpt",
+        initial_investment=600,
+        stoploss=30,
+    )
+    trading_system.run_trading_cycle()
+    trading_system.print_metrics()
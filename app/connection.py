@@ -1,4 +1,5 @@
 from sqlalchemy import create_engine, text
+from sqlalchemy.engine import make_url
 from sqlalchemy.orm import sessionmaker, Session
 from sqlalchemy.ext.declarative import declarative_base
 from typing import TypeVar, List, Optional, Any
@@ -16,11 +17,70 @@ DATABASE_URL = os.getenv("DATABASE_URL")
 Base = declarative_base()
 T = TypeVar('T', bound=Base)
 
+# Connection pool shared by every engine user (TradingSystem, Database, loaders)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", 5))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", 10))
+DB_POOL_TIMEOUT = int(os.getenv("DB_POOL_TIMEOUT", 30))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", 1800))
+
+
+def pool_options(db_url):
+    """Engine keyword arguments of the configured pool for `db_url`."""
+    options = {"pool_pre_ping": True}  # Ensures the connection is alive before using
+    url = make_url(db_url)
+    if url.get_backend_name() == "sqlite" and url.database in (None, "", ":memory:"):
+        return options  # In-memory SQLite is a single connection, not a queue pool
+    options.update(
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_timeout=DB_POOL_TIMEOUT,
+        pool_recycle=DB_POOL_RECYCLE,
+    )
+    return options
+
+
+# Async drivers used for each sync URL scheme
+ASYNC_DRIVERS = {
+    "postgresql": "postgresql+asyncpg",
+    "sqlite": "sqlite+aiosqlite",
+    "mysql": "mysql+aiomysql",
+}
+
+
+def async_url(db_url):
+    """Map a sync database URL (e.g. postgresql://, sqlite://) to its async driver."""
+    url = make_url(db_url)
+    return url.set(drivername=ASYNC_DRIVERS.get(url.get_backend_name(), url.drivername))
+
+
 # Create the SQLAlchemy engine
-engine = create_engine(
-    DATABASE_URL,
-    pool_pre_ping=True,  # Ensures the connection is alive before using
-)
+engine = create_engine(DATABASE_URL, **pool_options(DATABASE_URL))
+
+_async_engine = None
+_async_session = None
+
+
+def get_async_engine():
+    """
+    Async engine on DATABASE_URL with the same pool settings, created on first use
+    so sync-only callers never import an async driver.
+    """
+    global _async_engine
+    if _async_engine is None:
+        from sqlalchemy.ext.asyncio import create_async_engine
+        _async_engine = create_async_engine(async_url(DATABASE_URL), **pool_options(DATABASE_URL))
+    return _async_engine
+
+
+def get_async_session():
+    """
+    Provides an async database session.
+    """
+    global _async_session
+    if _async_session is None:
+        from sqlalchemy.ext.asyncio import async_sessionmaker
+        _async_session = async_sessionmaker(get_async_engine(), autoflush=False, expire_on_commit=False)
+    return _async_session()
 
 # SessionLocal for dependency injection in apps
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
@@ -48,9 +108,10 @@ class Database:
     def __init__(self, db_url: str = DATABASE_URL):
         """
         Initializes the Database class with a connection URL
-        and sets up the engine and sessionmaker.
+        and sets up the engine and sessionmaker. The default URL reuses the
+        shared engine and its pool instead of opening a new one.
         """
-        self.engine = create_engine(db_url, pool_pre_ping=True)
+        self.engine = engine if db_url == DATABASE_URL else create_engine(db_url, **pool_options(db_url))
         self.SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=self.engine)
 
     def get_session(self) -> Session:
@@ -0,0 +1,180 @@
+import numpy as np
+import pandas as pd
+from loguru import logger
+from risk_management import RiskManagement
+
+NEVER = np.iinfo(np.int64).max  # Step of a level that is never reached
+
+
+class ExcursionIndex:
+    """
+    Maximum favorable / adverse excursion paths of a fixed set of entries.
+
+    For every entry (a bar with Signal == 1, bought at its close) and every bar j
+    from the entry on, RiskManagement exits at close_j when
+
+        close_j >= p * (1 + tp/100) * (1 + fee) + 0.5 * ATR_j    (target)
+        close_j <= p * (1 - sl/100) - 0.5 * ATR_j                (stop-loss)
+
+    i.e. when tp <= F_j or sl <= A_j with
+
+        F_j = 100 * ((close_j - 0.5 * ATR_j) / p / (1 + fee) - 1)
+        A_j = 100 * (1 - (close_j + 0.5 * ATR_j) / p)
+
+    The index keeps the running maxima of F and A per entry, stored as records
+    (each new maximum and the bar it is reached on). Both are non-decreasing, so
+    the first bar hitting any tp or sl is a searchsorted lookup, and a whole
+    TP x SL grid is answered without re-simulating. Paths stop once they exceed
+    `tp_max` and `sl_max`, the largest levels that will be asked.
+
+    Entries are independent trades of a fixed `amount`: the three-cycle book and
+    the compounding balance of TradingSystem are not modelled.
+    """
+
+    def __init__(self, data, fees=0.1, tp_max=20.0, sl_max=50.0):
+        data = data.reset_index(drop=True)
+        self.close = data['close_price'].to_numpy(dtype=float)
+        self.atr = data['ATR'].to_numpy(dtype=float)
+        self.close_time = data['close_time'].to_numpy()
+        self.fee = fees / 100
+        self.fees = fees
+        self.tp_max = tp_max
+        self.sl_max = sl_max
+        signal = data['Signal'].to_numpy(dtype=float) if 'Signal' in data else np.zeros(len(data))
+        # Same first bar as the TradingSystem loop
+        self.entries = np.flatnonzero(signal == 1)
+        self.entries = self.entries[self.entries >= 1]
+        # (values, bars after entry, offsets per entry) of every new maximum
+        self.favorable = None
+        self.adverse = None
+
+    @staticmethod
+    def _records(path, offset, best):
+        """New maxima of `path` above `best`: (values, positions + offset, final maximum)."""
+        running = np.maximum.accumulate(np.maximum(path, best))
+        rises = np.flatnonzero(np.diff(running, prepend=best) > 0)
+        return running[rises], rises + offset, running[-1]
+
+    def build(self, window=256):
+        """Compute the excursion records of every entry."""
+        n = len(self.close)
+        records = {"favorable": ([], [], [0]), "adverse": ([], [], [0])}
+        for i in self.entries:
+            price = self.close[i]
+            best = {"favorable": -np.inf, "adverse": -np.inf}
+            counts = {name: 0 for name in records}
+            start = i
+            size = window
+            # Scan in doubling windows until both maxima pass the largest level asked
+            while start < n and (best["favorable"] < self.tp_max or best["adverse"] < self.sl_max):
+                stop = min(n, start + size)
+                close = self.close[start:stop]
+                half_atr = 0.5 * self.atr[start:stop]
+                paths = {
+                    "favorable": 100 * ((close - half_atr) / price / (1 + self.fee) - 1),
+                    "adverse": 100 * (1 - (close + half_atr) / price),
+                }
+                for name, path in paths.items():
+                    values, steps, best[name] = self._records(path, start - i, best[name])
+                    records[name][0].append(values)
+                    records[name][1].append(steps)
+                    counts[name] += len(values)
+                start = stop
+                size *= 2
+            for name, (_, _, offsets) in records.items():
+                offsets.append(offsets[-1] + counts[name])
+
+        self.favorable, self.adverse = (
+            (np.concatenate(values) if values else np.empty(0),
+             np.concatenate(steps) if steps else np.empty(0, dtype=np.int64),
+             np.asarray(offsets, dtype=np.int64))
+            for values, steps, offsets in records.values()
+        )
+        logger.info(f"Excursion index: {len(self.entries)} entries, "
+                    f"{len(self.favorable[0]) + len(self.adverse[0])} records")
+        return self
+
+    @staticmethod
+    def _first_hit(records, k, levels):
+        """Bars after entry k until each of `levels` is first reached, NEVER if it is not."""
+        values, steps, offsets = records
+        lo, hi = offsets[k], offsets[k + 1]
+        idx = lo + np.searchsorted(values[lo:hi], levels, side='left')
+        hit = idx < hi
+        return np.where(hit, steps[np.where(hit, idx, lo)] if hi > lo else 0, NEVER)
+
+    def exits(self, tp, sl, amount=100.0):
+        """
+        Exit of every entry for one (tp %, sl %) pair: (exit bar index or -1 while
+        still open, "PROFIT" / "LOSS" / None, profit_loss of `amount` invested).
+        """
+        n = len(self.entries)
+        exit_bar = np.full(n, -1, dtype=np.int64)
+        reason = np.full(n, None, dtype=object)
+        pnl = np.zeros(n)
+        for k, i in enumerate(self.entries):
+            tp_step = int(self._first_hit(self.favorable, k, tp))
+            sl_step = int(self._first_hit(self.adverse, k, sl))
+            if min(tp_step, sl_step) == NEVER:
+                continue
+            price = self.close[i]
+            if sl_step <= tp_step:  # RiskManagement checks the stop first
+                j = i + sl_step
+                reason[k] = "LOSS"
+                pnl[k] = amount * (self.close[j] / price - 1)
+            else:
+                j = i + tp_step
+                reason[k] = "PROFIT"
+                _, target = RiskManagement.exit_levels(price, tp, sl, self.atr[j], self.fees)
+                pnl[k] = amount * (target / price - 1)
+            exit_bar[k] = j
+        return exit_bar, reason, pnl
+
+    def heatmap(self, tps, sls, amount=100.0):
+        """
+        Total profit/loss, closed trades and win rate of the entries for every
+        (tp, sl) pair, as DataFrames indexed by tp with one column per sl.
+        """
+        tps = np.asarray(tps, dtype=float)
+        sls = np.asarray(sls, dtype=float)
+        if tps.max() > self.tp_max or sls.max() > self.sl_max:
+            raise ValueError("Grid exceeds the tp_max/sl_max the index was built for")
+        total = np.zeros((len(tps), len(sls)))
+        closed = np.zeros((len(tps), len(sls)), dtype=np.int64)
+        wins = np.zeros((len(tps), len(sls)), dtype=np.int64)
+
+        for k, i in enumerate(self.entries):
+            tp_step = self._first_hit(self.favorable, k, tps)[:, None]
+            sl_step = self._first_hit(self.adverse, k, sls)[None, :]
+            stop_first = sl_step <= tp_step
+            step = np.where(stop_first, sl_step, tp_step)
+            is_closed = step != NEVER
+            j = i + np.where(is_closed, step, 0)
+
+            price = self.close[i]
+            _, target = RiskManagement.exit_levels(price, tps[:, None], sls[None, :], self.atr[j], self.fees)
+            exit_price = np.where(stop_first, self.close[j], target)
+            trade_pnl = np.where(is_closed, amount * (exit_price / price - 1), 0.0)
+
+            total += trade_pnl
+            closed += is_closed
+            wins += is_closed & (trade_pnl > 0)
+
+        index = pd.Index(tps, name="target_profit")
+        columns = pd.Index(sls, name="stoploss")
+        with np.errstate(invalid="ignore", divide="ignore"):
+            win_rate = np.where(closed > 0, wins / closed, np.nan)
+        return {
+            "profit_loss": pd.DataFrame(total, index=index, columns=columns),
+            "trades": pd.DataFrame(closed, index=index, columns=columns),
+            "win_rate": pd.DataFrame(win_rate, index=index, columns=columns),
+        }
+
+
+if __name__ == "__main__":
+    from trading_algorithm import TradingSystem
+
+    system = TradingSystem(symbol="kline_btc", month="2024-08", trade_log=False)
+    index = ExcursionIndex(system.prepare_data(), tp_max=10, sl_max=50).build()
+    maps = index.heatmap(tps=np.arange(0.5, 10.5, 0.5), sls=np.arange(5, 55, 5))
+    print(maps["profit_loss"].round(2))
@@ -0,0 +1,329 @@
+"""
+Precomputed indicator columns per symbol and interval.
+
+Once a bar is final its RSI/ATR/SMA/Support/Resistance never change, so for the
+configured Strategy parameter sets they are computed once and kept on disk:
+
+    <directory>/<symbol>/<interval>/<params key>/
+        part-00000.npz ...   open_time, close_price, the rolling indicator columns
+                             and the running RMA sums behind RSI and ATR
+        state.ckpt           parts, last kline consumed, indicator state
+
+Ingestion extends every configured set with the new klines only: the RMA sums
+continue from the state (kernels.rma_sums), the rolling columns from the last
+bars kept in the state, and the 1m klines of a bucket that is not complete yet
+wait in the state for the next batch. Parts are written before the state that
+lists them, so readers never see a half-written part.
+
+A run picks the columns up through Strategy(features=store.view(symbol, interval)):
+
+    store = FeatureStore("feature_store", intervals=["1m", "15min"])
+    ingest_klines("kline_btc", klines, feature_store=store)
+    TradingSystem(symbol="kline_btc", month="2024-08", timeframe="15min", feature_store=store)
+
+RSI and ATR are recursive, so a value depends on every bar before it. The store
+keeps the sums of the gains, losses and true ranges, each decayed by
+(1 - 1 / length) per bar since the first kline. A lookup subtracts what the bars
+before the run contributed and blanks the first `length` rows. The values are
+then those of a fresh computation over the run's bars, up to float rounding.
+"""
+import hashlib
+import json
+import os
+import numpy as np
+import pandas as pd
+from pandas.tseries.frequencies import to_offset
+from loguru import logger
+import kernels
+from checkpoint import load_checkpoint, save_checkpoint
+from indicators import Strategy
+from resample import DAY, bucket_width, is_fixed, resample
+from trading_algorithm import kline_chunks
+
+COLUMNS = ['RSI', 'ATR', 'SMA_Short', 'SMA_Long', 'Support', 'Resistance']
+
+FORMAT = 2  # Layout of the parts; sets written in another layout are rebuilt
+
+# Strategy backends whose values the store reproduces (TA-Lib seeds its averages differently)
+BACKENDS = ("pandas_ta", "numpy")
+
+
+def params_key(params):
+    """Directory name of a Strategy parameter set."""
+    canonical = json.dumps(params, sort_keys=True)
+    return hashlib.sha256(canonical.encode()).hexdigest()[:16]
+
+
+def _ns(times):
+    return times.to_numpy(dtype="datetime64[ns]").view("i8")
+
+
+class FeatureSet:
+    """The stored columns of one symbol, interval and parameter set, and the state that extends them."""
+
+    def __init__(self, path, interval, params):
+        self.path = path
+        self.interval = interval
+        self.params = params
+        self.state = load_checkpoint(os.path.join(path, "state.ckpt"))
+        if self.state is None or self.state.get("format") != FORMAT:
+            # Unbuilt; an old layout is left for the writer to reset() and rebuild
+            self.state = self._new_state()
+        self.keep = max(params['sma_short_length'], params['sma_long_length'], params['support_resistance_window'])
+
+    def _new_state(self):
+        return {
+            "format": FORMAT,
+            "params": self.params,
+            "parts": [],          # {"name", "first", "last", "rows"}, open_time in ns
+            "next_part": 0,
+            "last_seen": None,    # open_time (ns) of the last 1m kline consumed
+            "pending": None,      # 1m klines of the bucket still being filled
+            "tail": np.empty((3, 0)),  # high, low, close of the last bars, for the rolling columns
+            "rsi_gain": None,
+            "rsi_loss": None,
+            "atr": None,
+        }
+
+    def reset(self):
+        """Delete every part, so the next extend rebuilds the set from the table."""
+        for name in os.listdir(self.path):
+            if name.startswith("part-") or name == "state.ckpt":
+                os.remove(os.path.join(self.path, name))
+        self.state = self._new_state()
+
+    @property
+    def built(self):
+        return self.state["last_seen"] is not None
+
+    def extend(self, klines):
+        """Append the bars of the 1m `klines` newer than the last one consumed; returns the bars added."""
+        state = self.state
+        if state["last_seen"] is not None:
+            klines = klines[_ns(klines['open_time']) > state["last_seen"]]
+        if klines.empty:
+            return 0
+        state["last_seen"] = int(_ns(klines['open_time'])[-1])
+
+        if self.interval == "1m":
+            bars = klines
+        else:
+            if state["pending"] is not None:
+                klines = pd.concat([state["pending"], klines], ignore_index=True)
+            # Only complete buckets are final; the rest waits for the next batch
+            bars = resample(klines, self.interval, partial="drop")
+            if not bars.empty:
+                next_open = bars['open_time'].iloc[-1] + to_offset(self.interval)
+                klines = klines[klines['open_time'] >= next_open]
+            state["pending"] = klines.reset_index(drop=True)
+        if not bars.empty:
+            self._append(bars)
+        save_checkpoint(os.path.join(self.path, "state.ckpt"), state)
+        return len(bars)
+
+    def _append(self, bars):
+        state, params = self.state, self.params
+        new = np.vstack([bars[name].to_numpy(dtype=float) for name in ('high_price', 'low_price', 'close_price')])
+        tail = state["tail"].shape[1]
+        high, low, close = np.hstack([state["tail"], new])
+
+        delta = np.diff(close, prepend=np.nan)[tail:]
+        gain, _, _, state["rsi_gain"] = kernels.rma_sums(np.where(delta < 0, 0.0, delta),
+                                                         params['rsi_length'], state["rsi_gain"])
+        loss, _, _, state["rsi_loss"] = kernels.rma_sums(np.where(delta > 0, 0.0, delta),
+                                                         params['rsi_length'], state["rsi_loss"])
+        true_range, _, _, state["atr"] = kernels.rma_sums(kernels.true_range(high, low, close)[tail:],
+                                                          params['atr_length'], state["atr"])
+        window = params['support_resistance_window']
+        columns = {
+            'open_time': _ns(bars['open_time']),
+            'close_price': close[tail:],
+            'RSI_gain': gain,
+            'RSI_loss': loss,
+            'ATR_range': true_range,
+            'SMA_Short': kernels.sma(close, params['sma_short_length'])[tail:],
+            'SMA_Long': kernels.sma(close, params['sma_long_length'])[tail:],
+            'Support': kernels.rolling_min(low, window)[tail:],
+            'Resistance': kernels.rolling_max(high, window)[tail:],
+        }
+        state["tail"] = np.vstack([high, low, close])[:, -self.keep:]
+        state["parts"].append(self._write_part(columns))
+
+    def _write_part(self, columns):
+        name = f"part-{self.state['next_part']:05d}.npz"
+        self.state["next_part"] += 1
+        path = os.path.join(self.path, name)
+        with open(f"{path}.tmp", "wb") as file:
+            np.savez(file, **columns)
+        os.replace(f"{path}.tmp", path)
+        times = columns['open_time']
+        return {"name": name, "first": int(times[0]), "last": int(times[-1]), "rows": len(times)}
+
+    def read(self, start=None, end=None):
+        """Stored rows with open_time (ns) in [start, end] as a dict of arrays."""
+        parts = [part for part in self.state["parts"]
+                 if (start is None or part["last"] >= start) and (end is None or part["first"] <= end)]
+        if not parts:
+            return None
+        loaded = []
+        for part in parts:
+            with np.load(os.path.join(self.path, part["name"])) as arrays:
+                loaded.append({name: arrays[name] for name in arrays.files})
+        columns = {name: np.concatenate([part[name] for part in loaded]) for name in loaded[0]}
+        times = columns['open_time']
+        selected = slice(np.searchsorted(times, start) if start is not None else 0,
+                         np.searchsorted(times, end, side="right") if end is not None else len(times))
+        return {name: values[selected] for name, values in columns.items()}
+
+    def compact(self):
+        """Merge all parts into one; done by the store once there are too many."""
+        parts = self.state["parts"]
+        if len(parts) < 2:
+            return
+        self.state["parts"] = [self._write_part(self.read())]
+        save_checkpoint(os.path.join(self.path, "state.ckpt"), self.state)
+        for part in parts:
+            os.remove(os.path.join(self.path, part["name"]))
+
+
+class FeatureView:
+    """The stored features of one symbol and interval, as handed to Strategy(features=...)."""
+
+    def __init__(self, store, symbol, interval):
+        self.store = store
+        self.symbol = symbol
+        self.interval = interval
+
+    def indicators(self, strategy):
+        """Indicator columns for the strategy's bars, or None when the store cannot serve them."""
+        if strategy.backend not in BACKENDS:
+            return None
+        return self.store.lookup(self.symbol, self.interval, strategy.params(), strategy.data)
+
+
+class FeatureStore:
+    """
+    Indicator columns of the configured `param_sets` (Strategy keyword arguments,
+    {} for the defaults) at every one of `intervals` ("1m" for the raw klines, or
+    fixed timeframes that divide a day, so buckets line up with resample_klines).
+
+    One process should extend a symbol at a time; any number can read.
+    """
+
+    def __init__(self, directory="feature_store", intervals=("1m",), param_sets=({},), max_parts=64):
+        for interval in intervals:
+            if interval != "1m" and not (is_fixed(interval) and DAY % bucket_width(interval)[0] == 0):
+                raise ValueError(f"Interval {interval!r} must be '1m' or a fixed timeframe dividing a day")
+        self.directory = directory
+        self.intervals = list(intervals)
+        self.param_sets = [Strategy(None, **params).params() for params in param_sets]
+        self.max_parts = max_parts
+        self.sets = {}
+
+    def path(self, symbol, interval, params):
+        return os.path.join(self.directory, symbol, interval, params_key(params))
+
+    def feature_set(self, symbol, interval, params):
+        """The set extended by this store (cached, so its state stays in memory between batches)."""
+        path = self.path(symbol, interval, params)
+        key = (symbol, interval, params_key(params))
+        if key not in self.sets:
+            os.makedirs(path, exist_ok=True)
+            features = FeatureSet(path, interval, params)
+            if not features.built:
+                features.reset()  # Parts of an old layout or of an interrupted build
+            self.sets[key] = features
+        return self.sets[key]
+
+    def reset(self, symbol):
+        """Drop every configured set of `symbol`, e.g. after klines already consumed were corrected."""
+        for interval in self.intervals:
+            for params in self.param_sets:
+                self.feature_set(symbol, interval, params).reset()
+        logger.info(f"Feature store {symbol}: reset, rebuilt from the table on the next extend")
+
+    def extend(self, symbol, klines):
+        """Add newly ingested 1m klines of `symbol` to every configured set; returns the bars added."""
+        added = 0
+        for interval in self.intervals:
+            for params in self.param_sets:
+                features = self.feature_set(symbol, interval, params)
+                if features.built:
+                    added += features.extend(klines)
+                else:
+                    # A new set starts from the whole table, which already holds `klines`
+                    added += self.catch_up(symbol, features)
+                if len(features.state["parts"]) > self.max_parts:
+                    features.compact()
+        return added
+
+    def catch_up(self, symbol, features, chunksize=100_000):
+        """Extend `features` with the klines of the table it has not consumed yet."""
+        after = features.state["last_seen"]
+        start = None if after is None else pd.Timestamp(after + 1)
+        added = 0
+        for chunk in kline_chunks(symbol, start, chunksize=chunksize):
+            added += features.extend(chunk)
+        logger.info(f"Feature store {symbol} {features.interval}: {added} bars added from the table")
+        return added
+
+    def build(self, symbol, chunksize=100_000):
+        """Bring every configured set of `symbol` up to date with its table."""
+        return sum(self.catch_up(symbol, self.feature_set(symbol, interval, params), chunksize)
+                   for interval in self.intervals for params in self.param_sets)
+
+    def view(self, symbol, interval=None):
+        return FeatureView(self, symbol, interval or "1m")
+
+    def lookup(self, symbol, interval, params, bars):
+        """
+        Stored indicator columns of `bars` (the klines or resampled bars of a run),
+        indexed like them, or None unless every bar is stored with the same close.
+        """
+        if params not in self.param_sets or interval not in self.intervals or bars.empty:
+            return None
+        path = self.path(symbol, interval, params)
+        if not os.path.isdir(path):
+            return None
+        times = _ns(bars['open_time'])
+        try:
+            # Fresh state, the set may have been extended by another process
+            stored = FeatureSet(path, interval, params).read(times[0], times[-1])
+        except FileNotFoundError:
+            return None  # Parts compacted away while reading; compute instead
+        if (stored is None or not np.array_equal(stored['open_time'], times)
+                or not np.array_equal(stored['close_price'], bars['close_price'].to_numpy(dtype=float))):
+            logger.debug(f"Feature store miss for {symbol} {interval}")
+            return None
+
+        # The first bar of a fresh computation has no previous close, so only the
+        # gains, losses and true ranges after it count
+        steps = np.arange(len(times))
+
+        def fresh(totals, length):
+            return totals - totals[0] * (1 - 1 / length) ** steps
+
+        gain = fresh(stored['RSI_gain'], params['rsi_length'])
+        loss = fresh(stored['RSI_loss'], params['rsi_length'])
+        decay = 1 - 1 / params['atr_length']
+        with np.errstate(invalid="ignore", divide="ignore"):
+            stored['RSI'] = 100 * gain / (gain + np.abs(loss))
+            # Weight sum of `steps` observations of the adjust=True average
+            stored['ATR'] = fresh(stored['ATR_range'], params['atr_length']) / ((1 - decay ** steps) / (1 - decay))
+
+        # Rows a computation over `bars` alone leaves empty (and preprocess_data drops)
+        warmup = {
+            'RSI': params['rsi_length'],
+            'ATR': params['atr_length'],
+            'SMA_Short': params['sma_short_length'] - 1,
+            'SMA_Long': params['sma_long_length'] - 1,
+            'Support': params['support_resistance_window'] - 1,
+            'Resistance': params['support_resistance_window'] - 1,
+        }
+        indicators = {}
+        for name in COLUMNS:
+            values = stored[name].copy()
+            values[:warmup[name]] = np.nan
+            indicators[name] = pd.Series(values, index=bars.index)
+        logger.debug(f"Feature store hit for {symbol} {interval}: {len(times)} bars")
+        return indicators
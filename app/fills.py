@@ -0,0 +1,51 @@
+import numpy as np
+
+
+def first_touch(values, start, level, above, stop=None, window=256):
+    """
+    Return the first index >= start where `values` reaches `level`, or -1.
+
+    above=True looks for values >= level (e.g. highs against a long take-profit),
+    above=False for values <= level (lows against a long stop). `level` is a scalar
+    or an array aligned with `values`. The scan works on slices that double in size,
+    so a fill a few bars away costs one small comparison and a long hold stays O(n)
+    in NumPy rather than in Python.
+    """
+    end = len(values) if stop is None else min(stop, len(values))
+    per_bar = np.ndim(level) > 0
+    i = start
+    while i < end:
+        j = min(end, i + window)
+        segment = values[i:j]
+        bound = level[i:j] if per_bar else level
+        hits = np.flatnonzero(segment >= bound if above else segment <= bound)
+        if hits.size:
+            return i + int(hits[0])
+        i = j
+        window *= 2
+    return -1
+
+
+def resolve_exit(high, low, start, take_profit, adverse, position_type="LONG", stop=None):
+    """
+    Find which of a take-profit and an adverse level (stop or liquidation) is hit first.
+
+    Returns (index, "PROFIT" | "ADVERSE") or (-1, None) when neither is reached.
+    If both are touched inside the same bar the adverse level wins, matching the
+    order in which RiskManagement/RiskManagementF check their exits.
+    """
+    if position_type.upper() == "LONG":
+        favorable, unfavorable, tp_above = high, low, True
+    else:
+        favorable, unfavorable, tp_above = low, high, False
+
+    tp_idx = first_touch(favorable, start, take_profit, above=tp_above, stop=stop)
+    # No need to look for the adverse level past the bar where the target fills
+    adverse_stop = stop if tp_idx == -1 else tp_idx + 1
+    adverse_idx = first_touch(unfavorable, start, adverse, above=not tp_above, stop=adverse_stop)
+
+    if adverse_idx != -1 and (tp_idx == -1 or adverse_idx <= tp_idx):
+        return adverse_idx, "ADVERSE"
+    if tp_idx != -1:
+        return tp_idx, "PROFIT"
+    return -1, None
@@ -0,0 +1,148 @@
+import numpy as np
+from loguru import logger
+from fills import resolve_exit
+from risk_management import RiskManagementF
+from trading_algorithm import TradingSystem, SignalType
+
+
+class FuturesTradingSystem(TradingSystem):
+    """
+    USD-M futures backtest built on the RiskManagementF formulas.
+
+    Positions are opened on the close of a signal bar (Signal == 1 goes LONG,
+    Signal == -1 goes SHORT; the strategy emits short signals unless
+    position_type is "LONG") and held one at a time. For every position the
+    liquidation, stop-loss and take-profit prices are computed once, then the
+    bar that hits one of them first is found with array scans over high/low
+    instead of re-evaluating RiskManagementF bar by bar. A bar that opens beyond
+    the stop or liquidation level fills at its open.
+
+    `stoploss` is the share of margin at risk and `target_profit` the net profit
+    on margin, both in percent as RiskManagementF expects; `fees` is in percent
+    per side like the spot system.
+    """
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.maintenance_margin = kwargs.get('maintenance_margin', 0.004)
+        self.position_type = kwargs.get('position_type', None)  # Restrict to "LONG"/"SHORT", None for both
+        if self.position_type not in (None, "LONG", "SHORT"):
+            raise ValueError(f"position_type must be 'LONG', 'SHORT' or None, not {self.position_type!r}")
+        # Strategy only emits Signal == -1 when asked to
+        self.strategy_params = {**self.strategy_params, 'short_signals': self.position_type != "LONG"}
+        self.liquidations = 0
+
+    def open_position(self, data, i, side):
+        """Build the position opened on the close of bar i."""
+        signal = SignalType[data['type'].iat[i]]
+        entry_price = float(data['close_price'].iat[i])
+        margin = self.current_balance * signal.investment_percentage()
+        fees = self.fees / 100
+        liquidation_price, stop_loss_price, take_profit_price = RiskManagementF.price_levels(
+            entry_price, self.leverage, self.stoploss, self.target_profit,
+            fees=fees, maintenance_margin=self.maintenance_margin, position_type=side
+        )
+        return {
+            "symbol": self.symbol,
+            "type": signal,
+            "side": side,
+            "buy_time": data['close_time'].iat[i],
+            "buy_price": entry_price,
+            "amount_invested": margin,
+            "percentage": signal.investment_percentage(),
+            "leverage": self.leverage,
+            "position_size": margin * self.leverage / entry_price,
+            "liquidation_price": liquidation_price,
+            "stop_loss_price": stop_loss_price,
+            "take_profit_price": take_profit_price,
+        }
+
+    def close_position(self, position, data, j, reason):
+        """Settle the position at the level that was hit on bar j."""
+        side = position["side"]
+        fees = self.fees / 100
+        if reason == "PROFIT":
+            exit_price = position["take_profit_price"]
+        else:
+            # The adverse level is whichever of stop and liquidation is met first
+            # as price moves against the position.
+            direction = 1 if side == "LONG" else -1
+            stop_first = direction * position["stop_loss_price"] > direction * position["liquidation_price"]
+            level = position["stop_loss_price"] if stop_first else position["liquidation_price"]
+            # A bar opening beyond the level gaps through it: the fill is the open, not the level
+            exit_price = direction * min(direction * level, direction * float(data['open_price'].iat[j]))
+            liquidated = direction * exit_price <= direction * position["liquidation_price"]
+            reason = "LIQUIDATION" if liquidated else "LOSS"
+
+        if reason == "LIQUIDATION":
+            net_profit = -position["amount_invested"]
+            self.liquidations += 1
+            logger.critical(f"Liquidation at {exit_price:.2f} on {data['close_time'].iat[j]}")
+        else:
+            net_profit = RiskManagementF.pnl(position["buy_price"], exit_price, position["position_size"],
+                                             fees=fees, position_type=side)
+
+        position["sell_price"] = exit_price
+        position["sell_time"] = data['close_time'].iat[j]
+        position["exit_reason"] = reason
+        position["profit_loss"] = net_profit
+
+        self.current_balance += net_profit
+        self.profits += max(0, net_profit)
+        self.losses += min(0, net_profit)
+        self.record_trade(position)
+
+    def run_trading_cycle(self, data=None):
+        """Simulate futures positions over the prepared data."""
+        if data is None:
+            data = self.prepare_data()
+        if data is None:
+            return
+        data = data.reset_index(drop=True)
+        self.data = data
+        if 'Signal' not in data:
+            logger.info("No entry signal in the selected period.")
+            return
+
+        high = data['high_price'].to_numpy(dtype=float)
+        low = data['low_price'].to_numpy(dtype=float)
+        signals = data['Signal'].fillna(0).to_numpy()
+        if self.position_type == "LONG":
+            signals = np.where(signals > 0, signals, 0)
+        elif self.position_type == "SHORT":
+            signals = np.where(signals < 0, signals, 0)
+        entries = np.flatnonzero(signals != 0)
+        if not len(entries):
+            logger.warning(f"No {self.position_type or 'entry'} signal in the selected period.")
+
+        # Same starting bar as the spot loop
+        k = np.searchsorted(entries, 1)
+        while k < len(entries):
+            i = int(entries[k])
+            side = "LONG" if signals[i] > 0 else "SHORT"
+            position = self.open_position(data, i, side)
+            logger.info(f"{side} entry at {position['buy_price']} on {position['buy_time']} "
+                        f"(liq {position['liquidation_price']:.2f}, "
+                        f"SL {position['stop_loss_price']:.2f}, TP {position['take_profit_price']:.2f})")
+
+            direction = 1 if side == "LONG" else -1
+            adverse = max(direction * position["stop_loss_price"],
+                          direction * position["liquidation_price"]) * direction
+            j, reason = resolve_exit(high, low, i + 1, position["take_profit_price"], adverse, side)
+            if j == -1:
+                # Still open at the end of the data
+                self.is_cycle.append(position)
+                break
+
+            self.close_position(position, data, j, reason)
+            logger.info(f"{side} exit ({position['exit_reason']}) at {position['sell_price']:.2f} "
+                        f"on {position['sell_time']} | PnL: {position['profit_loss']:.2f}")
+            if self.current_balance <= 0:
+                logger.warning("Account liquidated")
+                break
+
+            # Next position can only open after this one is closed
+            k = np.searchsorted(entries, j, side='right')
+
+        if self.trade_log:
+            self.trade_log.flush()
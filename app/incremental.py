@@ -0,0 +1,130 @@
+import math
+from collections import deque
+from indicators import SIGNAL_RULES
+
+NAN = float("nan")
+
+
+class EwmMean:
+    """
+    Streaming `Series.ewm(alpha=..., min_periods=...).mean()` (adjust=True), the
+    RMA pandas_ta uses for RSI and ATR. Same update order as pandas, so values
+    agree to the last bits.
+    """
+
+    def __init__(self, length):
+        self.alpha = 1.0 / length
+        self.min_periods = length
+        self.weighted = NAN
+        self.old_wt = 1.0
+        self.nobs = 0
+
+    def update(self, value):
+        is_obs = value == value
+        self.nobs += is_obs
+        if self.weighted == self.weighted:
+            self.old_wt *= 1 - self.alpha
+            if is_obs:
+                if self.weighted != value:
+                    self.weighted = (self.old_wt * self.weighted + value) / (self.old_wt + 1.0)
+                self.old_wt += 1.0
+        elif is_obs:
+            self.weighted = value
+        return self.weighted if self.nobs >= self.min_periods else NAN
+
+
+class RollingMean:
+    """Streaming simple moving average over the last `length` values."""
+
+    def __init__(self, length):
+        self.length = length
+        self.window = deque()
+        self.total = 0.0
+
+    def update(self, value):
+        self.window.append(value)
+        self.total += value
+        if len(self.window) > self.length:
+            self.total -= self.window.popleft()
+        return self.total / self.length if len(self.window) == self.length else NAN
+
+
+class RollingExtreme:
+    """Streaming rolling min (or max) with a monotonic deque, O(1) amortized per bar."""
+
+    def __init__(self, length, maximum=False):
+        self.length = length
+        self.maximum = maximum
+        self.candidates = deque()  # (index, value), values monotonic
+        self.index = -1
+
+    def update(self, value):
+        self.index += 1
+        if self.maximum:
+            while self.candidates and self.candidates[-1][1] <= value:
+                self.candidates.pop()
+        else:
+            while self.candidates and self.candidates[-1][1] >= value:
+                self.candidates.pop()
+        self.candidates.append((self.index, value))
+        if self.candidates[0][0] <= self.index - self.length:
+            self.candidates.popleft()
+        return self.candidates[0][1] if self.index >= self.length - 1 else NAN
+
+
+class IncrementalStrategy:
+    """
+    Bar-by-bar version of indicators.Strategy.
+
+    `update(bar)` takes one closed kline (dict with open_time, close_time and the
+    *_price columns) and returns it with RSI, ATR, SMA_Short, SMA_Long, Support,
+    Resistance, Signal and type added, or None while indicators are still warming
+    up (the rows Strategy.preprocess_data drops). State is a handful of scalars and
+    windows of at most max(lengths) values, independent of history length.
+    """
+
+    def __init__(self, rsi_length=14, sma_short_length=50, sma_long_length=200, atr_length=14,
+                 support_resistance_window=10):
+        self.rsi_gain = EwmMean(rsi_length)
+        self.rsi_loss = EwmMean(rsi_length)
+        self.atr = EwmMean(atr_length)
+        self.sma_short = RollingMean(sma_short_length)
+        self.sma_long = RollingMean(sma_long_length)
+        self.support = RollingExtreme(support_resistance_window)
+        self.resistance = RollingExtreme(support_resistance_window, maximum=True)
+        self.prev_close = NAN
+
+    def update(self, bar):
+        high, low, close = bar['high_price'], bar['low_price'], bar['close_price']
+        prev_close = self.prev_close
+        self.prev_close = close
+
+        change = close - prev_close
+        gain = self.rsi_gain.update(max(change, 0.0) if change == change else NAN)
+        loss = self.rsi_loss.update(min(change, 0.0) if change == change else NAN)
+        rsi = 100 * gain / (gain + abs(loss)) if gain + abs(loss) else NAN
+
+        if prev_close == prev_close:
+            true_range = max(high - low, abs(high - prev_close), abs(prev_close - low))
+        else:
+            true_range = NAN
+        atr = self.atr.update(true_range)
+
+        row = dict(bar)
+        row.update(
+            RSI=rsi,
+            ATR=atr,
+            SMA_Short=self.sma_short.update(close),
+            SMA_Long=self.sma_long.update(close),
+            Support=self.support.update(low),
+            Resistance=self.resistance.update(high),
+        )
+        if any(math.isnan(row[k]) for k in ("RSI", "ATR", "SMA_Short", "SMA_Long", "Support", "Resistance")):
+            return None
+
+        row['Signal'], row['type'] = NAN, None
+        if close > row['Support'] and row['SMA_Short'] > row['SMA_Long']:
+            for rsi_low, rsi_high, signal_type in SIGNAL_RULES:
+                if rsi_low <= rsi <= rsi_high:
+                    row['Signal'], row['type'] = 1, signal_type
+        return row
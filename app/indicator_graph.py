@@ -0,0 +1,247 @@
+"""
+Indicators as nodes of a dependency graph.
+
+A node is keyed by its function, parameters and input nodes, so two strategies
+that ask for the same SMA, or two ATR lengths built on the same true range, point
+at the same node:
+
+    graph = IndicatorGraph(bars)
+    graph.add({"ATR": atr("high_price", "low_price", "close_price", 14)})
+    graph.add({"ATR": atr("high_price", "low_price", "close_price", 21),
+               "EMA50": ema("close_price", 50)})
+    first, second = graph.run()      # true_range is computed once
+
+run() computes every unique node once in topological order. A node's value is
+dropped as soon as the last node or consumer that reads it is done, so peak memory
+follows what is still needed instead of everything that was computed.
+"""
+from collections import defaultdict, namedtuple
+import pandas as pd
+from loguru import logger
+import kernels
+
+try:
+    import talib
+except ImportError:  # TA-Lib is optional, the talib backend needs it
+    talib = None
+
+
+def _ta():
+    """pandas_ta, imported on first use so the other backends work without it."""
+    import pandas_ta
+    return pandas_ta
+
+
+# params is a sorted tuple of (name, value); inputs are other nodes
+Node = namedtuple("Node", ["func", "params", "inputs"])
+
+# Node function -> callable(*input Series, **params) of the pandas_ta backend
+FUNCTIONS = {
+    "column": None,  # A column of the klines, resolved by the graph
+    "true_range": lambda high, low, close: _ta().true_range(high, low, close),
+    "rma": lambda values, length: _ta().rma(values, length=length),
+    "rsi": lambda close, length: _ta().rsi(close, length=length),
+    "sma": lambda values, length: _ta().sma(values, length=length),
+    "ema": lambda values, length: _ta().ema(values, length=length),
+    "macd": lambda close, fast, slow, signal: _ta().macd(close, fast=fast, slow=slow, signal=signal)[
+        f"MACD_{fast}_{slow}_{signal}"],
+    "macd_signal": lambda close, fast, slow, signal: _ta().macd(close, fast=fast, slow=slow, signal=signal)[
+        f"MACDs_{fast}_{slow}_{signal}"],
+    "rolling_min": lambda values, window: values.rolling(window=window).min(),
+    "rolling_max": lambda values, window: values.rolling(window=window).max(),
+}
+
+
+def _on_arrays(kernel):
+    """Run a NumPy kernel on the values of Series inputs and index the result like them."""
+    def apply(*inputs, **params):
+        values = kernel(*(i.to_numpy(dtype=float) for i in inputs), **params)
+        return pd.Series(values, index=inputs[0].index)
+    return apply
+
+
+NUMPY_FUNCTIONS = {
+    "column": None,
+    "true_range": _on_arrays(kernels.true_range),
+    "rma": _on_arrays(kernels.rma),
+    "rsi": _on_arrays(kernels.rsi),
+    "sma": _on_arrays(kernels.sma),
+    "ema": _on_arrays(kernels.ema),
+    "macd": _on_arrays(lambda close, **params: kernels.macd(close, **params)[0]),
+    "macd_signal": _on_arrays(lambda close, **params: kernels.macd(close, **params)[1]),
+    "rolling_min": _on_arrays(kernels.rolling_min),
+    "rolling_max": _on_arrays(kernels.rolling_max),
+}
+
+BACKENDS = {"pandas_ta": FUNCTIONS, "numpy": NUMPY_FUNCTIONS}
+
+if talib is not None:
+    # TA-Lib seeds RSI/SMA-style averages its own way, so early values differ from pandas_ta.
+    # It has no plain RMA; the NumPy one keeps ATR = RMA(true range) as in the other backends,
+    # and its MACD starts both averages on the slow one's first bar, so MACD is the NumPy one too.
+    BACKENDS["talib"] = {
+        "column": None,
+        "true_range": _on_arrays(lambda high, low, close: talib.TRANGE(high, low, close)),
+        "rma": _on_arrays(kernels.rma),
+        "rsi": _on_arrays(lambda close, length: talib.RSI(close, timeperiod=length)),
+        "sma": _on_arrays(lambda values, length: talib.SMA(values, timeperiod=length)),
+        "ema": _on_arrays(lambda values, length: talib.EMA(values, timeperiod=length)),
+        "macd": NUMPY_FUNCTIONS["macd"],
+        "macd_signal": NUMPY_FUNCTIONS["macd_signal"],
+        "rolling_min": _on_arrays(lambda values, window: talib.MIN(values, timeperiod=window)),
+        "rolling_max": _on_arrays(lambda values, window: talib.MAX(values, timeperiod=window)),
+    }
+
+DEFAULT_BACKEND = "pandas_ta"
+
+
+def node(func, *inputs, **params):
+    """Node of `func` over `inputs` (nodes or kline column names)."""
+    if func not in FUNCTIONS:
+        raise ValueError(f"Unknown indicator function {func!r}")
+    inputs = tuple(column(i) if isinstance(i, str) else i for i in inputs)
+    return Node(func, tuple(sorted(params.items())), inputs)
+
+
+def column(name):
+    return Node("column", (("name", name),), ())
+
+
+def true_range(high, low, close):
+    return node("true_range", high, low, close)
+
+
+def atr(high, low, close, length):
+    # ta.atr is the RMA of the true range (its non-TA-Lib path); splitting it lets ATR lengths share the true range
+    return node("rma", true_range(high, low, close), length=length)
+
+
+def rsi(close, length):
+    return node("rsi", close, length=length)
+
+
+def sma(values, length):
+    return node("sma", values, length=length)
+
+
+def ema(values, length):
+    return node("ema", values, length=length)
+
+
+def macd(close, fast=12, slow=26, signal=9):
+    return node("macd", close, fast=fast, slow=slow, signal=signal)
+
+
+def macd_signal(close, fast=12, slow=26, signal=9):
+    return node("macd_signal", close, fast=fast, slow=slow, signal=signal)
+
+
+def rolling_min(values, window):
+    return node("rolling_min", values, window=window)
+
+
+def rolling_max(values, window):
+    return node("rolling_max", values, window=window)
+
+
+class IndicatorGraph:
+    """
+    Shared evaluation of the indicator columns of several consumers over one
+    klines frame.
+
+    A consumer is a {column name: node} mapping and an optional callback. Once all
+    of its nodes are computed, the callback receives {column name: Series} and its
+    return value becomes the consumer's result; without a callback the mapping
+    itself is the result.
+    """
+
+    def __init__(self, data, backend=DEFAULT_BACKEND):
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown indicator backend {backend!r}, available: {sorted(BACKENDS)}")
+        self.data = data
+        self.functions = BACKENDS[backend]
+        self.consumers = []
+        self.computed = 0  # Nodes evaluated by the last run
+        self.peak_live = 0  # Most node values held at once by the last run
+
+    def add(self, columns, callback=None):
+        """Register a consumer; returns its position in the results of run()."""
+        self.consumers.append((columns, callback))
+        return len(self.consumers) - 1
+
+    def order(self):
+        """
+        Unique nodes in topological order. Nodes are visited consumer by consumer,
+        so each consumer completes as early as possible and its values can be freed.
+        """
+        order = []
+        seen = set()
+
+        def visit(current):
+            if current in seen:
+                return
+            seen.add(current)
+            for dependency in current.inputs:
+                visit(dependency)
+            order.append(current)
+
+        for columns, _ in self.consumers:
+            for current in columns.values():
+                visit(current)
+        return order
+
+    def _compute(self, current, values):
+        if current.func == "column":
+            return self.data[dict(current.params)["name"]]
+        return self.functions[current.func](*(values[i] for i in current.inputs), **dict(current.params))
+
+    def run(self):
+        """Evaluate every consumer; returns their results in registration order."""
+        order = self.order()
+        refs = defaultdict(int)
+        for current in order:
+            for dependency in current.inputs:
+                refs[dependency] += 1
+        waiting = []
+        needed_by = defaultdict(list)
+        for index, (columns, _) in enumerate(self.consumers):
+            nodes = set(columns.values())
+            waiting.append(nodes)
+            for current in nodes:
+                refs[current] += 1
+                needed_by[current].append(index)
+
+        values = {}
+        results = [None] * len(self.consumers)
+        self.computed = 0
+        self.peak_live = 0
+
+        def release(current):
+            refs[current] -= 1
+            if refs[current] == 0:
+                del values[current]
+
+        for current in order:
+            values[current] = self._compute(current, values)
+            self.computed += 1
+            self.peak_live = max(self.peak_live, len(values))
+            for dependency in current.inputs:
+                release(dependency)
+            for index in needed_by[current]:
+                waiting[index].discard(current)
+                if waiting[index]:
+                    continue
+                columns, callback = self.consumers[index]
+                indicators = {name: values[n] for name, n in columns.items()}
+                results[index] = callback(indicators) if callback else indicators
+                for n in set(columns.values()):
+                    release(n)
+
+        logger.debug(f"Indicator graph: {self.computed} nodes for {len(self.consumers)} consumers, "
+                     f"at most {self.peak_live} held at once")
+        return results
+
+    def evaluate(self, columns):
+        """Values of one {column name: node} mapping."""
+        self.consumers = [(columns, None)]
+        return self.run()[0]
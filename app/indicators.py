@@ -1,24 +1,63 @@
 
-import pandas_ta as ta
+import indicator_graph as ig
+from indicator_graph import DEFAULT_BACKEND, IndicatorGraph
+
+# (RSI low, RSI high, signal type) bands of the buy rules, both bounds inclusive.
+# The investment share of each type lives in trading_algorithm.SignalType.
+SIGNAL_RULES = [
+    (40, 45, 'SIGNAL_0_4'),  # 30 %
+    (35, 39, 'SIGNAL_0_5'),
+    (30, 34, 'SIGNAL_1'),    # 40 %
+    (25, 29, 'SIGNAL_1_5'),
+    (20, 24, 'SIGNAL_2'),    # 45 %
+    (15, 19, 'SIGNAL_2_5'),
+    (10, 14, 'SIGNAL_3'),    # 50 %
+]
+
 
 class Strategy:
-    def __init__(self, data, rsi_length=14, sma_short_length=50, sma_long_length=200, atr_length=14, support_resistance_window=10):
+    def __init__(self, data, rsi_length=14, sma_short_length=50, sma_long_length=200, atr_length=14, support_resistance_window=10,
+                 backend=DEFAULT_BACKEND, features=None, short_signals=False):
         self.data = data  # DataFrame containing historical price data
         self.rsi_length = rsi_length  # RSI period
         self.sma_short_length = sma_short_length  # Short-term SMA
         self.sma_long_length = sma_long_length  # Long-term SMA
         self.atr_length = atr_length  # ATR period
         self.window = support_resistance_window  # Support/Resistance window
-
-    def calculate_indicators(self):
-
-
-        self.data['RSI'] = ta.rsi(self.data['close_price'], length=self.rsi_length)
-        self.data['ATR'] = ta.atr(self.data['high_price'], self.data['low_price'], self.data['close_price'], length=self.atr_length)
-        self.data['SMA_Short'] = ta.sma(self.data['close_price'], length=self.sma_short_length)
-        self.data['SMA_Long'] = ta.sma(self.data['close_price'], length=self.sma_long_length)
-        self.data['Support'] = self.data['low_price'].rolling(window=self.window).min()
-        self.data['Resistance'] = self.data['high_price'].rolling(window=self.window).max()
+        self.backend = backend  # Indicator implementation: pandas_ta, numpy or talib
+        self.features = features  # feature_store.FeatureView of the data's symbol and interval, if any
+        self.short_signals = short_signals  # Also emit Signal = -1 (sell short) on the mirrored rules
+
+    def params(self):
+        """Indicator parameters of this configuration, the key of its stored features."""
+        return {
+            'rsi_length': self.rsi_length,
+            'sma_short_length': self.sma_short_length,
+            'sma_long_length': self.sma_long_length,
+            'atr_length': self.atr_length,
+            'support_resistance_window': self.window,
+        }
+
+    def indicator_nodes(self):
+        """Indicator columns of this configuration as indicator graph nodes."""
+        return {
+            'RSI': ig.rsi('close_price', self.rsi_length),
+            'ATR': ig.atr('high_price', 'low_price', 'close_price', self.atr_length),
+            'SMA_Short': ig.sma('close_price', self.sma_short_length),
+            'SMA_Long': ig.sma('close_price', self.sma_long_length),
+            'Support': ig.rolling_min('low_price', self.window),
+            'Resistance': ig.rolling_max('high_price', self.window),
+        }
+
+    def calculate_indicators(self, indicators=None):
+        # `indicators` holds the columns already computed by a shared IndicatorGraph;
+        # otherwise they come from the feature store when it has them
+        if indicators is None and self.features is not None:
+            indicators = self.features.indicators(self)
+        if indicators is None:
+            indicators = IndicatorGraph(self.data, self.backend).evaluate(self.indicator_nodes())
+        for name, values in indicators.items():
+            self.data[name] = values
 
         return self.data
 
@@ -27,65 +66,44 @@ class Strategy:
         self.data.dropna(inplace=True)
         return self.data
 
-    def get_decision(self):
-        self.calculate_indicators()
+    def get_decision(self, indicators=None):
+        self.calculate_indicators(indicators)
         self.preprocess_data()
         
-        # Buy signal: RSI < 40, price above support, and short SMA above long SMA (uptrend confirmation)
-        # # 30 %
-        self.data.loc[
-            (self.data['RSI'].between(40, 45)) & 
-            (self.data['close_price'] > self.data['Support']) & 
-            (self.data['SMA_Short'] > self.data['SMA_Long']),
-            ['Signal', 'type']
-        ] = [1, 'SIGNAL_0_4']  # Assign Buy signal and type
-
-
-        self.data.loc[
-            (self.data['RSI'].between(35, 39)) & 
-            (self.data['close_price'] > self.data['Support']) & 
-            (self.data['SMA_Short'] > self.data['SMA_Long']),
-            ['Signal', 'type']
-        ] = [1, 'SIGNAL_0_5']  # Assign Buy signal and type
-
-        # 40 %
-        self.data.loc[
-            (self.data['RSI'].between(30, 34)) & 
-            (self.data['close_price'] > self.data['Support']) & 
-            (self.data['SMA_Short'] > self.data['SMA_Long']),
-            ['Signal', 'type']
-        ] = [1, 'SIGNAL_1']  # Assign Buy signal and type
+        # Buy signal: RSI in the band of the rule, price above support, and short SMA
+        # above long SMA (uptrend confirmation)
+        trend_ok = (self.data['close_price'] > self.data['Support']) & (self.data['SMA_Short'] > self.data['SMA_Long'])
+        for low, high, signal_type in SIGNAL_RULES:
+            self.data.loc[
+                self.data['RSI'].between(low, high) & trend_ok,
+                ['Signal', 'type']
+            ] = [1, signal_type]  # Assign Buy signal and type
+
+        if self.short_signals:
+            # Short signal: the buy rules mirrored around RSI 50, price below resistance,
+            # and short SMA below long SMA (downtrend confirmation)
+            downtrend_ok = (self.data['close_price'] < self.data['Resistance']) & (self.data['SMA_Short'] < self.data['SMA_Long'])
+            for low, high, signal_type in SIGNAL_RULES:
+                self.data.loc[
+                    self.data['RSI'].between(100 - high, 100 - low) & downtrend_ok,
+                    ['Signal', 'type']
+                ] = [-1, signal_type]
 
-
-        self.data.loc[
-            (self.data['RSI'].between(25, 29)) & 
-            (self.data['close_price'] > self.data['Support']) & 
-            (self.data['SMA_Short'] > self.data['SMA_Long']),
-            ['Signal', 'type']
-        ] = [1, 'SIGNAL_1_5']  # Assign Buy signal and type
-
-        # 50 %
-        self.data.loc[      
-            (self.data['RSI'].between(20, 24)) & 
-            (self.data['close_price'] > self.data['Support']) & 
-            (self.data['SMA_Short'] > self.data['SMA_Long']),
-            ['Signal', 'type']
-        ] = [1, 'SIGNAL_2']  # Assign Buy signal and type
-
-        self.data.loc[
-            (self.data['RSI'].between(15, 19)) & 
-            (self.data['close_price'] > self.data['Support']) & 
-            (self.data['SMA_Short'] > self.data['SMA_Long']),
-            ['Signal', 'type']
-        ] = [1, 'SIGNAL_2_5']  # Assign Buy signal and type
-
-
-        self.data.loc[
-            (self.data['RSI'].between(10, 14)) & 
-            (self.data['close_price'] > self.data['Support']) & 
-            (self.data['SMA_Short'] > self.data['SMA_Long']),
-            ['Signal', 'type']
-        ] = [1, 'SIGNAL_3']  # Assign Buy signal and type
+        return self.data
 
 
-        return self.data
+def get_decisions(data, param_sets):
+    """
+    Decision frames of several Strategy configurations over the same klines, in
+    `param_sets` order. Indicators they have in common are computed once per backend.
+    """
+    graphs = {}
+    positions = []
+    for params in param_sets:
+        strategy = Strategy(None, **params)
+        graph = graphs.setdefault(strategy.backend, IndicatorGraph(data, strategy.backend))
+        index = graph.add(strategy.indicator_nodes(),
+                          lambda indicators, params=params: Strategy(data.copy(), **params).get_decision(indicators))
+        positions.append((strategy.backend, index))
+    results = {backend: graph.run() for backend, graph in graphs.items()}
+    return [results[backend][index] for backend, index in positions]
@@ -0,0 +1,90 @@
+"""
+Appending klines to the kline tables.
+
+    ingest_klines("kline_btc", klines, feature_store=store)    # closed 1m klines, e.g. from the API
+    load_csv("spot_klines_data/BTCUSDT_1m_2024-2025.csv", "kline_btcs", feature_store=store)
+
+Klines after the last open_time already in the table are appended. Earlier ones
+are inserted when the table lacks them (a backfilled gap) and replace the stored
+kline when they differ from it (an exchange correction); identical repeats, also
+within a batch, are skipped, so a batch can be re-sent safely. The kline_partitions
+rows of the months a batch touches are updated in its transaction (partitions.py).
+With a feature store, its configured indicator sets are extended with the new
+klines right after they are written, or rebuilt when earlier klines changed.
+"""
+import pandas as pd
+from loguru import logger
+from sqlalchemy import bindparam, select
+from sqlalchemy.sql import text
+from connection import engine
+from partitions import kline_table, lock_table, record_partitions
+
+KLINE_COLUMNS = ['open_time', 'close_time', 'open_price', 'high_price', 'low_price', 'close_price', 'volume']
+
+# Column names of the CSVs data.py writes
+CSV_COLUMNS = {'open': 'open_price', 'high': 'high_price', 'low': 'low_price', 'close': 'close_price'}
+
+
+def split_late(connection, symbol, late):
+    """
+    Split klines at or before the table's last open_time into those it lacks and
+    those that differ from the stored row; returns (missing, corrected, replaced
+    stored rows).
+    """
+    klines = kline_table(symbol)
+    query = select(klines).where(klines.c.open_time >= late['open_time'].iloc[0].to_pydatetime(),
+                                 klines.c.open_time <= late['open_time'].iloc[-1].to_pydatetime())
+    stored = pd.read_sql_query(query, connection)
+    for name in ('open_time', 'close_time'):
+        stored[name] = pd.to_datetime(stored[name]).astype(late[name].dtype)
+    merged = late.merge(stored, on='open_time', how='left', suffixes=('', '_stored'), indicator=True)
+    found = (merged['_merge'] == 'both').to_numpy()
+    changed = found & (merged[[f"{name}_stored" for name in KLINE_COLUMNS[1:]]].to_numpy()
+                       != merged[KLINE_COLUMNS[1:]].to_numpy()).any(axis=1)
+    replaced = stored.set_index('open_time').loc[merged.loc[changed, 'open_time']].reset_index()
+    return late[~found], late[changed], replaced[KLINE_COLUMNS]
+
+
+def ingest_klines(symbol, klines, feature_store=None):
+    """
+    Write the 1m `klines` into `symbol`: append the new ones, backfill missing and
+    replace corrected earlier ones. Returns the number of klines written.
+    """
+    klines = klines[KLINE_COLUMNS].copy()
+    klines['open_time'] = pd.to_datetime(klines['open_time'])
+    klines['close_time'] = pd.to_datetime(klines['close_time'])
+    klines = klines.sort_values('open_time').drop_duplicates('open_time', keep='last').reset_index(drop=True)
+    with engine.begin() as connection:
+        # No other ingest of the table may write between reading its last open_time and committing
+        lock_table(connection, symbol)
+        last = connection.execute(text(f"SELECT MAX(open_time) FROM {symbol}")).scalar()
+        late = klines.iloc[:0] if last is None else klines[klines['open_time'] <= pd.Timestamp(last)]
+        new = klines.iloc[len(late):]
+        missing = corrected = replaced = late
+        if not late.empty:
+            missing, corrected, replaced = split_late(connection, symbol, late)
+        inserted = pd.concat([missing, new])
+        if not inserted.empty:
+            inserted.to_sql(symbol, connection, if_exists="append", index=False, chunksize=10_000)
+        if not corrected.empty:
+            stored = kline_table(symbol)
+            rows = corrected.to_dict('records')
+            for row in rows:
+                row['stored_open_time'] = row.pop('open_time').to_pydatetime()
+                row['close_time'] = row['close_time'].to_pydatetime()
+            connection.execute(stored.update().where(stored.c.open_time == bindparam('stored_open_time')), rows)
+        # The month summaries change in the same transaction as the klines
+        record_partitions(connection, symbol, pd.concat([inserted, corrected]), replaced=replaced)
+    logger.info(f"Ingested {len(new)} klines into {symbol}")
+    if not late.empty:
+        logger.warning(f"{symbol}: {len(late)} klines at or before {last}: {len(missing)} backfilled, "
+                       f"{len(corrected)} corrected, {len(late) - len(missing) - len(corrected)} already stored")
+
+    if feature_store is not None:
+        if not missing.empty or not corrected.empty:
+            # Klines the sets already consumed changed; they are rebuilt from the table
+            feature_store.reset(symbol)
+            feature_store.extend(symbol, new.reset_index(drop=True))
+        elif not new.empty:
+            feature_store.extend(symbol, new.reset_index(drop=True))
+    return len(inserted) + len(corrected)
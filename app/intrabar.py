@@ -0,0 +1,103 @@
+import numpy as np
+import pandas as pd
+from loguru import logger
+from fills import resolve_exit
+from indicators import Strategy
+from risk_management import RiskManagement
+from trading_algorithm import TradingSystem, resample_klines
+
+
+def _epoch_ns(times):
+    return pd.DatetimeIndex(times).as_unit('ns').asi8
+
+
+def minute_offsets(bars, minutes):
+    """
+    [start, end) positions in `minutes` of the 1m klines inside each bar of `bars`.
+
+    Both frames are sorted by open_time; a minute belongs to a bar when it opens at
+    or after the bar's open and closes at or before the bar's close.
+    """
+    start = np.searchsorted(_epoch_ns(minutes['open_time']), _epoch_ns(bars['open_time']), side='left')
+    end = np.searchsorted(_epoch_ns(minutes['close_time']), _epoch_ns(bars['close_time']), side='right')
+    return start, end
+
+
+class IntrabarTradingSystem(TradingSystem):
+    """
+    TradingSystem that takes its signals on `timeframe` bars and fills its exits
+    inside them.
+
+    The 1m klines behind every coarse bar are kept with their [start, end) offsets.
+    A bar whose own high/low stays between the stop-loss and target levels is
+    skipped without looking at its minutes; otherwise the minutes are scanned for
+    the first level touched (the stop wins when one minute touches both) and the
+    trade fills at that level and minute, or at the minute's open when it opens
+    below the stop (a gap through it). Levels use the ATR of the previous bar,
+    since the current bar's ATR is not known until it closes.
+    """
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.minute_open = None
+        self.minute_high = None
+        self.minute_low = None
+        self.minute_close_time = None
+        self.intrabar_scans = 0  # Bars whose minutes had to be looked at
+
+    def prepare_data(self):
+        minutes = self.fetch_data_from_db()
+        if minutes.empty:
+            logger.error("No data fetched from the database.")
+            return None
+
+        bars = resample_klines(minutes, self.timeframe) if self.timeframe else minutes.copy()
+        data = Strategy(bars, **self.strategy_params).get_decision()
+
+        self.minute_open = minutes['open_price'].to_numpy(dtype=float)
+        self.minute_high = minutes['high_price'].to_numpy(dtype=float)
+        self.minute_low = minutes['low_price'].to_numpy(dtype=float)
+        self.minute_close_time = minutes['close_time'].to_numpy()
+        data['minute_start'], data['minute_end'] = minute_offsets(data, minutes)
+        data['ATR_prev'] = data['ATR'].shift(1).fillna(data['ATR'])
+        return data
+
+    def check_exit(self, cycle, current_row):
+        if cycle.get("buy_time") >= current_row['close_time']:
+            return None  # Entered at this bar's close, none of its minutes come after
+
+        buy_price = cycle.get("buy_price")
+        stop_price, target_price = RiskManagement.exit_levels(
+            buy_price, cycle.get("profit"), self.stoploss, current_row['ATR_prev']
+        )
+        if current_row['low_price'] > stop_price and current_row['high_price'] < target_price:
+            return None
+
+        self.intrabar_scans += 1
+        j, outcome = resolve_exit(
+            self.minute_high, self.minute_low, int(current_row['minute_start']),
+            target_price, stop_price, stop=int(current_row['minute_end'])
+        )
+        if j == -1:
+            return None
+
+        sell_price = target_price if outcome == "PROFIT" else min(stop_price, self.minute_open[j])
+        units = cycle.get("amount_invested") / buy_price
+        net_profit = (sell_price - buy_price) * units
+        cycle["exit_reason"] = "PROFIT" if outcome == "PROFIT" else "LOSS"
+        logger.info(f"Intrabar {cycle['exit_reason']} exit at {sell_price:.2f} on {self.minute_close_time[j]} "
+                    f"| PnL: {net_profit:.2f} | Entry: {buy_price} at {cycle.get('buy_time')}")
+        return sell_price, pd.Timestamp(self.minute_close_time[j]), net_profit
+
+
+if __name__ == "__main__":
+    trading_system = IntrabarTradingSystem(
+        month="2024-08",
+        symbol="kline_btc",
+        timeframe="15min",
+        target_profit=5,
+        stoploss=30,
+        initial_investment=600,
+    )
+    trading_system.run_trading_cycle()
+    trading_system.print_metrics()
@@ -0,0 +1,305 @@
+import numpy as np
+import pandas as pd
+
+SECONDS_PER_YEAR = 365 * 24 * 3600
+
+
+def trade_arrays(trade_cycles):
+    """
+    Column arrays for a list of trade cycle dicts.
+
+    Trades without a sell_time are still open: their exit time is NaT and their
+    profit_loss counts as 0.
+    """
+    buy_time = pd.to_datetime([c.get("buy_time") for c in trade_cycles]).to_numpy(dtype="datetime64[ns]")
+    sell_time = pd.to_datetime([c.get("sell_time") for c in trade_cycles]).to_numpy(dtype="datetime64[ns]")
+    pnl = np.array([c.get("profit_loss") or 0.0 for c in trade_cycles], dtype=float)
+    invested = np.array([c.get("amount_invested") or 0.0 for c in trade_cycles], dtype=float)
+    return {"buy_time": buy_time, "sell_time": sell_time, "pnl": pnl, "amount_invested": invested}
+
+
+def equity_curve(bar_time, exit_time, pnl, initial_balance):
+    """Realized equity at the close of every bar, booking each trade's P&L on its exit bar."""
+    closed = ~np.isnat(exit_time)
+    exit_idx = np.searchsorted(bar_time, exit_time[closed], side="left")
+    exit_idx = np.minimum(exit_idx, len(bar_time) - 1)
+    realized = np.bincount(exit_idx, weights=pnl[closed], minlength=len(bar_time))
+    return initial_balance + np.cumsum(realized)
+
+
+def drawdown(equity, bar_time=None):
+    """Return (max_drawdown, max_duration_bars, max_duration_time) of an equity curve."""
+    peak = np.maximum.accumulate(equity)
+    max_dd = float(((peak - equity) / peak).max()) if equity.size else 0.0
+
+    # Bars since the last time equity was at its running peak
+    idx = np.arange(equity.size)
+    last_peak = np.maximum.accumulate(np.where(equity >= peak, idx, 0))
+    underwater = idx - last_peak
+    if not underwater.size:
+        return max_dd, 0, pd.Timedelta(0)
+    worst = int(underwater.argmax())
+    duration = pd.Timedelta(0)
+    if bar_time is not None:
+        duration = pd.Timedelta(bar_time[worst] - bar_time[last_peak[worst]])
+    return max_dd, int(underwater[worst]), duration
+
+
+def exposure(bar_time, entry_time, exit_time):
+    """Fraction of bars with at least one open position."""
+    n = len(bar_time)
+    if n == 0 or len(entry_time) == 0:
+        return 0.0
+    entry_idx = np.searchsorted(bar_time, entry_time, side="left")
+    exit_idx = np.where(np.isnat(exit_time), n, np.searchsorted(bar_time, exit_time, side="left"))
+    open_count = np.cumsum(np.bincount(entry_idx, minlength=n + 1) - np.bincount(exit_idx, minlength=n + 1))[:n]
+    return float((open_count > 0).mean())
+
+
+def compute_metrics(pnl, entry_time, exit_time, bar_time, initial_balance,
+                    invested=None, periods_per_year=None):
+    """
+    Performance metrics of one run from trade and bar arrays.
+
+    `bar_time` is the close_time of every simulated bar (sorted), `entry_time` and
+    `exit_time` the buy/sell times of every trade (NaT exit for open trades).
+    Sharpe and Sortino are computed on per-bar equity returns and annualized from
+    the median bar spacing unless `periods_per_year` is given.
+    """
+    pnl = np.asarray(pnl, dtype=float)
+    bar_time = np.asarray(bar_time, dtype="datetime64[ns]")
+    entry_time = np.asarray(entry_time, dtype="datetime64[ns]")
+    exit_time = np.asarray(exit_time, dtype="datetime64[ns]")
+    closed = ~np.isnat(exit_time)
+    closed_pnl = pnl[closed]
+
+    gross_profit = float(closed_pnl[closed_pnl > 0].sum())
+    gross_loss = float(closed_pnl[closed_pnl < 0].sum())
+    wins = int((closed_pnl > 0).sum())
+    n_closed = int(closed.sum())
+
+    equity = equity_curve(bar_time, exit_time, pnl, initial_balance) if bar_time.size else np.array([initial_balance])
+    returns = np.diff(equity) / equity[:-1] if equity.size > 1 else np.zeros(0)
+
+    if periods_per_year is None and bar_time.size > 1:
+        bar_seconds = np.median(np.diff(bar_time).astype("timedelta64[ms]").astype(float)) / 1000
+        periods_per_year = SECONDS_PER_YEAR / bar_seconds if bar_seconds > 0 else 0
+    annualization = np.sqrt(periods_per_year or 0)
+
+    std = returns.std() if returns.size else 0.0
+    downside = np.sqrt(np.mean(np.minimum(returns, 0) ** 2)) if returns.size else 0.0
+    mean_return = returns.mean() if returns.size else 0.0
+
+    trade_returns = np.zeros(0)
+    if invested is not None:
+        invested = np.asarray(invested, dtype=float)[closed]
+        trade_returns = np.divide(closed_pnl, invested, out=np.zeros_like(closed_pnl), where=invested != 0)
+
+    max_dd, max_dd_bars, max_dd_duration = drawdown(equity, bar_time if bar_time.size else None)
+
+    return {
+        "Total Trades": n_closed,
+        "Open Trades": int((~closed).sum()),
+        "Net Profit": gross_profit,
+        "Net Loss": gross_loss,
+        "Net Profit/Loss": gross_profit + gross_loss,
+        "Final Balance": float(equity[-1]),
+        "Win Rate": wins / n_closed if n_closed else 0.0,
+        "Profit Factor": gross_profit / -gross_loss if gross_loss else float("inf") if gross_profit else 0.0,
+        "Average Trade Return": float(trade_returns.mean()) if trade_returns.size else 0.0,
+        "Sharpe Ratio": float(mean_return / std * annualization) if std else 0.0,
+        "Sortino Ratio": float(mean_return / downside * annualization) if downside else 0.0,
+        "Max Drawdown": max_dd,
+        "Max Drawdown Bars": max_dd_bars,
+        "Max Drawdown Duration": max_dd_duration,
+        "Exposure": exposure(bar_time, entry_time, exit_time),
+    }
+
+
+class MetricsAccumulator:
+    """
+    compute_metrics over a run whose bars arrive chunk by chunk, from running
+    sums instead of the whole bar and trade history.
+
+    Each update() takes the close_time of the chunk's bars (after those of earlier
+    chunks), the trade cycles closed during it and the positions open at its end.
+    The state is a few scalars plus the bar ranges of the positions still open, so
+    it is cheap to checkpoint. Results agree with compute_metrics over the
+    concatenated arrays up to float rounding, except that periods_per_year comes
+    from the bar spacing of the first chunk.
+    """
+
+    def __init__(self, initial_balance, periods_per_year=None):
+        self.initial_balance = initial_balance
+        self.periods_per_year = periods_per_year
+        self.bars = 0
+        self.last_time = None         # close_time of the last bar (datetime64[ns])
+        self.equity = initial_balance
+        # Trades
+        self.n_closed = 0
+        self.wins = 0
+        self.gross_profit = 0.0
+        self.gross_loss = 0.0
+        self.trade_return_sum = 0.0
+        # Per-bar returns: count, mean and sum of squared deviations (Chan et al.), downside squares
+        self.returns = 0
+        self.mean_return = 0.0
+        self.m2 = 0.0
+        self.downside_squares = 0.0
+        # Drawdown
+        self.peak = initial_balance
+        self.max_drawdown = 0.0
+        self.last_peak = 0            # Index and close_time of the last bar at the running peak
+        self.last_peak_time = None
+        self.worst_bars = 0
+        self.worst_duration = pd.Timedelta(0)
+        # Exposure: bars known to be covered by a trade, the covered ranges [start, end)
+        # a position still open may overlap, and the entry bar of every open position
+        self.exposed_bars = 0
+        self.covered = []
+        self.entry_index = {}
+
+    def update(self, bar_time, closed, open_positions):
+        bar_time = np.asarray(bar_time, dtype="datetime64[ns]")
+        n = len(bar_time)
+        if n == 0:
+            return
+        closed_trades = trade_arrays(closed)
+        opened = trade_arrays(open_positions)
+        pnl, exit_time = closed_trades["pnl"], closed_trades["sell_time"]
+
+        self.n_closed += len(pnl)
+        self.wins += int((pnl > 0).sum())
+        self.gross_profit += float(pnl[pnl > 0].sum())
+        self.gross_loss += float(pnl[pnl < 0].sum())
+        invested = closed_trades["amount_invested"]
+        self.trade_return_sum += float(np.divide(pnl, invested, out=np.zeros_like(pnl), where=invested != 0).sum())
+
+        if self.periods_per_year is None:
+            times = bar_time if self.last_time is None else np.concatenate(([self.last_time], bar_time))
+            if len(times) > 1:
+                bar_seconds = np.median(np.diff(times).astype("timedelta64[ms]").astype(float)) / 1000
+                self.periods_per_year = SECONDS_PER_YEAR / bar_seconds if bar_seconds > 0 else 0
+
+        # Equity of the chunk, behind the last equity of the previous one
+        equity = equity_curve(bar_time, exit_time, pnl, self.equity)
+        previous = np.concatenate(([self.equity], equity))
+        if self.bars == 0:
+            previous = previous[1:]  # The first bar has no return
+        returns = np.diff(previous) / previous[:-1]
+        if returns.size:
+            delta = returns.mean() - self.mean_return
+            total = self.returns + returns.size
+            self.m2 += ((returns - returns.mean()) ** 2).sum() + delta ** 2 * self.returns * returns.size / total
+            self.mean_return += delta * returns.size / total
+            self.returns = total
+            self.downside_squares += float((np.minimum(returns, 0) ** 2).sum())
+
+        index = self.bars + np.arange(n)
+        # The running peak starts at the first bar's equity, like compute_metrics
+        peak = np.maximum.accumulate(np.maximum(equity, equity[0] if self.bars == 0 else self.peak))
+        self.max_drawdown = max(self.max_drawdown, float(((peak - equity) / peak).max()))
+        last_peak = np.maximum.accumulate(np.where(equity >= peak, index, self.last_peak))
+        underwater = index - last_peak
+        worst = int(underwater.argmax())
+        peak_times = np.where(last_peak >= self.bars, bar_time[np.maximum(last_peak - self.bars, 0)],
+                              self.last_peak_time if self.last_peak_time is not None else bar_time[0])
+        if self.last_time is None or underwater[worst] > self.worst_bars:
+            self.worst_bars = int(underwater[worst])
+            self.worst_duration = pd.Timedelta(bar_time[worst] - peak_times[worst])
+        self.last_peak = int(last_peak[-1])
+        self.last_peak_time = peak_times[-1]
+        self.peak = float(peak[-1])
+
+        # A trade covers the bars from its entry up to, not including, its exit; only
+        # trades that close or are still open count, like in compute_metrics
+        for entry_time in np.concatenate((closed_trades["buy_time"], opened["buy_time"])):
+            if entry_time >= bar_time[0]:
+                self.entry_index[int(entry_time.view("i8"))] = self.bars + int(np.searchsorted(bar_time, entry_time))
+        exit_index = self.bars + np.searchsorted(bar_time, exit_time)
+        for entry_time, end in zip(closed_trades["buy_time"], exit_index):
+            self.covered = self._cover(self.covered, self.entry_index[int(entry_time.view("i8"))], int(end))
+        open_entries = [self.entry_index[int(t.view("i8"))] for t in opened["buy_time"]]
+        self.entry_index = dict(zip(opened["buy_time"].view("i8").tolist(), open_entries))
+        # Later trades start at or after the earliest open entry, so the bars before it are final
+        final = min(open_entries, default=self.bars + n)
+        for start, end in self.covered:
+            self.exposed_bars += max(0, min(end, final) - start)
+        self.covered = [[max(start, final), end] for start, end in self.covered if end > final]
+
+        self.equity = float(equity[-1])
+        self.bars += n
+        self.last_time = bar_time[-1]
+
+    @staticmethod
+    def _cover(covered, start, end):
+        """The disjoint, sorted bar ranges `covered` with [start, end) added."""
+        if start >= end:
+            return covered
+        merged = []
+        for other in covered:
+            if other[1] < start or other[0] > end:
+                merged.append(other)
+            else:
+                start, end = min(start, other[0]), max(end, other[1])
+        return sorted(merged + [[start, end]])
+
+    def exposure(self):
+        """Fraction of the bars so far with at least one position open, the open ones included."""
+        if not self.bars:
+            return 0.0
+        covered = self.covered
+        for start in self.entry_index.values():
+            covered = self._cover(covered, start, self.bars)
+        return (self.exposed_bars + sum(end - start for start, end in covered)) / self.bars
+
+    def result(self, open_positions=()):
+        """The metrics of compute_metrics, as of the last update."""
+        std = np.sqrt(self.m2 / self.returns) if self.returns else 0.0
+        downside = np.sqrt(self.downside_squares / self.returns) if self.returns else 0.0
+        annualization = np.sqrt(self.periods_per_year or 0)
+        return {
+            "Total Trades": self.n_closed,
+            "Open Trades": len(open_positions),
+            "Net Profit": self.gross_profit,
+            "Net Loss": self.gross_loss,
+            "Net Profit/Loss": self.gross_profit + self.gross_loss,
+            "Final Balance": self.equity,
+            "Win Rate": self.wins / self.n_closed if self.n_closed else 0.0,
+            "Profit Factor": (self.gross_profit / -self.gross_loss if self.gross_loss
+                              else float("inf") if self.gross_profit else 0.0),
+            "Average Trade Return": self.trade_return_sum / self.n_closed if self.n_closed else 0.0,
+            "Sharpe Ratio": float(self.mean_return / std * annualization) if std else 0.0,
+            "Sortino Ratio": float(self.mean_return / downside * annualization) if downside else 0.0,
+            "Max Drawdown": self.max_drawdown,
+            "Max Drawdown Bars": self.worst_bars,
+            "Max Drawdown Duration": self.worst_duration,
+            "Exposure": self.exposure(),
+        }
+
+
+def metrics_by_run(run_index, pnl, n_runs=None):
+    """
+    Trade-level metrics for many runs at once from flat trade arrays.
+
+    `run_index[i]` is the run (0..n_runs-1) trade i belongs to, e.g. the codes of a
+    sweep's run_id column. Everything is a bincount over the trades, so millions of
+    trades reduce in a few array passes.
+    """
+    run_index = np.asarray(run_index)
+    pnl = np.asarray(pnl, dtype=float)
+    n_runs = n_runs or (int(run_index.max()) + 1 if run_index.size else 0)
+    trades = np.bincount(run_index, minlength=n_runs)
+    wins = np.bincount(run_index, weights=(pnl > 0).astype(float), minlength=n_runs)
+    gross_profit = np.bincount(run_index, weights=np.maximum(pnl, 0), minlength=n_runs)
+    gross_loss = np.bincount(run_index, weights=np.minimum(pnl, 0), minlength=n_runs)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return {
+            "Total Trades": trades,
+            "Net Profit": gross_profit,
+            "Net Loss": gross_loss,
+            "Net Profit/Loss": gross_profit + gross_loss,
+            "Win Rate": np.where(trades > 0, wins / np.maximum(trades, 1), 0.0),
+            "Profit Factor": np.where(gross_loss < 0, gross_profit / -gross_loss,
+                                      np.where(gross_profit > 0, np.inf, 0.0)),
+        }
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, Float, DateTime
+from sqlalchemy import Column, Integer, BigInteger, Float, DateTime, String
 from connection import Base
 
 class Kline(Base):
@@ -85,4 +85,21 @@ class Kline_BTCS(Base):
     high_price = Column(Float, nullable=False)
     low_price = Column(Float, nullable=False)
     close_price = Column(Float, nullable=False)
-    volume = Column(Float, nullable=False)
\ No newline at end of file
+    volume = Column(Float, nullable=False)
+
+
+class KlinePartition(Base):
+    """
+    Summary of one month of a kline table, maintained by ingest.py in the same
+    transaction as the klines it describes (see partitions.py).
+    """
+    __tablename__ = "kline_partitions"
+
+    table_name = Column(String, primary_key=True)
+    interval = Column(String, primary_key=True, default="1m")
+    month = Column(String, primary_key=True)  # "YYYY-MM" of the open_time
+    row_count = Column(Integer, nullable=False)
+    min_open_time = Column(DateTime, nullable=False)
+    max_open_time = Column(DateTime, nullable=False)
+    seq = Column(BigInteger, nullable=False)  # Write batch that last changed the partition, increasing per table
+    checksum = Column(BigInteger, nullable=False)  # Sum of the row hashes modulo 2 ** 63
@@ -0,0 +1,156 @@
+import numpy as np
+import pandas as pd
+from loguru import logger
+from indicator_graph import DEFAULT_BACKEND, IndicatorGraph, atr, ema, macd, macd_signal, rsi
+from trading_algorithm import TradingSystem, resample_klines
+
+# Default stack, highest timeframe first; None is the stored 1m data itself
+DEFAULT_TIMEFRAMES = [("15min", "trend"), ("5min", "intraday"), (None, "confirmation")]
+
+
+# Indicator columns of each timeframe role
+ROLE_INDICATORS = {
+    'trend': {
+        'EMA50': ema('close_price', 50),
+        'EMA200': ema('close_price', 200),
+        'RSI': rsi('close_price', 14),
+    },
+    'intraday': {
+        'RSI': rsi('close_price', 7),
+        'MACD': macd('close_price'),
+        'MACD_signal': macd_signal('close_price'),
+    },
+}
+ROLE_INDICATORS['confirmation'] = ROLE_INDICATORS['intraday']
+
+
+def timeframe_signals(data, role, backend=DEFAULT_BACKEND):
+    """
+    Add the indicators of a timeframe role and a 0/1 'Signal' column to `data`.
+
+    trend:        EMA50 > EMA200 and 50 < RSI(14) < 70
+    intraday:     RSI(7) < 30 and MACD above its signal line
+    confirmation: same rule as intraday, on the entry timeframe
+    Warm-up rows keep Signal 0 instead of being dropped, so every bar stays aligned.
+    """
+    if role not in ROLE_INDICATORS:
+        raise ValueError(f"Unknown timeframe role: {role}")
+    for name, values in IndicatorGraph(data, backend).evaluate(ROLE_INDICATORS[role]).items():
+        data[name] = values
+    if role == 'trend':
+        signal = (data['EMA50'] > data['EMA200']) & (data['RSI'] > 50) & (data['RSI'] < 70)
+    else:
+        signal = (data['RSI'] < 30) & (data['MACD'] > data['MACD_signal'])
+    data['Signal'] = signal.astype(int)
+    return data
+
+
+def _epoch_ns(times):
+    return pd.DatetimeIndex(times).as_unit('ns').asi8
+
+
+def align_to_higher(lower_close_time, higher_close_time):
+    """
+    For every lower-timeframe bar, the position of the latest higher-timeframe bar
+    that had closed by the lower bar's close_time, or -1 if none had.
+
+    A higher bar counts only once its own close_time is reached, so a lower bar
+    never sees the higher bar it is still part of (no lookahead).
+    """
+    return np.searchsorted(_epoch_ns(higher_close_time), _epoch_ns(lower_close_time), side='right') - 1
+
+
+def recent_signal(signal, index, lookback=1):
+    """
+    Whether any of the `lookback` higher bars up to and including `index` has a
+    signal, for every entry of `index` (from align_to_higher) at once.
+
+    Uses a prefix count of signals, so each lookup is O(1) whatever the lookback.
+    """
+    counts = np.concatenate(([0], np.cumsum(np.asarray(signal, dtype=bool))))
+    upper = np.asarray(index) + 1  # -1 (no completed bar) gives an empty window
+    lower = np.maximum(upper - lookback, 0)
+    return counts[upper] > counts[lower]
+
+
+class MultiTimeframeStrategy:
+    """
+    Higher-timeframe filter / lower-timeframe entry strategy.
+
+    `frames` is a list of (role, DataFrame) from the highest timeframe to the
+    entry timeframe. A bar's signal counts only if the next higher timeframe had a
+    confirmed signal within its last `lookback` completed bars, and so on up the
+    stack. Alignment indexes are built once per pair of timeframes; the result is
+    the entry frame with the Signal/type/ATR columns TradingSystem.process_bar reads.
+    Indicators are computed by the IndicatorGraph `backend`.
+    """
+
+    def __init__(self, frames, lookback=10, signal_type='SIGNAL_1', atr_length=14, backend=DEFAULT_BACKEND):
+        self.frames = frames
+        # One lookback per lower timeframe, in units of its parent's bars
+        if isinstance(lookback, int):
+            lookback = [lookback] * (len(frames) - 1)
+        self.lookback = lookback
+        self.signal_type = signal_type
+        self.atr_length = atr_length
+        self.backend = backend
+
+    def get_decision(self):
+        confirmed = None
+        parent_close_time = None
+        for level, (role, data) in enumerate(self.frames):
+            timeframe_signals(data, role, self.backend)
+            signal = data['Signal'].to_numpy() == 1
+            if confirmed is not None:
+                index = align_to_higher(data['close_time'], parent_close_time)
+                signal &= recent_signal(confirmed, index, self.lookback[level - 1])
+            logger.info(f"{role} timeframe: {int(signal.sum())} confirmed signals over {len(data)} bars")
+            confirmed, parent_close_time = signal, data['close_time']
+
+        data = self.frames[-1][1]
+        data['ATR'] = IndicatorGraph(data, self.backend).evaluate(
+            {'ATR': atr('high_price', 'low_price', 'close_price', self.atr_length)})['ATR']
+        data['Signal'] = np.where(confirmed, 1, np.nan)
+        data['type'] = np.where(confirmed, self.signal_type, None)
+        indicator_columns = [c for c in data.columns if c not in ('Signal', 'type')]
+        return data.dropna(subset=indicator_columns)
+
+
+class MultiTimeframeTradingSystem(TradingSystem):
+    """
+    TradingSystem that trades MultiTimeframeStrategy entries.
+
+    The 1m klines are fetched once and resampled to every timeframe of
+    `timeframes` (list of (timeframe, role), highest first; None keeps 1m). The
+    indicator backend is strategy_params['backend'], as for Strategy.
+    """
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.timeframes = kwargs.get('timeframes', DEFAULT_TIMEFRAMES)
+        self.lookback = kwargs.get('lookback', 10)
+        self.signal_type = kwargs.get('signal_type', 'SIGNAL_1')
+
+    def prepare_data(self):
+        data = self.fetch_data_from_db()
+        if data.empty:
+            logger.error("No data fetched from the database.")
+            return None
+
+        frames = [(role, resample_klines(data, timeframe) if timeframe else data.copy())
+                  for timeframe, role in self.timeframes]
+        strategy = MultiTimeframeStrategy(frames, lookback=self.lookback, signal_type=self.signal_type,
+                                          backend=self.strategy_params.get('backend', DEFAULT_BACKEND))
+        return strategy.get_decision()
+
+
+if __name__ == "__main__":
+    trading_system = MultiTimeframeTradingSystem(
+        month="2024-08",
+        symbol="kline_btc",
+        target_profit=5,
+        stoploss=30,
+        initial_investment=600,
+    )
+    trading_system.run_trading_cycle()
+    trading_system.print_metrics()
@@ -0,0 +1,193 @@
+"""
+Paper trading on a stream of closed klines.
+
+A kline source is any object with an async `stream()` generator yielding closed 1m
+klines as dicts with open_time, close_time and the *_price/volume columns.
+ReplayKlineSource replays stored klines (optionally paced in real time) and stands
+in for the exchange; WebSocketKlineSource reads Binance kline streams.
+"""
+import asyncio
+import bisect
+import json
+import time
+from itertools import accumulate, islice
+import pandas as pd
+from loguru import logger
+from incremental import IncrementalStrategy
+from portfolio import stream_klines
+from trading_algorithm import TradingSystem
+
+try:
+    import websockets
+except ImportError:  # websockets is optional, replay works without it
+    websockets = None
+
+
+class ReplayKlineSource:
+    """
+    Replays a symbol's stored klines in [start, end].
+
+    `speed` is how many times faster than real time bars are released (60 turns a
+    1m bar into one second); None replays as fast as the consumer takes them.
+    """
+
+    def __init__(self, symbol, start=None, end=None, speed=None, batch_size=1000):
+        self.symbol = symbol
+        self.start = start
+        self.end = end
+        self.speed = speed
+        self.batch_size = batch_size
+
+    async def stream(self):
+        rows = stream_klines(self.symbol, self.start, self.end, chunksize=self.batch_size)
+        previous_close = None
+        while True:
+            # The DB read blocks, so batches are pulled on a worker thread
+            batch = await asyncio.to_thread(lambda: list(islice(rows, self.batch_size)))
+            if not batch:
+                return
+            for bar in batch:
+                if self.speed and previous_close is not None:
+                    gap = (bar['close_time'] - previous_close).total_seconds()
+                    await asyncio.sleep(max(gap, 0) / self.speed)
+                previous_close = bar['close_time']
+                yield bar
+
+
+class WebSocketKlineSource:
+    """Closed klines from a Binance kline websocket, e.g. wss://stream.binance.com:9443/ws/btcusdt@kline_1m."""
+
+    def __init__(self, url, symbol=""):
+        if websockets is None:
+            raise ImportError("websockets is required for WebSocketKlineSource")
+        self.url = url
+        self.symbol = symbol
+
+    async def stream(self):
+        async with websockets.connect(self.url) as connection:
+            async for message in connection:
+                kline = json.loads(message).get("k")
+                if not kline or not kline["x"]:
+                    continue  # Only closed bars reach the strategy
+                yield {
+                    "symbol": self.symbol,
+                    "open_time": pd.Timestamp(kline["t"], unit="ms"),
+                    "close_time": pd.Timestamp(kline["T"], unit="ms"),
+                    "open_price": float(kline["o"]),
+                    "high_price": float(kline["h"]),
+                    "low_price": float(kline["l"]),
+                    "close_price": float(kline["c"]),
+                    "volume": float(kline["v"]),
+                }
+
+
+class LatencyHistogram:
+    """
+    Histogram of per-bar decision latencies with log-spaced microsecond buckets.
+
+    Only the bucket counts, sum and maximum are kept, so memory stays constant
+    however long the trader runs; percentiles are read off the buckets.
+    """
+
+    BOUNDS_US = [10, 20, 50, 100, 200, 500, 1_000, 2_000, 5_000, 10_000, 50_000]
+
+    def __init__(self):
+        self.counts = [0] * (len(self.BOUNDS_US) + 1)
+        self.n = 0
+        self.total_ns = 0
+        self.max_ns = 0
+
+    def record(self, elapsed_ns):
+        self.counts[bisect.bisect_left(self.BOUNDS_US, elapsed_ns / 1000)] += 1
+        self.n += 1
+        self.total_ns += elapsed_ns
+        self.max_ns = max(self.max_ns, elapsed_ns)
+
+    def percentile(self, q):
+        """
+        q-th percentile in microseconds, as the upper bound of the bucket holding it
+        (the largest latency seen for the overflow bucket, or when it is lower).
+        """
+        if not self.n:
+            return 0.0
+        rank = min(self.n - 1, int(q / 100 * self.n))
+        bucket = bisect.bisect_right(list(accumulate(self.counts)), rank)
+        max_us = self.max_ns / 1000
+        return min(self.BOUNDS_US[bucket], max_us) if bucket < len(self.BOUNDS_US) else max_us
+
+    def summary(self):
+        n = self.n
+        labels = [f"<={b}us" for b in self.BOUNDS_US] + [f">{self.BOUNDS_US[-1]}us"]
+        return {
+            "bars": n,
+            "mean_us": self.total_ns / n / 1000 if n else 0.0,
+            "p50_us": self.percentile(50),
+            "p99_us": self.percentile(99),
+            "max_us": self.max_ns / 1000,
+            "histogram": dict(zip(labels, self.counts)),
+        }
+
+
+class PaperTrader:
+    """
+    Runs the strategy and RiskManagement exits on every closed bar of a source.
+
+    Indicators are updated with IncrementalStrategy, so each decision costs the same
+    whatever the history length; the time from receiving a bar to finishing its
+    entries/exits is recorded per bar and compared with `latency_budget_ms`.
+    """
+
+    def __init__(self, source, symbol, strategy_params=None, latency_budget_ms=1.0, **trading_params):
+        self.source = source
+        self.system = TradingSystem(symbol=symbol, **trading_params)
+        self.strategy = IncrementalStrategy(**(strategy_params or {}))
+        self.latency = LatencyHistogram()
+        self.budget_ns = int(latency_budget_ms * 1_000_000)
+        self.over_budget = 0
+        self.bars = 0
+
+    def on_bar(self, bar):
+        started = time.perf_counter_ns()
+        row = self.strategy.update(bar)
+        if row is not None:
+            self.system.process_bar(row)
+        elapsed = time.perf_counter_ns() - started
+
+        self.bars += 1
+        self.latency.record(elapsed)
+        if elapsed > self.budget_ns:
+            self.over_budget += 1
+            logger.warning(f"Bar {bar['open_time']} took {elapsed / 1e6:.3f} ms (budget {self.budget_ns / 1e6} ms)")
+
+    async def run(self, max_bars=None):
+        async for bar in self.source.stream():
+            self.on_bar(bar)
+            if self.system.current_balance <= 0:
+                logger.warning("Account liquidated, stopping paper trading")
+                break
+            if max_bars is not None and self.bars >= max_bars:
+                break
+        if self.system.trade_log:
+            self.system.trade_log.flush()
+        return self.summary()
+
+    def summary(self):
+        return {
+            "symbol": self.system.symbol,
+            "bars": self.bars,
+            "balance": self.system.current_balance,
+            "open_cycles": len([c for c in self.system.is_cycle if "sell_price" not in c]),
+            "closed_trades": len(self.system.trade_cycles),
+            "over_budget": self.over_budget,
+            "latency": self.latency.summary(),
+        }
+
+
+if __name__ == "__main__":
+    # Per-bar logging of the trading loop would dominate the latency
+    logger.disable("trading_algorithm")
+    logger.disable("risk_management")
+
+    source = ReplayKlineSource("kline_btc", start="2024-08-01", end="2024-08-31 23:59:59")
+    trader = PaperTrader(source, "kline_btc", initial_investment=600, stoploss=30)
+    print(asyncio.run(trader.run()))
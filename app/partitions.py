@@ -0,0 +1,206 @@
+"""
+Per-month fingerprints of the kline tables.
+
+kline_partitions holds one row per table, interval and month: row count, first
+and last open_time, the write batch that last changed it (`seq`) and a checksum,
+the sum of one 64-bit hash per kline. Being a sum, the checksum of a month is
+updated from the new rows alone, in the transaction that inserts them, so it is
+only computed over the whole month once, when the month gets its row:
+
+    with engine.begin() as connection:
+        klines.to_sql(symbol, connection, ...)
+        record_partitions(connection, symbol, klines)
+
+Writers of a table are serialized by lock_table for the rest of their
+transaction. A cache then validates a range with one primary-key range scan,
+provided every month of the range has a row:
+
+    partition_fingerprint("kline_btc", "2024-07-01", "2024-09-30 23:59:59")
+
+Months are the granularity: a change anywhere in a month changes the fingerprint
+of every range touching it.
+"""
+import hashlib
+import numpy as np
+import pandas as pd
+from loguru import logger
+from sqlalchemy import DateTime, Float, column, func, select, table as sql_table
+from sqlalchemy.exc import OperationalError, ProgrammingError
+from connection import engine
+from model import KlinePartition
+from trading_algorithm import kline_chunks
+
+partitions = KlinePartition.__table__
+
+PRICE_COLUMNS = ('open_price', 'high_price', 'low_price', 'close_price', 'volume')
+
+CHECKSUM_MODULUS = 2 ** 63  # Fits a signed BIGINT; sums stay consistent since it divides 2 ** 64
+
+
+def row_hashes(klines):
+    """One uint64 per kline, independent of the time unit and of the column order of `klines`."""
+    frame = pd.DataFrame({
+        'open_time': klines['open_time'].to_numpy(dtype="datetime64[ns]").view("i8"),
+        'close_time': klines['close_time'].to_numpy(dtype="datetime64[ns]").view("i8"),
+        **{name: klines[name].to_numpy(dtype=float) for name in PRICE_COLUMNS},
+    })
+    return pd.util.hash_pandas_object(frame, index=False).to_numpy()
+
+
+def partition_stats(klines):
+    """Row count, open_time range and checksum of `klines` per "YYYY-MM" month."""
+    open_time = pd.to_datetime(klines['open_time'])
+    stats = pd.DataFrame({'open_time': open_time.to_numpy(), 'hash': row_hashes(klines)})
+    stats['month'] = open_time.dt.strftime("%Y-%m").to_numpy()
+    grouped = stats.groupby('month')
+    return pd.DataFrame({
+        'row_count': grouped.size(),
+        'min_open_time': grouped['open_time'].min(),
+        'max_open_time': grouped['open_time'].max(),
+        # uint64 sums wrap around, i.e. are taken modulo 2 ** 64
+        'checksum': grouped['hash'].agg(lambda hashes: int(hashes.to_numpy().sum(dtype=np.uint64)) % CHECKSUM_MODULUS),
+    })
+
+
+def kline_table(table):
+    """Typed handle on a kline table, so datetimes bind in the format to_sql stored them in."""
+    return sql_table(table, column('open_time', DateTime), column('close_time', DateTime),
+                     *[column(name, Float) for name in PRICE_COLUMNS])
+
+
+def lock_table(connection, table):
+    """
+    Serialize the writers of `table` until the caller's transaction ends, so that
+    reading the last open_time, seq and partition rows and writing them back is
+    not interleaved with another ingest. PostgreSQL takes a transaction-level
+    advisory lock; SQLite has a single writer already, and a transaction that read
+    before another one wrote fails with "database is locked" instead.
+    """
+    if connection.dialect.name == "postgresql":
+        key = int.from_bytes(hashlib.sha256(f"klines:{table}".encode()).digest()[:8], "big", signed=True)
+        connection.execute(select(func.pg_advisory_xact_lock(key)))
+
+
+def month_klines(connection, table, month):
+    """Every kline of `table` in a "YYYY-MM" month, read in the caller's transaction."""
+    klines = kline_table(table)
+    start = pd.Timestamp(f"{month}-01")
+    end = start + pd.offsets.MonthBegin()
+    query = select(klines).where(klines.c.open_time >= start.to_pydatetime(),
+                                 klines.c.open_time < end.to_pydatetime())
+    month = pd.read_sql_query(query, connection)
+    month['open_time'] = pd.to_datetime(month['open_time'])
+    month['close_time'] = pd.to_datetime(month['close_time'])
+    return month
+
+
+def _write_partition(connection, table, interval, month, stats, seq, existing=None):
+    values = dict(row_count=int(stats['row_count']),
+                  min_open_time=pd.Timestamp(stats['min_open_time']).to_pydatetime(),
+                  max_open_time=pd.Timestamp(stats['max_open_time']).to_pydatetime(),
+                  seq=seq, checksum=int(stats['checksum']))
+    if existing is None:
+        connection.execute(partitions.insert().values(table_name=table, interval=interval, month=month, **values))
+    else:
+        connection.execute(partitions.update().where(
+            (partitions.c.table_name == table) & (partitions.c.interval == interval)
+            & (partitions.c.month == month)).values(**values))
+
+
+def record_partitions(connection, table, klines, interval="1m", replaced=None):
+    """
+    Add newly written `klines` to the partition rows of `table`, within the
+    caller's transaction. `replaced` are the stored klines that `klines` overwrote,
+    whose count and hashes are taken out again.
+
+    A month without a row yet gets one summarizing all of its klines in the table,
+    not only the new ones, so klines written before partitions were maintained
+    are not left out of it.
+    """
+    if klines.empty:
+        return
+    lock_table(connection, table)
+    seq = connection.execute(
+        select(func.coalesce(func.max(partitions.c.seq), 0)).where(partitions.c.table_name == table)
+    ).scalar() + 1
+    # Same open_times as the klines overwriting them, so their months are among the written ones
+    removed = partition_stats(replaced) if replaced is not None and not replaced.empty else None
+    for month, stats in partition_stats(klines).iterrows():
+        existing = connection.execute(select(partitions).where(
+            partitions.c.table_name == table, partitions.c.interval == interval, partitions.c.month == month,
+        )).fetchone()
+        if existing is None:
+            # The klines are already written, so the month's stats include them
+            _write_partition(connection, table, interval, month,
+                             partition_stats(month_klines(connection, table, month)).loc[month], seq)
+            continue
+        row_count, checksum = int(stats['row_count']), int(stats['checksum'])
+        if removed is not None and month in removed.index:
+            row_count -= int(removed.at[month, 'row_count'])
+            checksum = (checksum - int(removed.at[month, 'checksum'])) % CHECKSUM_MODULUS
+        _write_partition(connection, table, interval, month, {
+            'row_count': existing.row_count + row_count,
+            'min_open_time': min(existing.min_open_time, stats['min_open_time']),
+            'max_open_time': max(existing.max_open_time, stats['max_open_time']),
+            'checksum': (existing.checksum + checksum) % CHECKSUM_MODULUS,
+        }, seq, existing)
+
+
+def rebuild_partitions(table, interval="1m", chunksize=100_000):
+    """Recompute the partition rows of `table` from its klines, e.g. for data loaded before they existed."""
+    rows = 0
+    with engine.begin() as connection:
+        lock_table(connection, table)
+        seq = connection.execute(
+            select(func.coalesce(func.max(partitions.c.seq), 0)).where(partitions.c.table_name == table)
+        ).scalar() + 1
+        connection.execute(partitions.delete().where(
+            (partitions.c.table_name == table) & (partitions.c.interval == interval)))
+        # Chunks come in open_time order, so a month is complete once a later one starts
+        month, pending = None, []
+        for chunk in kline_chunks(table, chunksize=chunksize):
+            rows += len(chunk)
+            for chunk_month, klines in chunk.groupby(chunk['open_time'].dt.strftime("%Y-%m"), sort=True):
+                if chunk_month != month and pending:
+                    _write_partition(connection, table, interval, month,
+                                     partition_stats(pd.concat(pending)).loc[month], seq)
+                    pending = []
+                month = chunk_month
+                pending.append(klines)
+        if pending:
+            _write_partition(connection, table, interval, month, partition_stats(pd.concat(pending)).loc[month], seq)
+    logger.info(f"Rebuilt the partitions of {table} from {rows} klines")
+    return rows
+
+
+def _month(value):
+    return None if value is None else pd.Timestamp(value).strftime("%Y-%m")
+
+
+def partition_fingerprint(table, start_open_time=None, end_close_time=None, interval="1m"):
+    """
+    Fingerprint of the months of `table` that [start_open_time, end_close_time]
+    touches, from their partition rows. None unless every one of those months has
+    a row (or without a kline_partitions table), so the caller falls back to
+    scanning the klines; so does an open range, whose months are unknown.
+    """
+    if start_open_time is None or end_close_time is None:
+        return None
+    months = list(pd.period_range(_month(start_open_time), _month(end_close_time), freq="M").strftime("%Y-%m"))
+    query = select(partitions.c.month, partitions.c.row_count, partitions.c.min_open_time,
+                   partitions.c.max_open_time, partitions.c.checksum).where(
+        partitions.c.table_name == table, partitions.c.interval == interval,
+        partitions.c.month >= months[0], partitions.c.month <= months[-1])
+    try:
+        with engine.connect() as connection:
+            rows = connection.execute(query.order_by(partitions.c.month)).fetchall()
+    except (OperationalError, ProgrammingError):
+        return None  # Migration not applied yet
+    if [row.month for row in rows] != months:
+        return None  # Months not recorded (or without klines) may hold klines the rows miss
+    return hashlib.sha256(repr([tuple(row) for row in rows]).encode()).hexdigest()[:16]
+
+
+if __name__ == "__main__":
+    for symbol in ["kline_btc", "kline_eth", "kline_bnb", "kline_ada", "kline_dot", "kline_btcs"]:
+        rebuild_partitions(symbol)
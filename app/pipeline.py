@@ -0,0 +1,121 @@
+import queue
+import threading
+import time
+import pandas as pd
+from loguru import logger
+from trading_algorithm import TradingSystem
+
+_DONE = object()
+
+
+class PipelinedRunner:
+    """
+    Runs consecutive months through one TradingSystem while the next months are
+    fetched and prepared (DB read, resample, indicators) on a background thread.
+
+    At most `depth` prepared months wait in the queue, which bounds memory. Balance
+    and open cycles carry over from month to month. `stats` reports the time spent
+    preparing data, the time the simulation actually waited for it, and the
+    difference, i.e. the I/O time hidden behind computation.
+    """
+
+    def __init__(self, symbol, months, depth=1, **trading_params):
+        self.symbol = symbol
+        self.months = list(months)
+        self.depth = depth
+        self.trading_params = trading_params
+        self.system = TradingSystem(symbol=symbol, **trading_params)
+        self.stats = {}
+        self._stop = threading.Event()
+
+    def _prepare(self, month):
+        loader = TradingSystem(
+            symbol=self.symbol,
+            month=month,
+            timeframe=self.system.timeframe,
+            strategy_params=self.system.strategy_params,
+            trade_log=False,
+        )
+        return loader.prepare_data()
+
+    def _put(self, prepared, item):
+        """Wait for room in the queue, unless the consumer has given up; returns whether `item` was queued."""
+        while not self._stop.is_set():
+            try:
+                prepared.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _produce(self, prepared):
+        for month in self.months:
+            started = time.perf_counter()
+            try:
+                item = (month, self._prepare(month), time.perf_counter() - started)
+            except Exception as e:
+                item = (month, e, time.perf_counter() - started)
+            if not self._put(prepared, item) or isinstance(item[1], Exception):
+                return
+        self._put(prepared, _DONE)
+
+    def run(self):
+        prepared = queue.Queue(maxsize=self.depth)
+        producer = threading.Thread(target=self._produce, args=(prepared,), daemon=True)
+        started = time.perf_counter()
+        producer.start()
+
+        prepare_time = wait_time = simulate_time = 0.0
+        bar_times = []
+        try:
+            while True:
+                waited = time.perf_counter()
+                item = prepared.get()
+                wait_time += time.perf_counter() - waited
+                if item is _DONE:
+                    break
+
+                month, data, elapsed = item
+                prepare_time += elapsed
+                if isinstance(data, Exception):
+                    raise data
+                if data is None:
+                    logger.warning(f"No data for {self.symbol} {month}")
+                    continue
+
+                simulated = time.perf_counter()
+                self.system.run_trading_cycle(data)
+                simulate_time += time.perf_counter() - simulated
+                bar_times.append(data['close_time'])
+                logger.info(f"{self.symbol} {month} done: balance {self.system.current_balance:.2f}")
+                if self.system.current_balance <= 0:
+                    logger.warning("Account liquidated, stopping the run")
+                    break
+        finally:
+            self._stop.set()
+            producer.join()
+
+        # Metrics cover every simulated month, not only the last one
+        if bar_times:
+            self.system.data = pd.DataFrame({'close_time': pd.concat(bar_times, ignore_index=True)})
+        self.stats = {
+            "months": len(bar_times),
+            "wall_time": time.perf_counter() - started,
+            "prepare_time": prepare_time,
+            "simulate_time": simulate_time,
+            "wait_time": wait_time,
+            "hidden_io_time": max(prepare_time - wait_time, 0.0),
+        }
+        logger.info(f"Pipeline stats: {self.stats}")
+        return self.stats
+
+
+if __name__ == "__main__":
+    runner = PipelinedRunner(
+        "kline_btc",
+        [f"2024-{m:02d}" for m in range(1, 13)],
+        initial_investment=600,
+        stoploss=30,
+    )
+    print(runner.run())
+    runner.system.print_metrics()
@@ -0,0 +1,86 @@
+import heapq
+from loguru import logger
+from incremental import IncrementalStrategy
+from trading_algorithm import TradingSystem, kline_chunks
+
+
+def stream_klines(symbol, start_open_time=None, end_close_time=None, chunksize=10_000):
+    """
+    Yield a symbol's klines one dict at a time, in open_time order.
+
+    Rows come from a server-side cursor `chunksize` at a time, so memory does not
+    grow with the length of the range.
+    """
+    for chunk in kline_chunks(symbol, start_open_time, end_close_time, chunksize):
+        chunk['symbol'] = symbol
+        yield from chunk.to_dict('records')
+
+
+class PortfolioBacktest:
+    """
+    Shared-capital backtest over several kline tables.
+
+    Bars of all symbols are merged on open_time with a k-way heap merge of the
+    per-symbol streams. Each symbol keeps its own IncrementalStrategy and its own
+    book of cycles, while one TradingSystem holds the single balance and the
+    closed trades, so positions in every symbol are sized from the same capital.
+    Memory depends on the number of symbols, not on the length of the range.
+    """
+
+    def __init__(self, symbols, strategy_params=None, chunksize=10_000, **trading_params):
+        if trading_params.get('timeframe') not in (None, "1m", "1min"):
+            # The merged streams and IncrementalStrategy work bar by bar on the 1m klines
+            raise ValueError(f"PortfolioBacktest runs on 1m klines, not timeframe={trading_params['timeframe']!r}")
+        self.symbols = list(symbols)
+        self.chunksize = chunksize
+        self.system = TradingSystem(symbol=",".join(self.symbols), **trading_params)
+        self.strategies = {s: IncrementalStrategy(**(strategy_params or {})) for s in self.symbols}
+        self.books = {s: [] for s in self.symbols}
+        self.bars = {s: 0 for s in self.symbols}
+
+    def run(self):
+        start_open_time, end_close_time = self.system.time_bounds()
+        streams = [stream_klines(s, start_open_time, end_close_time, self.chunksize) for s in self.symbols]
+
+        for bar in heapq.merge(*streams, key=lambda b: b['open_time']):
+            symbol = bar['symbol']
+            self.bars[symbol] += 1
+            row = self.strategies[symbol].update(bar)
+            if row is None:
+                continue  # Indicators still warming up
+            self.system.process_bar(row, self.books[symbol])
+
+        if self.system.trade_log:
+            self.system.trade_log.flush()
+        logger.info(f"Portfolio run over {sum(self.bars.values())} bars: balance {self.system.current_balance:.2f}")
+        return self.summary()
+
+    def summary(self):
+        """Balance of the shared account and realized P&L per symbol."""
+        per_symbol = {s: {"bars": self.bars[s], "trades": 0, "profit_loss": 0.0} for s in self.symbols}
+        for cycle in self.system.trade_cycles:
+            stats = per_symbol[cycle["symbol"]]
+            stats["trades"] += 1
+            stats["profit_loss"] += cycle["profit_loss"]
+        return {
+            "initial_balance": self.system.initial_investment,
+            "final_balance": self.system.current_balance,
+            "symbols": per_symbol,
+        }
+
+    def calculate_metrics(self):
+        """Metrics of the shared account, counting the open cycles of every symbol's book."""
+        open_positions = [c for book in self.books.values() for c in book if "sell_price" not in c]
+        return self.system.calculate_metrics(open_positions)
+
+
+if __name__ == "__main__":
+    portfolio = PortfolioBacktest(
+        ["kline_btc", "kline_eth", "kline_bnb", "kline_ada", "kline_dot"],
+        start="2024-01-01",
+        end="2024-12-31 23:59:59",
+        initial_investment=600,
+        stoploss=30,
+    )
+    print(portfolio.run())
+    print(portfolio.calculate_metrics())
@@ -0,0 +1,189 @@
+"""
+Array-based OHLCV resampling.
+
+Bucket edges come straight from the int64 open_time: origin + k * width. Rows
+are sorted, so one searchsorted of the edges splits them into contiguous
+segments (empty buckets are zero-length ones), and each column is one segment
+reduction (first / np.maximum.reduceat / np.minimum.reduceat /
+last / np.add.reduceat). This does in a few passes what DataFrame.resample
+does through its groupby machinery.
+
+    resample(df, "4h", origin="epoch")   # 4h bars aligned to 00:00 UTC
+    resample(df, "W-SUN")                # weekly bars ending Sunday, as in pandas
+    resample(df, "15min", gaps="ffill", partial="drop")
+
+With the defaults (origin="start_day", gaps="drop", partial="keep") the result is
+the one of the former pandas path in resample_klines.
+"""
+import numpy as np
+import pandas as pd
+from pandas.tseries.frequencies import to_offset
+
+MS = 1_000_000  # ns per millisecond; a kline closes 1 ms before the next one opens
+DAY = 86_400 * 10 ** 9
+WEEKDAYS = ["MON", "TUE", "WED", "THU", "FRI", "SAT", "SUN"]
+EPOCH_MONDAY = 4 * DAY  # 1970-01-05, the first Monday after the epoch
+
+GAP_POLICIES = ("drop", "nan", "ffill")
+PARTIAL_POLICIES = ("keep", "drop")
+
+
+def bucket_width(timeframe):
+    """
+    Width in ns of a fixed `timeframe` ("5min", "4h", "1D", Timedelta), plus the
+    origin of weekly "W"/"W-<DAY>" buckets (None for the others). As in pandas,
+    "W-<DAY>" weeks end on DAY, so they start the day after; "W" is "W-SUN".
+    """
+    if isinstance(timeframe, str) and timeframe.upper().split("-")[0] in ("W", "1W"):
+        day = timeframe.upper().split("-")[1] if "-" in timeframe else "SUN"
+        return 7 * DAY, EPOCH_MONDAY + (WEEKDAYS.index(day) + 1) % 7 * DAY
+    if isinstance(timeframe, pd.Timedelta):
+        return timeframe.value, None
+    return to_offset(timeframe).nanos, None  # Raises ValueError for calendar frequencies
+
+
+def is_fixed(timeframe):
+    """Whether pandas treats `timeframe` as a fixed width; its weeks and months are calendar offsets."""
+    try:
+        return isinstance(timeframe, pd.Timedelta) or to_offset(timeframe).nanos > 0
+    except ValueError:
+        return False
+
+
+def _origin_ns(origin, first_ns, weekly_origin):
+    if weekly_origin is not None:
+        return weekly_origin
+    if origin == "start_day":
+        return first_ns - first_ns % DAY
+    if origin == "epoch":
+        return 0
+    return pd.Timestamp(origin).value
+
+
+def resample(df, timeframe, origin="start_day", offset=None, gaps="drop", partial="keep"):
+    """
+    Aggregate 1m klines (sorted by open_time) into `timeframe` bars.
+
+    origin    "start_day" (midnight of the first kline's day, like pandas), "epoch"
+              or a timestamp; buckets start at origin + offset + k * width. Weekly
+              timeframes hold the pandas weeks ("W-WED" ends on Wednesday, "W" =
+              "W-SUN") from 00:00 UTC; open_time is the first day of the week
+              where pandas labels it with the last one.
+    offset    shifts every bucket start, e.g. "30min" or pd.Timedelta(hours=2)
+    gaps      what a bucket without klines becomes: "drop" it, "nan" prices with
+              zero volume, or "ffill" with the previous close as OHLC and zero volume
+    partial   "keep" or "drop" the last bucket when its klines stop before its end
+    """
+    if gaps not in GAP_POLICIES:
+        raise ValueError(f"gaps must be one of {GAP_POLICIES}")
+    if partial not in PARTIAL_POLICIES:
+        raise ValueError(f"partial must be one of {PARTIAL_POLICIES}")
+    columns = ['open_time', 'open_price', 'high_price', 'low_price', 'close_price', 'volume', 'close_time']
+    if df.empty:
+        return pd.DataFrame({name: df[name] for name in columns}).iloc[:0].reset_index(drop=True)
+
+    # Work in the integer ticks of the time columns (ns or us), converting nothing
+    time_dtype = df['open_time'].dtype
+    open_ticks = df['open_time'].to_numpy(dtype=time_dtype).view("i8")
+    close_ticks = df['close_time'].to_numpy(dtype=time_dtype).view("i8")
+    tick = np.timedelta64(1, np.datetime_data(time_dtype)[0]).astype("timedelta64[ns]").astype(np.int64)
+    width, weekly_origin = bucket_width(timeframe)
+    start = _origin_ns(origin, open_ticks[0] * tick, weekly_origin)
+    if offset is not None:
+        start += pd.Timedelta(offset).value
+    if width % tick or start % tick:
+        raise ValueError(f"{timeframe} buckets do not fall on whole {time_dtype} ticks")
+    width //= tick
+    start //= tick
+
+    # Bucket edges over the covered range; the rows of bucket k are [edge k, edge k + 1)
+    first, last = (open_ticks[[0, -1]] - start) // width
+    every = np.arange(first, last + 1)
+    edges = np.searchsorted(open_ticks, start + np.append(every, last + 1) * width)
+    filled = edges[1:] > edges[:-1]
+    ids = every[filled]
+    starts = edges[:-1][filled]
+    ends = edges[1:][filled] - 1
+
+    bars = {
+        'open_time': start + ids * width,
+        'open_price': df['open_price'].to_numpy(dtype=float)[starts],
+        'high_price': np.maximum.reduceat(df['high_price'].to_numpy(dtype=float), starts),
+        'low_price': np.minimum.reduceat(df['low_price'].to_numpy(dtype=float), starts),
+        'close_price': df['close_price'].to_numpy(dtype=float)[ends],
+        'volume': np.add.reduceat(df['volume'].to_numpy(dtype=float), starts),
+        'close_time': close_ticks[ends],
+    }
+
+    if partial == "drop" and close_ticks[-1] + MS // tick < bars['open_time'][-1] + width:
+        bars = {name: values[:-1] for name, values in bars.items()}
+        ids = ids[:-1]
+
+    if gaps != "drop" and len(ids) and ids[-1] - ids[0] + 1 > len(ids):
+        bars = _fill_gaps(bars, ids, width, MS // tick, gaps)
+
+    bars['open_time'] = bars['open_time'].view(time_dtype)
+    bars['close_time'] = bars['close_time'].view(time_dtype)
+    return pd.DataFrame(bars)
+
+
+def _fill_gaps(bars, ids, width, ms, gaps):
+    """Insert one bar for every empty bucket between the first and last one."""
+    every = np.arange(ids[0], ids[-1] + 1)
+    slot = ids - ids[0]
+    start_ns = bars['open_time'][0] - ids[0] * width
+    filled = {'open_time': start_ns + every * width}
+    # Empty buckets close 1 ms before the next one opens, like a kline
+    filled['close_time'] = filled['open_time'] + width - ms
+    filled['close_time'][slot] = bars['close_time']
+    filled['volume'] = np.zeros(len(every))
+    filled['volume'][slot] = bars['volume']
+
+    if gaps == "nan":
+        for name in ('open_price', 'high_price', 'low_price', 'close_price'):
+            filled[name] = np.full(len(every), np.nan)
+            filled[name][slot] = bars[name]
+    else:
+        # Previous close carried into every price of an empty bucket
+        last = np.zeros(len(every), dtype=np.int64)
+        last[slot] = slot
+        last = np.maximum.accumulate(last)
+        carried = bars['close_price'][np.searchsorted(slot, last)]
+        for name in ('open_price', 'high_price', 'low_price', 'close_price'):
+            filled[name] = carried.copy()
+            filled[name][slot] = bars[name]
+    return {name: filled[name] for name in bars}
+
+
+if __name__ == "__main__":
+    import time
+
+    minutes = pd.date_range("2024-01-01", periods=525_600, freq="1min")
+    rng = np.random.default_rng(0)
+    close = 60_000 * np.exp(np.cumsum(rng.normal(0, 1e-3, len(minutes))))
+    klines = pd.DataFrame({
+        'open_time': minutes,
+        'close_time': minutes + pd.Timedelta(seconds=59, milliseconds=999),
+        'open_price': close, 'high_price': close * 1.001, 'low_price': close * 0.999,
+        'close_price': close, 'volume': rng.random(len(minutes)),
+    })
+    def best_of(func, repeat=5):
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            result = func()
+            timings.append(time.perf_counter() - started)
+        return min(timings), result
+
+    for timeframe in ["5min", "15min", "1h", "4h", "1D"]:
+        pandas_time, expected = best_of(lambda: klines.resample(timeframe, on='open_time').agg({
+            'open_price': 'first', 'high_price': 'max', 'low_price': 'min',
+            'close_price': 'last', 'volume': 'sum', 'close_time': 'last',
+        }).dropna().reset_index())
+        array_time, bars = best_of(lambda: resample(klines, timeframe))
+        expected = expected[bars.columns]
+        # np.add.reduceat sums volume in order, pandas with compensation: equal to the last bits or so
+        same = (bars.drop(columns='volume').equals(expected.drop(columns='volume'))
+                and np.allclose(bars['volume'], expected['volume'], rtol=1e-12, atol=0))
+        print(f"{timeframe:>6}: pandas {pandas_time * 1000:6.1f} ms, arrays {array_time * 1000:5.1f} ms "
+              f"({pandas_time / array_time:4.1f}x), identical: {same}")
@@ -0,0 +1,166 @@
+import glob
+import hashlib
+import json
+import os
+import pickle
+import time
+from loguru import logger
+from sqlalchemy.sql import text
+from connection import engine
+from partitions import partition_fingerprint
+
+_code_version = None
+
+
+def code_version():
+    """
+    Hash of the source of every module in app/, so edits to the rules or the
+    simulation invalidate cached results. Hashing them all, rather than a list of
+    the modules a backtest imports, cannot miss one that is added later.
+    """
+    global _code_version
+    if _code_version is None:
+        digest = hashlib.sha256()
+        here = os.path.dirname(os.path.abspath(__file__))
+        for path in sorted(glob.glob(os.path.join(here, "*.py"))):
+            with open(path, "rb") as file:
+                digest.update(os.path.basename(path).encode() + b"\0" + file.read())
+        _code_version = digest.hexdigest()[:16]
+    return _code_version
+
+
+def data_fingerprint(symbol, start_open_time, end_close_time):
+    """
+    Cheap summary of the klines a run reads. Taken from the kline_partitions rows
+    of the months the range touches when ingestion maintains a row for each of
+    them (one index lookup), otherwise row count, first/last open_time and
+    sums of every price column and the volume over the range, computed by one
+    aggregate query.
+    """
+    fingerprint = partition_fingerprint(symbol, start_open_time, end_close_time)
+    if fingerprint is not None:
+        return fingerprint
+    # Open, high and low drive ATR and support/resistance as much as the close does
+    query = f"""
+    SELECT COUNT(*), MIN(open_time), MAX(open_time), MAX(close_time),
+           SUM(open_price), SUM(high_price), SUM(low_price), SUM(close_price), SUM(volume)
+    FROM {symbol}
+    """
+    filters = []
+    params = {}
+    if start_open_time is not None:
+        filters.append("open_time >= :start_open_time")
+        params["start_open_time"] = start_open_time.to_pydatetime()
+    if end_close_time is not None:
+        filters.append("close_time <= :end_close_time")
+        params["end_close_time"] = end_close_time.to_pydatetime()
+    if filters:
+        query += " WHERE " + " AND ".join(filters)
+    with engine.connect() as connection:
+        row = connection.execute(text(query), params).fetchone()
+    return hashlib.sha256(repr(tuple(row)).encode()).hexdigest()[:16]
+
+
+def cache_key(params, fingerprint):
+    """Content address of a run: parameters + code version + data fingerprint."""
+    canonical = json.dumps({"params": params, "code": code_version(), "data": fingerprint},
+                           sort_keys=True, default=str)
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+class ResultCache:
+    """
+    On-disk store of finished backtest results addressed by cache_key.
+
+    Each entry is one pickle file. Reading an entry refreshes its mtime and writes
+    evict the least recently used entries once the directory exceeds `max_bytes`.
+    """
+
+    def __init__(self, directory="result_cache", max_bytes=1024 ** 3):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.pkl")
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with open(path, "rb") as file:
+                result = pickle.load(file)
+        except (FileNotFoundError, EOFError, pickle.UnpicklingError):
+            self.misses += 1
+            return None
+        os.utime(path)  # Mark as recently used
+        self.hits += 1
+        return result
+
+    def put(self, key, result):
+        path = self._path(key)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as file:
+            pickle.dump(result, file, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+        self.evict()
+
+    def evict(self):
+        """Delete least recently used entries until the cache fits in max_bytes."""
+        entries = [e for e in os.scandir(self.directory) if e.name.endswith(".pkl")]
+        total = sum(e.stat().st_size for e in entries)
+        if total <= self.max_bytes:
+            return
+        for entry in sorted(entries, key=lambda e: e.stat().st_mtime):
+            try:
+                size = entry.stat().st_size
+                os.remove(entry.path)
+            except FileNotFoundError:
+                continue  # Evicted by another process
+            total -= size
+            if total <= self.max_bytes:
+                break
+
+
+def run_key(system_class, params):
+    """(start_open_time, end_close_time, data fingerprint, cache key) of `system_class(**params)`, without running it."""
+    system = system_class(**params, trade_log=False)
+    start_open_time, end_close_time = system.time_bounds()
+    fingerprint = data_fingerprint(system.symbol, start_open_time, end_close_time)
+    key = cache_key({**params, "system": system_class.__name__}, fingerprint)
+    return start_open_time, end_close_time, fingerprint, key
+
+
+def run_cached(system_class, params, cache):
+    """
+    Return the result of `system_class(**params)`, from the cache when the same
+    parameters, code and data were already run.
+
+    The result holds the run_id, the time range and data fingerprint, final
+    balance, metrics and closed trade cycles.
+    """
+    start_open_time, end_close_time, fingerprint, key = run_key(system_class, params)
+    result = cache.get(key)
+    if result is not None:
+        logger.info(f"Result cache hit for {system_class.__name__} {params}")
+        return result
+
+    # Only runs that are actually computed write a trade log (when params give a trade_log_dir)
+    system = system_class(**params)
+    started = time.perf_counter()
+    system.run_trading_cycle()
+    result = {
+        "run_id": system.run_id,
+        "symbol": system.symbol,
+        "start": start_open_time,
+        "end": end_close_time,
+        "fingerprint": fingerprint,
+        "code_version": code_version(),
+        "final_balance": system.current_balance,
+        "metrics": system.calculate_metrics() if system.trade_cycles else {},
+        "trade_cycles": system.trade_cycles,
+        "elapsed": time.perf_counter() - started,
+    }
+    cache.put(key, result)
+    return result
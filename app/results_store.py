@@ -0,0 +1,268 @@
+"""
+Indexed store of backtest and sweep results.
+
+One SQLite file (WAL mode by default, so many processes on one machine can
+append while others query) with two tables:
+
+    runs    one row per run: parameters (JSON), the usual filter columns, headline
+            metrics as real columns, timing, code version and data fingerprint
+    trades  the closed trade cycles of every run, keyed by run_id
+
+The filter columns are indexed, so "top 50 configurations by Sharpe for
+kline_eth in 2024-Q3" is an index range scan even over 100k runs:
+
+    store = ResultsStore("results.db")
+    store.top_runs("kline_eth", "2024-07-01", "2024-10-01", metric="sharpe", limit=50)
+
+WAL needs shared memory between the processes, which a network mount does not
+give; writers on several machines each keep their own file (wal=False) and the
+files are merged into one store afterwards with merge().
+"""
+import json
+import time
+import pandas as pd
+from loguru import logger
+from sqlalchemy import (Column, DateTime, Float, Index, Integer, MetaData, String, Table, Text,
+                        create_engine, event, func, select)
+from sqlalchemy.exc import OperationalError
+from result_cache import data_fingerprint
+from trade_log import TRADE_COLUMNS, trade_row
+
+# runs column -> key of the calculate_metrics dict
+METRIC_COLUMNS = {
+    "net_profit": "Net Profit/Loss",
+    "sharpe": "Sharpe Ratio",
+    "sortino": "Sortino Ratio",
+    "max_drawdown": "Max Drawdown",
+    "win_rate": "Win Rate",
+    "profit_factor": "Profit Factor",
+    "total_trades": "Total Trades",
+}
+
+metadata = MetaData()
+
+runs = Table(
+    "runs", metadata,
+    Column("run_id", String, primary_key=True),
+    Column("symbol", String, nullable=False),
+    Column("engine", String),
+    Column("timeframe", String),
+    Column("start", DateTime),
+    Column("end", DateTime),
+    Column("target_profit", Float),
+    Column("stoploss", Float),
+    Column("params", Text, nullable=False),
+    Column("final_balance", Float),
+    Column("net_profit", Float),
+    Column("sharpe", Float),
+    Column("sortino", Float),
+    Column("max_drawdown", Float),
+    Column("win_rate", Float),
+    Column("profit_factor", Float),
+    Column("total_trades", Integer),
+    Column("metrics", Text),
+    Column("elapsed", Float),
+    Column("code_version", String),
+    Column("data_fingerprint", String),
+    Column("created_at", Float),
+    Index("ix_runs_symbol_range", "symbol", "start", "end"),
+    Index("ix_runs_symbol_sharpe", "symbol", "sharpe"),
+    Index("ix_runs_symbol_final_balance", "symbol", "final_balance"),
+    Index("ix_runs_symbol_net_profit", "symbol", "net_profit"),
+    Index("ix_runs_data_fingerprint", "data_fingerprint"),
+)
+
+trades = Table(
+    "trades", metadata,
+    Column("id", Integer, primary_key=True),
+    *[Column(name, {"string": String, "float": Float, "timestamp": Integer}[kind])
+      for name, kind in TRADE_COLUMNS.items()],  # Times as epoch milliseconds, like the trade log
+    Index("ix_trades_run_id", "run_id"),
+)
+
+# Columns top_runs can rank by
+RANKABLE = {"final_balance", *METRIC_COLUMNS}
+
+
+def _timestamp(value):
+    return None if value is None else pd.Timestamp(value).to_pydatetime()
+
+
+def _float(value):
+    return None if value is None else float(value)
+
+
+def run_row(result):
+    """
+    Flatten a run result (the dict of run_cached / run_task, with "params") into a
+    runs row. Missing fields are stored as NULL.
+    """
+    params = result.get("params", {})
+    metrics = result.get("metrics") or {}
+    row = {
+        "run_id": result["run_id"],
+        "symbol": result.get("symbol") or params.get("symbol"),
+        "engine": params.get("engine", "spot"),
+        "timeframe": params.get("timeframe"),
+        "start": _timestamp(result.get("start") or params.get("start")),
+        "end": _timestamp(result.get("end") or params.get("end")),
+        "target_profit": _float(params.get("target_profit")),
+        "stoploss": _float(params.get("stoploss")),
+        "params": json.dumps(params, sort_keys=True, default=str),
+        "final_balance": _float(result.get("final_balance")),
+        "metrics": json.dumps(metrics, default=str),
+        "elapsed": _float(result.get("elapsed")),
+        "code_version": result.get("code_version"),
+        "data_fingerprint": result.get("fingerprint"),
+        "created_at": time.time(),
+    }
+    for column, key in METRIC_COLUMNS.items():
+        row[column] = _float(metrics.get(key))
+    row["total_trades"] = None if row["total_trades"] is None else int(row["total_trades"])
+    return row
+
+
+class ResultsStore:
+    """
+    Runs and trades of many backtests in one SQLite database.
+
+    `add` buffers results and writes them `batch_size` at a time, each batch in a
+    single transaction with executemany inserts. Processes on one machine can open
+    stores on the same file; WAL lets them commit while others read, and
+    `busy_timeout` makes concurrent writers wait for each other instead of failing.
+    With wal=False the file keeps SQLite's rollback journal, for a store that only
+    one process writes, e.g. on a shared mount.
+    """
+
+    def __init__(self, path="results.db", batch_size=500, busy_timeout_ms=30_000, wal=True):
+        self.path = path
+        self.batch_size = batch_size
+        self.engine = create_engine(f"sqlite:///{path}")
+        self.pending_runs = []
+        self.pending_trades = []
+
+        @event.listens_for(self.engine, "connect")
+        def _configure(dbapi_connection, _):
+            cursor = dbapi_connection.cursor()
+            if wal:
+                cursor.execute("PRAGMA journal_mode=WAL")
+                cursor.execute("PRAGMA synchronous=NORMAL")
+            cursor.execute(f"PRAGMA busy_timeout={int(busy_timeout_ms)}")
+            cursor.close()
+
+        try:
+            metadata.create_all(self.engine)
+        except OperationalError:
+            # Another worker created the tables between the check and the CREATE
+            metadata.create_all(self.engine)
+
+    def add(self, result, trade_cycles=None):
+        """Queue one run (and its trade cycles) for the next batch."""
+        row = run_row(result)
+        self.pending_runs.append(row)
+        for cycle in trade_cycles if trade_cycles is not None else result.get("trade_cycles", []):
+            self.pending_trades.append(trade_row(row["run_id"], row["symbol"], cycle))
+        if len(self.pending_runs) >= self.batch_size:
+            self.flush()
+
+    def add_many(self, results):
+        for result in results:
+            self.add(result)
+        self.flush()
+
+    def flush(self):
+        if not self.pending_runs:
+            return
+        run_ids = [row["run_id"] for row in self.pending_runs]
+        with self.engine.begin() as connection:
+            # A re-run replaces the previous rows of the same run_id
+            connection.execute(trades.delete().where(trades.c.run_id.in_(run_ids)))
+            connection.execute(runs.delete().where(runs.c.run_id.in_(run_ids)))
+            connection.execute(runs.insert(), self.pending_runs)
+            if self.pending_trades:
+                connection.execute(trades.insert(), self.pending_trades)
+        logger.info(f"Stored {len(self.pending_runs)} runs and {len(self.pending_trades)} trades in {self.path}")
+        self.pending_runs = []
+        self.pending_trades = []
+
+    def close(self):
+        self.flush()
+        self.engine.dispose()
+
+    def merge(self, path):
+        """
+        Copy the runs and trades of the store at `path` into this one, replacing
+        runs with the same run_id; returns the number of runs copied.
+        """
+        self.flush()
+        columns = ", ".join(f'"{name}"' for name in TRADE_COLUMNS)
+        with self.engine.connect() as connection:
+            # ATTACH and DETACH are not allowed inside a transaction
+            connection.exec_driver_sql("ATTACH DATABASE ? AS source", (path,))
+            connection.commit()
+            try:
+                with connection.begin():
+                    merged = connection.exec_driver_sql("SELECT COUNT(*) FROM source.runs").scalar()
+                    connection.exec_driver_sql(
+                        "DELETE FROM main.trades WHERE run_id IN (SELECT run_id FROM source.runs)")
+                    connection.exec_driver_sql(
+                        "DELETE FROM main.runs WHERE run_id IN (SELECT run_id FROM source.runs)")
+                    connection.exec_driver_sql("INSERT INTO main.runs SELECT * FROM source.runs")
+                    connection.exec_driver_sql(
+                        f"INSERT INTO main.trades ({columns}) SELECT {columns} FROM source.trades ORDER BY id")
+            finally:
+                connection.exec_driver_sql("DETACH DATABASE source")
+                connection.commit()
+        logger.info(f"Merged {merged} runs from {path} into {self.path}")
+        return merged
+
+    def top_runs(self, symbol, start=None, end=None, metric="sharpe", limit=50, **filters):
+        """
+        Best `limit` runs of `symbol` by `metric` whose backtest range lies inside
+        [start, end]. Extra keyword arguments filter on runs columns by equality,
+        e.g. timeframe="15min" or engine="futures".
+        """
+        if metric not in RANKABLE:
+            raise ValueError(f"Unknown metric {metric!r}, expected one of {sorted(RANKABLE)}")
+        query = select(runs).where(runs.c.symbol == symbol, runs.c[metric].is_not(None))
+        if start is not None:
+            query = query.where(runs.c.start >= _timestamp(start))
+        if end is not None:
+            query = query.where(runs.c.end <= _timestamp(end))
+        for column, value in filters.items():
+            query = query.where(runs.c[column] == value)
+        query = query.order_by(runs.c[metric].desc()).limit(limit)
+        with self.engine.connect() as connection:
+            frame = pd.read_sql_query(query, connection)
+        frame["params"] = frame["params"].map(json.loads)
+        return frame
+
+    def run_trades(self, run_id):
+        """Trade cycles of one run as a DataFrame, times converted back to datetimes."""
+        query = select(trades).where(trades.c.run_id == run_id).order_by(trades.c.id)
+        with self.engine.connect() as connection:
+            frame = pd.read_sql_query(query, connection)
+        for name, kind in TRADE_COLUMNS.items():
+            if kind == "timestamp":
+                frame[name] = pd.to_datetime(frame[name], unit="ms")
+        return frame.drop(columns="id")
+
+    def is_current(self, run_id):
+        """Whether the klines of a stored run are unchanged since it ran (False for unknown runs)."""
+        query = select(runs.c.symbol, runs.c.start, runs.c.end, runs.c.data_fingerprint).where(runs.c.run_id == run_id)
+        with self.engine.connect() as connection:
+            row = connection.execute(query).fetchone()
+        if row is None or row.data_fingerprint is None:
+            return False
+        start, end = (None if value is None else pd.Timestamp(value) for value in (row.start, row.end))
+        return data_fingerprint(row.symbol, start, end) == row.data_fingerprint
+
+    def count(self):
+        with self.engine.connect() as connection:
+            return connection.execute(select(func.count()).select_from(runs)).scalar()
+
+
+if __name__ == "__main__":
+    store = ResultsStore("results.db")
+    top = store.top_runs("kline_eth", "2024-07-01", "2024-10-01", metric="sharpe", limit=50)
+    print(top[["run_id", "timeframe", "target_profit", "stoploss", "sharpe", "final_balance"]])
@@ -33,6 +33,29 @@ class RiskManagementF:
         logger.info(f"Risk: ${self.trade_risk:.2f} ({risk_percent}% of margin)")
         logger.info(f"Liquidation price: {self.liquidation_price:.2f}")
 
+    @staticmethod
+    def price_levels(entry_price, leverage, risk_percent, profit_percent,
+                     fees=0.0002, maintenance_margin=0.004, position_type="LONG"):
+        """
+        Liquidation, stop-loss and take-profit prices without building a position.
+
+        Same formulas as the instance methods, rewritten per unit of entry price so
+        entry_price may be a scalar or a NumPy array and nothing is logged.
+        """
+        direction = 1 if position_type.upper() == "LONG" else -1
+        liquidation_price = entry_price * (1 - direction * (1 / leverage - maintenance_margin))
+        stop_loss_price = entry_price * (1 - direction * (risk_percent / 100) / leverage)
+        take_profit_price = entry_price * (1 + direction * ((profit_percent / 100) / leverage + 2 * fees))
+        return liquidation_price, stop_loss_price, take_profit_price
+
+    @staticmethod
+    def pnl(entry_price, exit_price, position_size, fees=0.0002, position_type="LONG"):
+        """Vectorized counterpart of calculate_pnl (scalars or NumPy arrays)."""
+        direction = 1 if position_type.upper() == "LONG" else -1
+        gross_pnl = direction * (exit_price - entry_price) * position_size
+        fee = (entry_price + exit_price) * position_size * fees
+        return gross_pnl - fee
+
     def _validate_parameters(self):
         """Ensure all parameters are within valid ranges"""
         if self.position_type not in ["LONG", "SHORT"]:
@@ -141,6 +164,18 @@ class RiskManagement:
         self.fees = fees / 100              # Trading fee as a decimal (e.g., 0.1% = 0.001)
         self.profit_or_loss = None          # Will be set when exit condition is triggered
 
+    @staticmethod
+    def exit_levels(priceorder, target_profit, stoploss, atr, fees=0.1):
+        """
+        (ATR-adjusted stop-loss price, ATR-adjusted target price) that stop_loss_exit
+        and target_profit_exit compare the current price against.
+
+        Same arithmetic as the instance methods, for scalars or NumPy arrays, without logging.
+        """
+        stop_loss_price = priceorder - (priceorder * (stoploss / 100))
+        target_price = priceorder * (1 + target_profit / 100) * (1 + fees / 100)
+        return stop_loss_price - (atr * 0.5), target_price + (atr * 0.5)
+
     def calculate_price_from_target(self):
         """  
         Calculates the target price based on the provided target profit.
@@ -0,0 +1,118 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from loguru import logger
+
+
+def _simulate_chunk(args):
+    """
+    Simulate `n_simulations` trade sequences and return (final_balance, max_drawdown, ruined).
+
+    Sequences are built `batch` rows at a time so the working set stays around
+    batch * n_trades floats whatever the chunk size.
+    """
+    pnl, initial_balance, n_simulations, method, ruin_balance, seed, batch = args
+    rng = np.random.default_rng(seed)
+    n_trades = len(pnl)
+    final_balance = np.empty(n_simulations)
+    max_drawdown = np.empty(n_simulations)
+    ruined = np.empty(n_simulations, dtype=bool)
+
+    for lo in range(0, n_simulations, batch):
+        k = min(batch, n_simulations - lo)
+        if method == "bootstrap":
+            paths = pnl[rng.integers(0, n_trades, size=(k, n_trades))]
+        else:
+            paths = rng.permuted(np.broadcast_to(pnl, (k, n_trades)), axis=1)
+
+        equity = np.cumsum(paths, axis=1)
+        equity += initial_balance
+        peak = np.maximum.accumulate(equity, axis=1)
+        np.maximum(peak, initial_balance, out=peak)
+
+        final_balance[lo:lo + k] = equity[:, -1]
+        max_drawdown[lo:lo + k] = ((peak - equity) / peak).max(axis=1)
+        ruined[lo:lo + k] = equity.min(axis=1) <= ruin_balance
+
+    return final_balance, max_drawdown, ruined
+
+
+class MonteCarloAnalysis:
+    """
+    Bootstrap / shuffle robustness analysis over the P&L of closed trades.
+
+    Each simulation replays the run's trade P&L (in dollars) in a new order:
+    "shuffle" permutes the actual trades, "bootstrap" draws them with replacement.
+    The spread of final balance, maximum drawdown and the probability of falling to
+    `ruin_threshold` of the initial balance show how much of the result depends on
+    the order and luck of the trades.
+    """
+
+    def __init__(self, pnl, initial_balance, ruin_threshold=0.5, seed=None):
+        self.pnl = np.asarray(pnl, dtype=float)
+        self.initial_balance = initial_balance
+        self.ruin_threshold = ruin_threshold  # Fraction of the initial balance lost that counts as ruin
+        self.seed = seed
+        self.final_balance = None
+        self.max_drawdown = None
+        self.ruined = None
+
+    @classmethod
+    def from_trading_system(cls, system, **kwargs):
+        """Build the analysis from the closed trades of a TradingSystem run."""
+        pnl = [cycle["profit_loss"] for cycle in system.trade_cycles if cycle.get("profit_loss") is not None]
+        return cls(pnl, system.initial_investment, **kwargs)
+
+    def run(self, n_simulations=10_000, method="shuffle", max_workers=None,
+            chunk_size=20_000, max_batch_bytes=64 * 1024 * 1024):
+        """
+        Run the simulations, splitting them in chunks of `chunk_size` across processes.
+
+        `max_batch_bytes` bounds the size of the equity matrix each worker holds at once.
+        """
+        if method not in ("shuffle", "bootstrap"):
+            raise ValueError("method must be 'shuffle' or 'bootstrap'")
+        if n_simulations < 1:
+            raise ValueError("n_simulations must be at least 1")
+        if self.pnl.size == 0:
+            raise ValueError("No trades to resample.")
+
+        ruin_balance = self.initial_balance * (1 - self.ruin_threshold)
+        batch = max(1, max_batch_bytes // (8 * self.pnl.size * 3))  # paths, equity and peak
+        n_chunks = -(-n_simulations // chunk_size)
+        seeds = np.random.SeedSequence(self.seed).spawn(n_chunks)
+        tasks = [
+            (self.pnl, self.initial_balance, min(chunk_size, n_simulations - c * chunk_size),
+             method, ruin_balance, seeds[c], batch)
+            for c in range(n_chunks)
+        ]
+
+        if n_chunks == 1:
+            results = [_simulate_chunk(tasks[0])]
+        else:
+            workers = min(n_chunks, max_workers or os.cpu_count() or 1)
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                results = list(pool.map(_simulate_chunk, tasks))
+
+        self.final_balance = np.concatenate([r[0] for r in results])
+        self.max_drawdown = np.concatenate([r[1] for r in results])
+        self.ruined = np.concatenate([r[2] for r in results])
+        logger.info(f"Ran {n_simulations} {method} simulations over {self.pnl.size} trades")
+        return self.summary()
+
+    def summary(self, percentiles=(5, 25, 50, 75, 95)):
+        """Distribution of final balance and max drawdown, plus the probability of ruin."""
+        if self.final_balance is None:
+            return {}
+        final_pct = np.percentile(self.final_balance, percentiles)
+        drawdown_pct = np.percentile(self.max_drawdown, percentiles)
+        return {
+            "simulations": int(self.final_balance.size),
+            "trades": int(self.pnl.size),
+            "final_balance_mean": float(self.final_balance.mean()),
+            "final_balance_percentiles": {p: float(v) for p, v in zip(percentiles, final_pct)},
+            "max_drawdown_mean": float(self.max_drawdown.mean()),
+            "max_drawdown_percentiles": {p: float(v) for p, v in zip(percentiles, drawdown_pct)},
+            "probability_of_loss": float((self.final_balance < self.initial_balance).mean()),
+            "probability_of_ruin": float(self.ruined.mean()),
+        }
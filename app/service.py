@@ -0,0 +1,328 @@
+"""
+HTTP service for backtest and sweep jobs.
+
+Run from the app/ directory, e.g. against a local SQLite store:
+
+    DATABASE_URL=sqlite:///klines.db uvicorn service:app
+
+Jobs are queued, executed on a process pool (BACKTEST_WORKERS processes, at most
+MAX_CONCURRENT_JOBS jobs at a time). An identical request submitted while one is
+running joins that job; every run goes through the on-disk ResultCache, whose keys
+include the data fingerprint, so a repeated request over unchanged data skips the
+computation while one over appended or corrected klines is recomputed. A request
+whose every run is already in the cache is answered inline with a finished job
+(200 instead of 202), without waiting for a job slot or a worker. Finished jobs
+can be polled for JOB_RETENTION_SECONDS.
+"""
+import asyncio
+import hashlib
+import json
+import math
+import os
+import time
+import uuid
+from contextlib import asynccontextmanager
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional
+from fastapi import FastAPI, HTTPException, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
+from loguru import logger
+from pydantic import BaseModel
+from futures_engine import FuturesTradingSystem
+from result_cache import ResultCache, run_cached, run_key
+from trading_algorithm import TradingSystem
+from walk_forward import expand_grid, split_params
+
+RESULT_CACHE_DIR = os.getenv("RESULT_CACHE_DIR", "result_cache")
+RESULT_CACHE_BYTES = int(os.getenv("RESULT_CACHE_BYTES", 1024 ** 3))
+BACKTEST_WORKERS = int(os.getenv("BACKTEST_WORKERS", os.cpu_count() or 1))
+MAX_CONCURRENT_JOBS = int(os.getenv("MAX_CONCURRENT_JOBS", 4))
+JOB_RETENTION_SECONDS = float(os.getenv("JOB_RETENTION_SECONDS", 3600))
+
+
+class BacktestRequest(BaseModel):
+    symbol: str
+    month: Optional[str] = None
+    start: Optional[str] = None
+    end: Optional[str] = None
+    timeframe: Optional[str] = None
+    target_profit: float = 5
+    stoploss: float = 30
+    leverage: float = 100
+    fees: float = 0.1
+    initial_investment: float = 100
+    strategy_params: Dict[str, Any] = {}
+    engine: str = "spot"  # "spot" or "futures"
+
+
+class SweepRequest(BaseModel):
+    base: BacktestRequest
+    param_grid: Dict[str, List]  # TradingSystem or Strategy parameter -> values
+
+
+# On-disk result cache of each process, shared through the directory
+_result_cache = None
+
+
+def _open_result_cache():
+    global _result_cache
+    _result_cache = ResultCache(RESULT_CACHE_DIR, max_bytes=RESULT_CACHE_BYTES)
+
+
+def _init_worker():
+    _open_result_cache()
+    # The trading loop logs every bar; keep the service log readable
+    logger.disable("trading_algorithm")
+    logger.disable("risk_management")
+    logger.disable("futures_engine")
+
+
+def _json_safe(value):
+    """Metrics contain inf and Timedelta values the JSON response cannot carry as-is."""
+    if isinstance(value, float) and not math.isfinite(value):
+        return None
+    if isinstance(value, dict):
+        return {k: _json_safe(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_json_safe(v) for v in value]
+    return jsonable_encoder(value)
+
+
+def _system(params):
+    """(system class, TradingSystem parameters) of a request's parameters."""
+    params = dict(params)
+    engine = params.pop("engine", "spot")
+    return (FuturesTradingSystem if engine == "futures" else TradingSystem), params
+
+
+def _summary(result, params, system_class):
+    """JSON-safe summary of a run_cached result."""
+    engine = "futures" if system_class is FuturesTradingSystem else "spot"
+    return _json_safe({
+        "run_id": result["run_id"],
+        "params": {**params, "engine": engine},
+        "final_balance": result["final_balance"],
+        "metrics": result["metrics"],
+        "trades": len(result["trade_cycles"]),
+        "elapsed": result["elapsed"],
+    })
+
+
+def run_backtest(params):
+    """Run one backtest in a worker process and return its JSON-safe result."""
+    system_class, params = _system(params)
+    return _summary(run_cached(system_class, params, _result_cache), params, system_class)
+
+
+def cached_backtests(tasks):
+    """JSON-safe results of `tasks` when the result cache holds every one of them, else None."""
+    results = []
+    for task in tasks:
+        system_class, params = _system(task)
+        result = _result_cache.get(run_key(system_class, params)[-1])
+        if result is None:
+            return None
+        results.append(_summary(result, params, system_class))
+    return results
+
+
+def request_key(kind, payload):
+    """Stable hash of a request, used to deduplicate identical running jobs."""
+    canonical = json.dumps({"kind": kind, "payload": payload}, sort_keys=True, default=str)
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+def job_result(kind, results):
+    """Result of a job from the results of its runs: the run of a backtest, the ranked runs of a sweep."""
+    if kind == "backtest":
+        return results[0]
+    return {"runs": sorted(results, key=lambda r: r["final_balance"], reverse=True)}
+
+
+class Job:
+    def __init__(self, kind, key, total):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.key = key
+        self.status = "queued"
+        self.done = 0
+        self.total = total
+        self.result = None
+        self.error = None
+        self.created = time.time()
+        self.finished = None
+        self.version = 0
+        self.changed = asyncio.Condition()
+
+    def snapshot(self):
+        return {
+            "job_id": self.id,
+            "kind": self.kind,
+            "status": self.status,
+            "progress": {"done": self.done, "total": self.total},
+            "result": self.result,
+            "error": self.error,
+        }
+
+    async def update(self, **fields):
+        async with self.changed:
+            for name, value in fields.items():
+                setattr(self, name, value)
+            self.version += 1
+            self.changed.notify_all()
+
+
+class JobManager:
+    """Queues jobs onto a process pool and tracks their progress until they expire."""
+
+    def __init__(self, workers=BACKTEST_WORKERS, max_concurrent_jobs=MAX_CONCURRENT_JOBS,
+                 retention=JOB_RETENTION_SECONDS):
+        self.workers = workers
+        self.retention = retention
+        self.jobs = {}
+        self.in_flight = {}  # request key -> job id of the job computing it
+        self.slots = asyncio.Semaphore(max_concurrent_jobs)
+        self.pool = None
+
+    def start(self):
+        _open_result_cache()  # Cache hits are answered by the service process itself
+        self.pool = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker)
+
+    def shutdown(self):
+        if self.pool is not None:
+            self.pool.shutdown(wait=False, cancel_futures=True)
+
+    def prune(self):
+        """Forget jobs that finished more than `retention` seconds ago."""
+        expiry = time.time() - self.retention
+        for job_id in [job.id for job in self.jobs.values() if job.finished is not None and job.finished < expiry]:
+            del self.jobs[job_id]
+
+    def submit(self, kind, payload, tasks):
+        """Return the job snapshot for a request, joining the running job of an identical one."""
+        self.prune()
+        key = request_key(kind, payload)
+        if key in self.in_flight:
+            return self.jobs[self.in_flight[key]].snapshot()
+
+        job = Job(kind, key, total=len(tasks))
+        self.jobs[job.id] = job
+        self.in_flight[key] = job.id
+        asyncio.get_running_loop().create_task(self._run(job, tasks))
+        return job.snapshot()
+
+    def finish(self, kind, payload, results):
+        """Record a request answered from the result cache as a finished job and return its snapshot."""
+        self.prune()
+        job = Job(kind, request_key(kind, payload), total=len(results))
+        job.status, job.done, job.result, job.finished = "done", len(results), job_result(kind, results), time.time()
+        self.jobs[job.id] = job
+        return job.snapshot()
+
+    async def _run(self, job, tasks):
+        loop = asyncio.get_running_loop()
+        try:
+            async with self.slots:
+                await job.update(status="running")
+                futures = [loop.run_in_executor(self.pool, run_backtest, task) for task in tasks]
+                results = []
+                for future in asyncio.as_completed(futures):
+                    results.append(await future)
+                    await job.update(done=job.done + 1)
+
+            await job.update(status="done", result=job_result(job.kind, results), finished=time.time())
+        except Exception as e:
+            logger.error(f"Job {job.id} failed: {e}")
+            await job.update(status="failed", error=str(e), finished=time.time())
+        finally:
+            self.in_flight.pop(job.key, None)
+
+
+manager = JobManager()
+
+
+@asynccontextmanager
+async def lifespan(app):
+    manager.start()
+    yield
+    manager.shutdown()
+
+
+app = FastAPI(title="Backtester", lifespan=lifespan)
+
+
+@app.get("/health")
+async def health():
+    return {"status": "ok", "workers": manager.workers, "running": len(manager.in_flight)}
+
+
+async def submit(kind, payload, tasks, response):
+    """Answer from the result cache when it holds every run of the request, else queue a job."""
+    try:
+        # The data fingerprint is a database query; keep it off the event loop
+        results = await asyncio.to_thread(cached_backtests, tasks)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.warning(f"Result cache lookup failed, queueing the {kind}: {e}")
+        results = None
+    if results is not None:
+        response.status_code = 200
+        return manager.finish(kind, payload, results)
+    return manager.submit(kind, payload, tasks)
+
+
+@app.post("/backtests", status_code=202)
+async def create_backtest(request: BacktestRequest, response: Response):
+    payload = jsonable_encoder(request)
+    return await submit("backtest", payload, [payload], response)
+
+
+@app.post("/sweeps", status_code=202)
+async def create_sweep(request: SweepRequest, response: Response):
+    payload = jsonable_encoder(request)
+    base = payload["base"]
+    tasks = []
+    for params in expand_grid(payload["param_grid"]):
+        strategy_params, trading_params = split_params(params)
+        tasks.append({**base, **trading_params,
+                      "strategy_params": {**base["strategy_params"], **strategy_params}})
+    if not tasks:
+        raise HTTPException(status_code=400, detail="Empty parameter grid.")
+    return await submit("sweep", payload, tasks, response)
+
+
+def _find_job(job_id):
+    job = manager.jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found.")
+    return job
+
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    return _find_job(job_id).snapshot()
+
+
+@app.get("/jobs/{job_id}/events")
+async def job_events(job_id: str):
+    """Server-sent events with the job status on every progress change until it finishes."""
+    job = _find_job(job_id)
+
+    async def stream():
+        seen = -1
+        while True:
+            async with job.changed:
+                await job.changed.wait_for(lambda: job.version != seen)
+                seen = job.version
+                snapshot = job.snapshot()
+            finished = snapshot["status"] in ("done", "failed")
+            if not finished:
+                snapshot.pop("result")
+            yield f"event: {snapshot['status']}\ndata: {json.dumps(snapshot)}\n\n"
+            if finished:
+                return
+
+    return StreamingResponse(stream(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache"})
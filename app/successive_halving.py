@@ -0,0 +1,128 @@
+import math
+from concurrent.futures import ProcessPoolExecutor
+import pandas as pd
+from loguru import logger
+from indicators import get_decisions
+from trading_algorithm import TradingSystem, resample_klines
+from walk_forward import _evaluate, _init_worker, expand_grid, split_params, strategy_key
+
+# (share of the range, timeframe) of each rung, cheapest first; None is the 1m data
+DEFAULT_RUNGS = [(0.25, "1h"), (0.5, "15min"), (1.0, None)]
+
+
+class SuccessiveHalving:
+    """
+    Multi-fidelity parameter search over one symbol.
+
+    Every candidate of `param_grid` is first scored on the cheapest rung (the most
+    recent share of [start, end) at a coarse timeframe). Only the best 1/`eta` of
+    them move to the next rung, and so on up to the last rung, normally the full
+    range at 1m. A candidate that sets its own `timeframe` keeps it on every rung.
+
+    The 1m klines are fetched once; each rung resamples them and computes indicators
+    only for the Strategy configurations still in the race, each shared indicator
+    once, and candidates are evaluated on a process pool exactly like
+    WalkForwardOptimizer evaluates folds.
+    """
+
+    def __init__(self, symbol, start, end, param_grid, rungs=None, eta=3, min_candidates=1,
+                 initial_investment=100, objective="net_profit", max_workers=None, quiet=True):
+        self.symbol = symbol
+        self.start = pd.Timestamp(start)
+        self.end = pd.Timestamp(end)
+        self.candidates = expand_grid(param_grid)
+        self.rungs = rungs or DEFAULT_RUNGS
+        self.eta = eta
+        self.min_candidates = min_candidates
+        self.initial_investment = initial_investment
+        self.objective = objective
+        self.max_workers = max_workers
+        self.quiet = quiet
+        self.raw = None
+        self.history = []  # One entry per rung with every score
+        self.bars_evaluated = 0  # Bars simulated over all evaluations, the cost measure
+
+    def load_data(self):
+        loader = TradingSystem(symbol=self.symbol, start=self.start, end=self.end, trade_log=False)
+        self.raw = loader.fetch_data_from_db()
+        if self.raw is None or self.raw.empty:
+            raise ValueError(f"No data for {self.symbol} between {self.start} and {self.end}")
+
+    def evaluate(self, candidates, fraction, timeframe):
+        """Score `candidates` on the last `fraction` of the range at `timeframe`."""
+        range_start = self.end - (self.end - self.start) * fraction
+        requested = []
+        configurations = {}  # timeframe -> {strategy key: Strategy parameters}
+        for params in candidates:
+            strategy_params, trading_params = split_params(params)
+            frame_timeframe = trading_params.pop("timeframe", None) or timeframe
+            key = (frame_timeframe, strategy_key(strategy_params))
+            configurations.setdefault(frame_timeframe, {}).setdefault(key, strategy_params)
+            requested.append((key, trading_params))
+
+        frames = {}
+        for frame_timeframe, strategies in configurations.items():
+            bars = resample_klines(self.raw, frame_timeframe) if frame_timeframe else self.raw
+            for key, frame in zip(strategies, get_decisions(bars, strategies.values())):
+                frames[key] = frame.reset_index(drop=True)
+
+        tasks = []
+        for key, trading_params in requested:
+            open_time = frames[key]['open_time'].to_numpy()
+            lo, hi = open_time.searchsorted([range_start.to_datetime64(), self.end.to_datetime64()])
+            tasks.append((key, int(lo), int(hi), {**trading_params, "symbol": self.symbol,
+                                                  "initial_investment": self.initial_investment}))
+            self.bars_evaluated += int(hi - lo)
+
+        with ProcessPoolExecutor(max_workers=self.max_workers, initializer=_init_worker,
+                                 initargs=(frames, self.quiet)) as pool:
+            return list(pool.map(_evaluate, tasks, chunksize=max(1, len(tasks) // 64)))
+
+    def run(self):
+        """Run every rung and return the surviving candidates with their final scores, best first."""
+        if self.raw is None:
+            self.load_data()
+
+        survivors = list(range(len(self.candidates)))
+        for level, (fraction, timeframe) in enumerate(self.rungs):
+            scores = self.evaluate([self.candidates[c] for c in survivors], fraction, timeframe)
+            ranked = sorted(zip(survivors, scores), key=lambda s: s[1][self.objective], reverse=True)
+            self.history.append({
+                "rung": level,
+                "fraction": fraction,
+                "timeframe": timeframe,
+                "scores": [(self.candidates[c], score) for c, score in ranked],
+            })
+            logger.info(f"Rung {level} ({fraction:.0%} of range, {timeframe or '1m'}): {len(survivors)} candidates, "
+                        f"best {ranked[0][1][self.objective]:.2f} with {self.candidates[ranked[0][0]]}")
+
+            if level < len(self.rungs) - 1:
+                keep = max(self.min_candidates, math.ceil(len(survivors) / self.eta))
+                survivors = [c for c, _ in ranked[:keep]]
+
+        return self.history[-1]["scores"]
+
+    def cost_ratio(self):
+        """Bars simulated by this search relative to a full grid on the last rung."""
+        fraction, timeframe = self.rungs[-1]
+        bars = len(resample_klines(self.raw, timeframe)) if timeframe else len(self.raw)
+        return self.bars_evaluated / (bars * fraction * len(self.candidates))
+
+
+if __name__ == "__main__":
+    search = SuccessiveHalving(
+        symbol="kline_btc",
+        start="2024-01-01",
+        end="2024-07-01",
+        param_grid={
+            "target_profit": [2, 5, 10],
+            "stoploss": [10, 30, 50],
+            "rsi_length": [8, 14, 21],
+            "sma_short_length": [20, 50],
+        },
+        eta=3,
+        initial_investment=600,
+    )
+    best = search.run()
+    print(best[:5])
+    print(f"Cost: {search.cost_ratio():.1%} of the full grid")
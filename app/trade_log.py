@@ -0,0 +1,185 @@
+import glob
+import json
+import os
+from enum import Enum
+import pandas as pd
+from loguru import logger
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # pyarrow is optional, JSONL works without it
+    pa = None
+    pq = None
+
+# Column name -> kind, shared by both formats
+TRADE_COLUMNS = {
+    "run_id": "string",
+    "symbol": "string",
+    "type": "string",
+    "side": "string",
+    "buy_time": "timestamp",
+    "buy_price": "float",
+    "sell_time": "timestamp",
+    "sell_price": "float",
+    "amount_invested": "float",
+    "percentage": "float",
+    "profit_loss": "float",
+    "exit_reason": "string",
+}
+
+if pa is not None:
+    TRADE_SCHEMA = pa.schema([
+        (name, {"string": pa.string(), "float": pa.float64(), "timestamp": pa.timestamp("ms")}[kind])
+        for name, kind in TRADE_COLUMNS.items()
+    ])
+
+
+def _epoch_ms(value):
+    if value is None or (not isinstance(value, str) and pd.isna(value)):
+        return None
+    return pd.Timestamp(value).value // 1_000_000
+
+
+def trade_row(run_id, symbol, cycle):
+    """Flatten a trade cycle dict into a typed row (times as epoch milliseconds)."""
+    signal = cycle.get("type")
+    row = {
+        "run_id": run_id,
+        "symbol": cycle.get("symbol", symbol),
+        "type": signal.name if isinstance(signal, Enum) else signal,
+        "side": cycle.get("side", "LONG"),
+        "exit_reason": cycle.get("exit_reason"),
+    }
+    for name, kind in TRADE_COLUMNS.items():
+        if kind == "timestamp":
+            row[name] = _epoch_ms(cycle.get(name))
+        elif kind == "float":
+            value = cycle.get(name)
+            row[name] = None if value is None else float(value)
+    return row
+
+
+class TradeLogWriter:
+    """
+    Append-only trade log for one run.
+
+    Trades are buffered in memory and flushed every `batch_size` rows, either as
+    one Parquet part per flush under `<directory>/<run_id>/` (needs pyarrow) or as
+    compact JSON lines appended to `<directory>/<run_id>.jsonl`. Nothing is written
+    until the first trade, every flushed part is complete on its own, and a later
+    writer with the same run_id keeps appending instead of overwriting.
+    """
+
+    def __init__(self, run_id, symbol="", directory="trade_logs", format=None, batch_size=1000):
+        self.run_id = run_id
+        self.symbol = symbol
+        self.directory = directory
+        self.format = format or ("parquet" if pa is not None else "jsonl")
+        if self.format == "parquet" and pa is None:
+            raise ImportError("pyarrow is required for the parquet trade log format")
+        self.batch_size = batch_size
+        if self.format == "parquet":
+            self.path = os.path.join(directory, run_id)
+        else:
+            self.path = os.path.join(directory, f"{run_id}.jsonl")
+        self.rows_written = 0
+        self._buffer = []
+
+    def append(self, cycle):
+        """Record one closed trade cycle."""
+        self._buffer.append(trade_row(self.run_id, self.symbol, cycle))
+        if len(self._buffer) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if not self._buffer:
+            return
+        if self.format == "parquet":
+            os.makedirs(self.path, exist_ok=True)
+            columns = {name: [row[name] for row in self._buffer] for name in TRADE_COLUMNS}
+            table = pa.table(columns, schema=TRADE_SCHEMA)
+            part = len(self._parts())
+            part_path = os.path.join(self.path, f"part-{part:05d}.parquet")
+            pq.write_table(table, part_path + ".tmp", compression="zstd")
+            os.replace(part_path + ".tmp", part_path)  # Readers never see a half-written part
+        else:
+            os.makedirs(self.directory, exist_ok=True)
+            with open(self.path, "a") as file:
+                file.writelines(json.dumps(row, separators=(",", ":")) + "\n" for row in self._buffer)
+        self.rows_written += len(self._buffer)
+        self._buffer = []
+
+    def _parts(self):
+        return sorted(glob.glob(os.path.join(self.path, "part-*.parquet")))
+
+    def mark(self):
+        """
+        Flush and return the current end of the log, so a run resumed from a
+        checkpoint can rollback() trades written after the checkpoint was taken.
+        """
+        self.flush()
+        if self.format == "parquet":
+            return self.rows_written, len(self._parts())
+        return self.rows_written, os.path.getsize(self.path) if os.path.exists(self.path) else 0
+
+    def rollback(self, mark):
+        """Drop everything written after `mark` (from mark())."""
+        rows_written, end = mark
+        if self.format == "parquet":
+            for part in self._parts()[end:]:
+                os.remove(part)
+        elif os.path.exists(self.path):
+            with open(self.path, "r+") as file:
+                file.truncate(end)
+        self.rows_written = rows_written
+        self._buffer = []
+
+    def close(self):
+        self.flush()
+        if self.rows_written:
+            logger.info(f"{self.rows_written} trades logged to {self.path}")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _typed(df):
+    """Give a frame read back from either format the TRADE_COLUMNS dtypes."""
+    for name, kind in TRADE_COLUMNS.items():
+        if name not in df:
+            df[name] = None
+        if kind == "timestamp" and not pd.api.types.is_datetime64_any_dtype(df[name]):
+            df[name] = pd.to_datetime(df[name], unit="ms")
+        elif kind == "float":
+            df[name] = df[name].astype(float)
+    return df[list(TRADE_COLUMNS)]
+
+
+def load_trades(directory="trade_logs", run_ids=None):
+    """
+    Load the logged trades of the given runs (all runs by default) into one DataFrame.
+
+    Parquet logs are read as a single dataset, JSONL logs file by file.
+    """
+    if run_ids is None:
+        parquet_files = sorted(glob.glob(os.path.join(directory, "*", "part-*.parquet")))
+        jsonl_files = sorted(glob.glob(os.path.join(directory, "*.jsonl")))
+    else:
+        parquet_files = sorted(p for r in run_ids for p in glob.glob(os.path.join(directory, r, "part-*.parquet")))
+        jsonl_files = [p for p in (os.path.join(directory, f"{r}.jsonl") for r in run_ids) if os.path.exists(p)]
+
+    frames = []
+    if parquet_files:
+        if pq is None:
+            raise ImportError("pyarrow is required to read parquet trade logs")
+        frames.append(pq.ParquetDataset(parquet_files).read().to_pandas())
+    for path in jsonl_files:
+        frames.append(pd.read_json(path, lines=True, dtype=False, convert_dates=False))
+
+    if not frames:
+        return _typed(pd.DataFrame(columns=list(TRADE_COLUMNS)))
+    return _typed(pd.concat(frames, ignore_index=True))
@@ -4,11 +4,76 @@ from calendar import monthrange
 from fastapi import HTTPException
 from indicators import Strategy
 from risk_management import RiskManagement, RiskManagementD
+import numpy as np
 import pandas as pd
 from loguru import logger
 from model import Kline, Kline_BTC, Kline_ETH, Kline_BNB, Kline_ADA, Kline_DOT
 from enum import Enum
-import json
+import uuid
+from metrics import trade_arrays, compute_metrics
+from trade_log import TradeLogWriter
+from resample import is_fixed, resample
+
+
+def kline_query(symbol, start_open_time=None, end_close_time=None):
+    """SQL and bind parameters selecting a symbol's klines in [start_open_time, end_close_time]."""
+    base_query = f"""
+    SELECT open_time, close_time, open_price, high_price, low_price, close_price, volume
+    FROM {symbol}
+    """
+    filters = []
+    params = {}
+    # Plain datetimes bind on every driver (sqlite3 rejects pd.Timestamp)
+    if start_open_time:
+        filters.append("open_time >= :start_open_time")
+        params["start_open_time"] = pd.Timestamp(start_open_time).to_pydatetime()
+    if end_close_time:
+        filters.append("close_time <= :end_close_time")
+        params["end_close_time"] = pd.Timestamp(end_close_time).to_pydatetime()
+    if filters:
+        base_query += " WHERE " + " AND ".join(filters)
+    base_query += " ORDER BY open_time ASC"
+    return base_query, params
+
+
+def kline_chunks(symbol, start_open_time=None, end_close_time=None, chunksize=100_000):
+    """
+    Yield a symbol's klines in open_time order as DataFrames of at most `chunksize`
+    rows, read through a server-side cursor so memory does not grow with the range.
+    """
+    query, params = kline_query(symbol, start_open_time, end_close_time)
+    with engine.connect().execution_options(stream_results=True) as connection:
+        for chunk in pd.read_sql_query(text(query), con=connection, params=params, chunksize=chunksize):
+            chunk['open_time'] = pd.to_datetime(chunk['open_time'])
+            chunk['close_time'] = pd.to_datetime(chunk['close_time'])
+            yield chunk
+
+
+def month_bounds(month):
+    """(start_open_time, end_close_time) of a "YYYY-MM" month; ValueError if malformed."""
+    year, month_num = map(int, month.split("-"))
+    _, last_day = monthrange(year, month_num)
+    start_open_time = pd.Timestamp(f"{year}-{month_num:02d}-01")
+    end_close_time = pd.Timestamp(f"{year}-{month_num:02d}-{last_day} 23:59:59")
+    return start_open_time, end_close_time
+
+
+def resample_klines(df, timeframe):
+    """Aggregate 1m klines into `timeframe` bars (e.g. "5min"), dropping empty buckets."""
+    if is_fixed(timeframe):
+        return resample(df, timeframe)
+    # Calendar frequencies (weeks labelled the pandas way, months) stay on pandas.
+    # Keep 'open_time' and 'close_time' as columns by not setting any index
+    return df.resample(
+        timeframe, on='open_time'
+    ).agg({
+        'open_price': 'first',
+        'high_price': 'max',
+        'low_price': 'min',
+        'close_price': 'last',
+        'volume': 'sum',
+        'close_time': 'last'  # Include the last close_time in each resampled period
+    }).dropna().reset_index()  # Reset index to keep open_time as a column
 
 
 class SignalType(Enum):
@@ -52,6 +117,11 @@ class TradingSystem:
         self.fees = kwargs.get('fees', 0.1)
         self.current_balance = kwargs.get('initial_investment', 100)
         self.timeframe = kwargs.get('timeframe', None)
+        self.start = kwargs.get('start')  # Explicit range, used when no month is given
+        self.end = kwargs.get('end')
+        self.strategy_params = kwargs.get('strategy_params', {})
+        # feature_store.FeatureStore whose precomputed indicators the strategy may use
+        self.feature_store = kwargs.get('feature_store')
         self.balance_availbale = None
         self.initial_investment = self.current_balance
         self.trade_cycles = []
@@ -59,58 +129,44 @@ class TradingSystem:
         self.losses = 0
         self.is_cycle=[]
         self.opportunites={}
-
-    def fetch_data_from_db(self, timeframe=None):
+        self.data = None  # Bars of the last run, used for the equity curve
+        self.run_id = kwargs.get('run_id') or uuid.uuid4().hex
+        # Closed trades are streamed to this sink, a TradeLogWriter under trade_log_dir when one is given
+        self.trade_log = kwargs.get('trade_log')
+        if self.trade_log is None and kwargs.get('trade_log_dir'):
+            self.trade_log = TradeLogWriter(self.run_id, symbol=self.symbol, directory=kwargs['trade_log_dir'])
+
+    def time_bounds(self):
+        """Return (start_open_time, end_close_time) from `month`, or from `start`/`end`."""
         if self.month:
             try:
-                year, month_num = map(int, self.month.split("-"))
-                _, last_day = monthrange(year, month_num)
-                start_open_time = pd.Timestamp(f"{year}-{month_num:02d}-01")
-                end_close_time = pd.Timestamp(f"{year}-{month_num:02d}-{last_day} 23:59:59")
+                return month_bounds(self.month)
             except ValueError:
                 raise HTTPException(status_code=400, detail="Invalid month format. Use YYYY-MM.")
 
-            try:
-                base_query = f"""
-                SELECT open_time, close_time, open_price, high_price, low_price, close_price, volume
-                FROM {self.symbol}
-                """
-                filters = []
-                params = {}
-                if start_open_time:
-                    filters.append("open_time >= :start_open_time")
-                    params["start_open_time"] = start_open_time
-                if end_close_time:
-                    filters.append("close_time <= :end_close_time")
-                    params["end_close_time"] = end_close_time
-                if filters:
-                    base_query += " WHERE " + " AND ".join(filters)
-                base_query += " ORDER BY open_time ASC"
+        try:
+            start_open_time = pd.Timestamp(self.start) if self.start else None
+            end_close_time = pd.Timestamp(self.end) if self.end else None
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid start/end date.")
+        return start_open_time, end_close_time
+
+    def fetch_data_from_db(self, timeframe=None):
+        if self.month or self.start or self.end:
+            start_open_time, end_close_time = self.time_bounds()
 
+            try:
+                base_query, params = kline_query(self.symbol, start_open_time, end_close_time)
                 with engine.connect() as connection:
                     df = pd.read_sql_query(text(base_query), con=connection, params=params)
+                # SQLite hands DATETIME columns back as text
+                df['open_time'] = pd.to_datetime(df['open_time'])
+                df['close_time'] = pd.to_datetime(df['close_time'])
                 # Reset the index so 'open_time' becomes a column
                   # Ensure that open_time is in datetime format and set as index for resampling
 
-                if timeframe:   
-                    # Set open_time as the index for resampling
-
-                    # Resample the data to the desired frequency (e.g., 5T)
-   # Perform the resampling with 'close_time' added as 'last'
-        # Keep 'open_time' and 'close_time' as columns by not setting any index
-                    resampled_df = df.resample(
-                        timeframe, on='open_time'
-                    ).agg({
-                        'open_price': 'first',
-                        'high_price': 'max',
-                        'low_price': 'min',
-                        'close_price': 'last',
-                        'volume': 'sum',
-                        'close_time': 'last'  # Include the last close_time in each resampled period
-                    }).dropna().reset_index()  # Reset index to keep open_time as a column
-
-                    return resampled_df
-
+                if timeframe:
+                    return resample_klines(df, timeframe)
                 else:
                     return df
             except Exception as e:
@@ -118,8 +174,8 @@ class TradingSystem:
 
 
 
-    def run_trading_cycle(self):
-        """Main trading loop using a multi-timeframe approach."""
+    def prepare_data(self):
+        """Fetch the klines for the configured month/timeframe and attach the strategy signals."""
         if self.timeframe:
             data = self.fetch_data_from_db(self.timeframe)
         else: 
@@ -128,99 +184,158 @@ class TradingSystem:
         logger.info(f"1m Data fetched: {data.head(5)}")
         if data.empty:
             logger.error("No data fetched from the database.")
+            return None
+
+        features = self.feature_store.view(self.symbol, self.timeframe) if self.feature_store else None
+        data = Strategy(data, features=features, **self.strategy_params)
+        return data.get_decision()  # Get buy signals
+
+    def run_trading_cycle(self, data=None):
+        """
+        Main trading loop using a multi-timeframe approach.
+
+        `data` may be an already prepared frame (klines with strategy signals), e.g. a
+        slice of a longer range; otherwise it is fetched and prepared here.
+        """
+        if data is None:
+            data = self.prepare_data()
+        if data is None:
             return
-
-        data = Strategy(data)
-        data = data.get_decision()  # Get buy signals
+        self.data = data
 
         for i in range(1, len(data)):
-            current_row = data.iloc[i]
-
-            # 🟢 Step 1: Check for Buy Signal
-            if len(self.is_cycle) != 3 and current_row['Signal'] == 1:
-                signal_name = current_row['type']
-                signal = SignalType[signal_name]  
-                logger.info(f"1m entry signal at {current_row['close_price']} on {current_row['open_time']} with type {signal.value} Threshold")
-                
-                self.price = current_row['close_price']
-                
-                if len(self.is_cycle) == 2:
-                    percentage = SignalType.check_last_signal(self.is_cycle[0]["percentage"], self.is_cycle[1]["percentage"])
-                else:
-                    percentage = signal.investment_percentage()
-
-                amount_invested = self.current_balance * percentage
-                opportunities = {
-                    "type": signal,
-                    "buy_time": current_row['close_time'],
-                    "buy_price": current_row['close_price'],
-                    "profit": signal.value,
-                    "amount_invested": amount_invested,
-                    "percentage": percentage
-                }
-
-                # ✅ Append immediately
-                self.is_cycle.append(opportunities)
-
-            # 🛑 Step 2: Check for Sell Opportunities
-            for cycle in [c for c in self.is_cycle if "sell_price" not in c]:  # 🔥 Boucle uniquement sur les cycles sans vente
-                rm = RiskManagement(
-                    priceorder=cycle.get("buy_price"),
-                    currentprice=current_row['close_price'],
-                    target_profit=cycle.get("profit"),
-                    stoploss=self.stoploss,
-                    dollar_investment=cycle.get("amount_invested"), 
-                    atr=current_row['ATR']
-                )
-
-                if rm.should_exit():
-                    net_profit = rm.profit_or_loss
-                    cycle["sell_price"] = current_row['close_price']
-                    cycle["sell_time"] = current_row['close_time']
-                    cycle["profit_loss"] = net_profit
-
-                    if rm.stop_loss_exit():
-                        logger.info("Exited position based on stop-loss.")
-                    elif rm.target_profit_exit():
-                        logger.info(f"Cycle finished at {current_row['close_price']} on {current_row['close_time']} | Profit: {net_profit}% | Entry: {cycle.get('buy_price')} at {cycle.get('buy_time')}")
-
-                    self.current_balance += net_profit
-                    self.profits += max(0, net_profit)
-                    self.losses += min(0, net_profit)
-                    self.trade_cycles.append(cycle)
-                    logger.info("No sell opportunity found for this sub cycle")
-
-                    if self.current_balance <= 0:
-                        logger.warning("Account liquidated")
-                        break
-                else:
-                    logger.info("No sell opportunity found for this sub cycle")
-
-            # 📌 Step 3: Reset cycle list if it reaches a limit
-            if len(self.is_cycle) == 3:
-                self.is_cycle = []
-
-
-    def calculate_metrics(self):
-        """Calculate the requested performance and risk metrics, and save trade cycles as JSON."""
-        if not self.trade_cycles:
+            self.process_bar(data.iloc[i])
+
+        if self.trade_log:
+            self.trade_log.flush()
+
+
+    def process_bar(self, current_row, book=None):
+        """
+        Run one bar through the entry and exit rules.
+
+        `book` is the list of cycles the bar acts on; it defaults to `self.is_cycle`
+        and lets several books (e.g. one per symbol) share this system's balance.
+        """
+        if book is None:
+            book = self.is_cycle
+
+        # 🟢 Step 1: Check for Buy Signal
+        if len(book) != 3 and current_row['Signal'] == 1:
+            signal_name = current_row['type']
+            signal = SignalType[signal_name]  
+            logger.info(f"1m entry signal at {current_row['close_price']} on {current_row['open_time']} with type {signal.value} Threshold")
+            
+            self.price = current_row['close_price']
+            
+            if len(book) == 2:
+                percentage = SignalType.check_last_signal(book[0]["percentage"], book[1]["percentage"])
+            else:
+                percentage = signal.investment_percentage()
+
+            amount_invested = self.current_balance * percentage
+            opportunities = {
+                "symbol": current_row.get('symbol', self.symbol),
+                "type": signal,
+                "buy_time": current_row['close_time'],
+                "buy_price": current_row['close_price'],
+                "profit": signal.value,
+                "amount_invested": amount_invested,
+                "percentage": percentage
+            }
+
+            # ✅ Append immediately
+            book.append(opportunities)
+
+        # 🛑 Step 2: Check for Sell Opportunities
+        for cycle in [c for c in book if "sell_price" not in c]:  # 🔥 Boucle uniquement sur les cycles sans vente
+            exit_fill = self.check_exit(cycle, current_row)
+
+            if exit_fill:
+                sell_price, sell_time, net_profit = exit_fill
+                cycle["sell_price"] = sell_price
+                cycle["sell_time"] = sell_time
+                cycle["profit_loss"] = net_profit
+
+                self.current_balance += net_profit
+                self.profits += max(0, net_profit)
+                self.losses += min(0, net_profit)
+                self.record_trade(cycle)
+                logger.info("No sell opportunity found for this sub cycle")
+
+                if self.current_balance <= 0:
+                    logger.warning("Account liquidated")
+                    break
+            else:
+                logger.info("No sell opportunity found for this sub cycle")
+
+        # 📌 Step 3: Reset cycle list if it reaches a limit
+        if len(book) == 3:
+            book.clear()
+
+    def check_exit(self, cycle, current_row):
+        """
+        Apply the RiskManagement exits to an open cycle at the bar's close.
+
+        Returns (sell_price, sell_time, profit_loss) when the cycle closes, else None.
+        """
+        rm = RiskManagement(
+            priceorder=cycle.get("buy_price"),
+            currentprice=current_row['close_price'],
+            target_profit=cycle.get("profit"),
+            stoploss=self.stoploss,
+            dollar_investment=cycle.get("amount_invested"), 
+            atr=current_row['ATR']
+        )
+
+        if not rm.should_exit():
+            return None
+
+        net_profit = rm.profit_or_loss
+        if rm.stop_loss_exit():
+            logger.info("Exited position based on stop-loss.")
+        elif rm.target_profit_exit():
+            logger.info(f"Cycle finished at {current_row['close_price']} on {current_row['close_time']} | Profit: {net_profit}% | Entry: {cycle.get('buy_price')} at {cycle.get('buy_time')}")
+        return current_row['close_price'], current_row['close_time'], net_profit
+
+    def record_trade(self, cycle):
+        """Keep a closed trade cycle and append it to the trade log."""
+        self.trade_cycles.append(cycle)
+        if self.trade_log:
+            self.trade_log.append(cycle)
+
+    def open_positions(self):
+        """Cycles entered but not exited yet."""
+        return [cycle for cycle in self.is_cycle if "sell_price" not in cycle]
+
+    def calculate_metrics(self, open_positions=None):
+        """
+        Calculate the performance and risk metrics from the trade and bar arrays,
+        and flush the trade log of this run.
+
+        `open_positions` defaults to the open cycles of `self.is_cycle`; they count
+        as open trades with no realized P&L.
+        """
+        if open_positions is None:
+            open_positions = self.open_positions()
+        if not self.trade_cycles and not open_positions:
             logger.error("No trades to analyze.")
             return {}
 
-        # Define the file path to save the data
-        file_path = "trade_cycles.json"
+        if self.trade_log:
+            self.trade_log.close()
 
-        # Save trade cycles to JSON file
-        try:
-            with open(file_path, "w") as file:
-                json.dump(self.trade_cycles, file, indent=4, default=str)  # Convert timestamps to strings
-            logger.info(f"Trade cycles saved to {file_path}")
-        except Exception as e:
-            logger.error(f"Error saving trade cycles: {e}")
-
-        print(self.current_balance)
+        logger.info(f"Final balance: {self.current_balance:.2f}")
 
-        return {"status": "success", "message": f"Trade cycles saved to {file_path}"}
+        trades = trade_arrays(self.trade_cycles + open_positions)
+        if self.data is not None:
+            bar_time = self.data['close_time'].to_numpy(dtype="datetime64[ns]")
+        else:
+            bar_time = np.sort(trades["sell_time"][~np.isnat(trades["sell_time"])])
+        return compute_metrics(
+            trades["pnl"], trades["buy_time"], trades["sell_time"], bar_time,
+            self.initial_investment, invested=trades["amount_invested"]
+        )
 
 
     def print_metrics(self):
@@ -237,33 +352,36 @@ class TradingSystem:
                     logger.info(trade)
             else:
                 logger.info(f"{key}: {value}")
-balance_total = 0
-monthly_profits=[]
-monthly_losses = []
-trading_params = {
-    "month":"2024-8",
-    "symbol": "kline_btcs",                # Faster RSI for quiter. You shousld move it to the Trash.ck momentum detection
-    "target_profit":0.5,
-    "stoploss": 30,
-    "leverage": 100,
-    "initial_investment": 600,
-    "timeframe": "1min"
-    }
-
-# Create a TradingSystem instance for the current month
-trading_system = TradingSystem(**trading_params)
-
-# Fetch data and run the trading cycle
-trading_system.fetch_data_from_db()  # Ensure data is fetched
-trading_system.run_trading_cycle()
-# Get metrics for the current month
-dm = trading_system.calculate_metrics()
-"""profits = dm["Net Profit"]
-monthly_profits.append(profits)
-losses = dm["Net Loss"]
-monthly_losses.append(losses)
-
-print(monthly_profits)
-print(monthly_losses)
-
-"""
+
+
+if __name__ == "__main__":
+    balance_total = 0
+    monthly_profits=[]
+    monthly_losses = []
+    trading_params = {
+        "month":"2024-8",
+        "symbol": "kline_btcs",                # Faster RSI for quiter. You shousld move it to the Trash.ck momentum detection
+        "target_profit":0.5,
+        "stoploss": 30,
+        "leverage": 100,
+        "initial_investment": 600,
+        "timeframe": "1min"
+        }
+
+    # Create a TradingSystem instance for the current month
+    trading_system = TradingSystem(**trading_params)
+
+    # Fetch data and run the trading cycle
+    trading_system.fetch_data_from_db()  # Ensure data is fetched
+    trading_system.run_trading_cycle()
+    # Get metrics for the current month
+    dm = trading_system.calculate_metrics()
+    """profits = dm["Net Profit"]
+    monthly_profits.append(profits)
+    losses = dm["Net Loss"]
+    monthly_losses.append(losses)
+
+    print(monthly_profits)
+    print(monthly_losses)
+
+    """
@@ -0,0 +1,223 @@
+import inspect
+import itertools
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import pandas as pd
+from loguru import logger
+from checkpoint import CompletedJournal, task_key
+from indicators import Strategy, get_decisions
+from trading_algorithm import TradingSystem
+
+# Parameters consumed by Strategy; everything else in a grid goes to TradingSystem
+STRATEGY_PARAMS = set(inspect.signature(Strategy.__init__).parameters) - {"self", "data"}
+
+# Prepared frames shared with the worker processes, set once per worker by _init_worker
+_FRAMES = {}
+
+
+def expand_grid(param_grid):
+    """Turn {"name": [values, ...]} into the list of every parameter combination."""
+    keys = list(param_grid)
+    return [dict(zip(keys, values)) for values in itertools.product(*(param_grid[k] for k in keys))]
+
+
+def split_params(params):
+    """Split a flat parameter set into (strategy_params, trading_params)."""
+    strategy_params = {k: v for k, v in params.items() if k in STRATEGY_PARAMS}
+    trading_params = {k: v for k, v in params.items() if k not in STRATEGY_PARAMS}
+    return strategy_params, trading_params
+
+
+def strategy_key(strategy_params):
+    """Hashable key identifying one indicator configuration."""
+    return tuple(sorted(strategy_params.items()))
+
+
+def _init_worker(frames, quiet):
+    global _FRAMES
+    _FRAMES = frames
+    if quiet:
+        # The trading loop logs every bar; keep worker output readable
+        logger.disable("trading_algorithm")
+        logger.disable("risk_management")
+
+
+def _evaluate(task):
+    """Run one candidate on rows [lo, hi) of its prepared frame."""
+    key, lo, hi, trading_params = task
+    data = _FRAMES[key].iloc[lo:hi]
+    system = TradingSystem(**trading_params, trade_log=False)
+    if len(data) > 1:
+        system.run_trading_cycle(data=data)
+    return {
+        "final_balance": float(system.current_balance),
+        "net_profit": float(system.current_balance - system.initial_investment),
+        "trades": len(system.trade_cycles),
+    }
+
+
+class WalkForwardOptimizer:
+    """
+    Rolling walk-forward optimization over one symbol.
+
+    The range [start, end) is cut into consecutive folds of `train_days` in-sample
+    followed by `test_days` out-of-sample, rolling forward by `test_days`. Every
+    candidate from `param_grid` is scored on each train window, and the winner of
+    each fold is evaluated on the test window that follows it.
+
+    Klines are fetched once for the whole range and indicators are computed once per
+    distinct Strategy configuration; folds only slice those frames by row index.
+    Train and test evaluations run on a process pool. With a `journal` path every
+    finished evaluation is recorded there, and a restarted run only computes the
+    ones missing from it.
+    """
+
+    def __init__(self, symbol, start, end, param_grid, train_days=60, test_days=30,
+                 timeframe=None, initial_investment=100, objective="net_profit",
+                 max_workers=None, quiet=True, journal=None):
+        self.symbol = symbol
+        self.start = pd.Timestamp(start)
+        self.end = pd.Timestamp(end)
+        self.candidates = expand_grid(param_grid)
+        self.train_days = train_days
+        self.test_days = test_days
+        self.timeframe = timeframe
+        self.initial_investment = initial_investment
+        self.objective = objective
+        self.max_workers = max_workers
+        self.quiet = quiet
+        self.journal = CompletedJournal(journal) if journal else None
+        self.frames = {}
+        self.folds = []
+
+    def load_data(self):
+        """Fetch the klines once and prepare one signal frame per Strategy configuration."""
+        loader = TradingSystem(symbol=self.symbol, start=self.start, end=self.end)
+        raw = loader.fetch_data_from_db(self.timeframe)
+        if raw is None or raw.empty:
+            raise ValueError(f"No data for {self.symbol} between {self.start} and {self.end}")
+
+        configurations = {}
+        for params in self.candidates:
+            strategy_params, _ = split_params(params)
+            configurations.setdefault(strategy_key(strategy_params), strategy_params)
+        frames = get_decisions(raw, configurations.values())
+        for key, frame in zip(configurations, frames):
+            self.frames[key] = frame.reset_index(drop=True)
+        logger.info(f"Prepared {len(self.frames)} indicator configuration(s) over {len(raw)} bars")
+
+    def make_folds(self):
+        """Return the (train_start, train_end, test_start, test_end) timestamps of every fold."""
+        train = pd.Timedelta(days=self.train_days)
+        test = pd.Timedelta(days=self.test_days)
+        folds = []
+        fold_start = self.start
+        while fold_start + train + test <= self.end:
+            train_end = fold_start + train
+            folds.append((fold_start, train_end, train_end, train_end + test))
+            fold_start += test
+        return folds
+
+    def _rows(self, key, start, end):
+        """Row range [lo, hi) of a prepared frame whose open_time falls in [start, end)."""
+        open_time = self.frames[key]['open_time'].to_numpy()
+        lo, hi = open_time.searchsorted([start.to_datetime64(), end.to_datetime64()])
+        return int(lo), int(hi)
+
+    def _task(self, params, start, end):
+        strategy_params, trading_params = split_params(params)
+        key = strategy_key(strategy_params)
+        lo, hi = self._rows(key, start, end)
+        trading_params = {**trading_params, "symbol": self.symbol,
+                          "initial_investment": self.initial_investment}
+        return key, lo, hi, trading_params
+
+    def _evaluate_all(self, pool, tasks):
+        """Results of `tasks` in order, taking finished ones from the journal."""
+        results = [None] * len(tasks)
+        pending = {}
+        for i, task in enumerate(tasks):
+            key = task_key([self.symbol, self.start, self.end, self.timeframe, *task])
+            if self.journal and key in self.journal:
+                results[i] = self.journal.get(key)
+            else:
+                pending[pool.submit(_evaluate, task)] = (i, key)
+        for future in as_completed(pending):
+            i, key = pending[future]
+            results[i] = future.result()
+            if self.journal:
+                self.journal.record(key, results[i])
+        return results
+
+    def run(self):
+        """Optimize every fold and evaluate the winners out of sample."""
+        if not self.frames:
+            self.load_data()
+        folds = self.make_folds()
+        if not folds:
+            raise ValueError("Range too short for a single train/test fold.")
+
+        with ProcessPoolExecutor(max_workers=self.max_workers, initializer=_init_worker,
+                                 initargs=(self.frames, self.quiet)) as pool:
+            # In-sample: every candidate on every fold at once
+            train_tasks = [self._task(params, train_start, train_end)
+                           for train_start, train_end, _, _ in folds
+                           for params in self.candidates]
+            train_results = self._evaluate_all(pool, train_tasks)
+
+            winners = []
+            n = len(self.candidates)
+            for f in range(len(folds)):
+                scores = train_results[f * n:(f + 1) * n]
+                best = max(range(n), key=lambda c: scores[c][self.objective])
+                winners.append((best, scores[best]))
+
+            # Out-of-sample: each fold's winner on the window that follows it
+            test_tasks = [self._task(self.candidates[best], test_start, test_end)
+                          for (_, _, test_start, test_end), (best, _) in zip(folds, winners)]
+            test_results = self._evaluate_all(pool, test_tasks)
+
+        self.folds = []
+        for (train_start, train_end, test_start, test_end), (best, train_score), test_score in zip(folds, winners, test_results):
+            self.folds.append({
+                "train_start": train_start,
+                "train_end": train_end,
+                "test_start": test_start,
+                "test_end": test_end,
+                "best_params": self.candidates[best],
+                "train": train_score,
+                "test": test_score,
+            })
+            logger.info(f"Fold {test_start.date()}..{test_end.date()}: {self.candidates[best]} | "
+                        f"in-sample {train_score[self.objective]:.2f}, out-of-sample {test_score[self.objective]:.2f}")
+        return self.folds
+
+    def summary(self):
+        """Aggregate out-of-sample results across folds."""
+        if not self.folds:
+            return {}
+        test_profits = [fold["test"]["net_profit"] for fold in self.folds]
+        return {
+            "folds": len(self.folds),
+            "out_of_sample_net_profit": sum(test_profits),
+            "profitable_folds": sum(1 for p in test_profits if p > 0),
+            "out_of_sample_trades": sum(fold["test"]["trades"] for fold in self.folds),
+        }
+
+
+if __name__ == "__main__":
+    optimizer = WalkForwardOptimizer(
+        symbol="kline_btc",
+        start="2024-01-01",
+        end="2025-01-01",
+        param_grid={
+            "stoploss": [10, 30],
+            "sma_short_length": [20, 50],
+            "rsi_length": [8, 14],
+        },
+        train_days=60,
+        test_days=30,
+        timeframe="5min",
+        initial_investment=600,
+    )
+    optimizer.run()
+    print(optimizer.summary())
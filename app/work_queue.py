@@ -0,0 +1,330 @@
+"""
+Parameter sweeps distributed over a shared directory.
+
+    <directory>/tasks/<id>.json     one backtest configuration per file
+    <directory>/leases/<id>.lease   held by the worker running the task
+    <directory>/results/<id>.json   written once the task is done
+    <directory>/failures/<id>.json  failed attempts of a task so far
+    <directory>/cache/              ResultCache shared by all workers
+    <directory>/stores/<worker>.db  optional ResultsStore of each worker's runs and trades
+
+Leases are created with O_CREAT | O_EXCL, so exactly one worker gets a task. A
+running worker touches its lease every `heartbeat_interval` seconds; a lease not
+touched for `lease_timeout` seconds belongs to a dead worker and the task goes
+back to the queue. A task that raises goes back to the queue too, and is only
+recorded as failed after `max_attempts` tries. Workers on any machine that
+mounts the directory can join or leave at any time. No broker is involved:
+
+    python work_queue.py sweep_queue 8   # shard the example grid, run 8 local workers
+
+Each worker writes its runs to a store file of its own (SQLite cannot share one
+database between machines over a network mount), and a run is in that file before
+its task is marked done. collect_results() merges the files into one store.
+"""
+import glob
+import json
+import os
+import socket
+import sys
+import threading
+import time
+import uuid
+from multiprocessing import Process
+from loguru import logger
+from checkpoint import task_key
+from futures_engine import FuturesTradingSystem
+from result_cache import ResultCache, run_cached
+from results_store import ResultsStore
+from trading_algorithm import TradingSystem
+from walk_forward import expand_grid, split_params
+
+
+def _write_json(path, payload):
+    """Write JSON atomically so readers never see a partial file."""
+    tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+    with open(tmp_path, "w") as file:
+        json.dump(payload, file, default=str)
+    os.replace(tmp_path, path)
+
+
+def shard_sweep(directory, base, param_grid):
+    """
+    Write one task file per combination of `param_grid` on top of the `base`
+    backtest parameters. Task ids are content hashes, so sharding the same grid
+    twice adds no duplicates. Returns the task ids.
+    """
+    queue = WorkQueue(directory)
+    task_ids = []
+    for params in expand_grid(param_grid):
+        strategy_params, trading_params = split_params(params)
+        task = {**base, **trading_params,
+                "strategy_params": {**base.get("strategy_params", {}), **strategy_params}}
+        task_ids.append(queue.add(task))
+    logger.info(f"{len(task_ids)} tasks in {directory}")
+    return task_ids
+
+
+class WorkQueue:
+    """Task, lease and result files of one sweep directory."""
+
+    def __init__(self, directory, lease_timeout=120.0):
+        self.directory = directory
+        self.lease_timeout = lease_timeout
+        self.tasks_dir = os.path.join(directory, "tasks")
+        self.leases_dir = os.path.join(directory, "leases")
+        self.results_dir = os.path.join(directory, "results")
+        self.failures_dir = os.path.join(directory, "failures")
+        for path in (self.tasks_dir, self.leases_dir, self.results_dir, self.failures_dir):
+            os.makedirs(path, exist_ok=True)
+
+    def _task_path(self, task_id):
+        return os.path.join(self.tasks_dir, f"{task_id}.json")
+
+    def _lease_path(self, task_id):
+        return os.path.join(self.leases_dir, f"{task_id}.lease")
+
+    def _result_path(self, task_id):
+        return os.path.join(self.results_dir, f"{task_id}.json")
+
+    def _failure_path(self, task_id):
+        return os.path.join(self.failures_dir, f"{task_id}.json")
+
+    def add(self, task):
+        task_id = task_key(task)[:20]
+        if not os.path.exists(self._task_path(task_id)):
+            _write_json(self._task_path(task_id), task)
+        return task_id
+
+    def task_ids(self):
+        return sorted(name[:-5] for name in os.listdir(self.tasks_dir) if name.endswith(".json"))
+
+    def is_done(self, task_id):
+        return os.path.exists(self._result_path(task_id))
+
+    def remaining(self):
+        return [task_id for task_id in self.task_ids() if not self.is_done(task_id)]
+
+    def claim(self, worker_id):
+        """Lease the next task nobody holds; returns (task_id, task) or None."""
+        for task_id in self.remaining():
+            try:
+                fd = os.open(self._lease_path(task_id), os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            except FileExistsError:
+                continue  # Another worker holds it
+            with os.fdopen(fd, "w") as file:
+                file.write(worker_id)
+            if self.is_done(task_id):
+                # Finished between the listing and the lease
+                self.release(task_id)
+                continue
+            with open(self._task_path(task_id)) as file:
+                return task_id, json.load(file)
+        return None
+
+    def heartbeat(self, task_id):
+        try:
+            os.utime(self._lease_path(task_id))
+        except FileNotFoundError:
+            pass  # Lease expired and was taken back; the result is still welcome
+
+    def release(self, task_id):
+        try:
+            os.remove(self._lease_path(task_id))
+        except FileNotFoundError:
+            pass
+
+    def complete(self, task_id, result):
+        _write_json(self._result_path(task_id), result)
+        self.release(task_id)
+
+    def fail(self, task_id, task, error, max_attempts=3):
+        """
+        Count a failed attempt of a leased task. The task goes back to the queue
+        until it has failed `max_attempts` times, then gets an error result.
+        Returns whether that happened.
+        """
+        path = self._failure_path(task_id)
+        # Only the lease holder writes the counter, so there is no concurrent update
+        failures = {"errors": []}
+        if os.path.exists(path):
+            with open(path) as file:
+                failures = json.load(file)
+        failures["errors"].append(error)
+        _write_json(path, failures)
+        if len(failures["errors"]) < max_attempts:
+            self.release(task_id)
+            return False
+        self.complete(task_id, {"params": task, "final_balance": float("-inf"), "error": error,
+                                "attempts": len(failures["errors"])})
+        return True
+
+    def requeue_stale(self):
+        """Drop leases whose worker stopped heartbeating; returns how many tasks were requeued."""
+        requeued = 0
+        now = time.time()
+        for name in os.listdir(self.leases_dir):
+            if not name.endswith(".lease"):
+                continue
+            path = os.path.join(self.leases_dir, name)
+            stale_path = f"{path}.{uuid.uuid4().hex}.stale"
+            try:
+                if now - os.stat(path).st_mtime < self.lease_timeout:
+                    continue
+                # Renaming is atomic: only one worker wins the stale lease
+                os.rename(path, stale_path)
+                # The lease may have been requeued and claimed again since the stat
+                fresh = now - os.stat(stale_path).st_mtime < self.lease_timeout
+            except FileNotFoundError:
+                continue
+            if fresh:
+                try:
+                    os.link(stale_path, path)
+                except FileExistsError:
+                    logger.warning(f"Lease of task {name[:-6]} was taken while restoring it; it may run twice")
+                os.remove(stale_path)
+                continue
+            os.remove(stale_path)
+            requeued += 1
+            logger.warning(f"Requeued abandoned task {name[:-6]}")
+        return requeued
+
+    def results(self):
+        """Results of every finished task, best final balance first."""
+        results = []
+        for name in os.listdir(self.results_dir):
+            if name.endswith(".json"):
+                with open(os.path.join(self.results_dir, name)) as file:
+                    results.append(json.load(file))
+        return sorted(results, key=lambda r: r["final_balance"], reverse=True)
+
+    def progress(self):
+        task_ids = self.task_ids()
+        done = sum(1 for task_id in task_ids if self.is_done(task_id))
+        leased = sum(1 for name in os.listdir(self.leases_dir) if name.endswith(".lease"))
+        return {"tasks": len(task_ids), "done": done, "running": leased}
+
+
+def run_task(task, cache, store=None):
+    """
+    Run one task (BacktestRequest-style parameters) through the shared result
+    cache, and queue the run with its trades in `store` when one is given.
+    """
+    params = dict(task)
+    engine = params.pop("engine", "spot")
+    system_class = FuturesTradingSystem if engine == "futures" else TradingSystem
+    result = run_cached(system_class, params, cache)
+    summary = {
+        "run_id": result["run_id"],
+        "params": task,
+        "final_balance": result["final_balance"],
+        "metrics": result["metrics"],
+        "trades": len(result["trade_cycles"]),
+        "elapsed": result["elapsed"],
+    }
+    if store is not None:
+        store.add({**result, "params": task}, result["trade_cycles"])
+    return summary
+
+
+class Worker:
+    """
+    Claims and runs tasks of a WorkQueue until every task has a result.
+
+    While other workers still hold leases it keeps polling, so tasks of workers
+    that die are picked up once their lease goes stale.
+    """
+
+    def __init__(self, directory, worker_id=None, lease_timeout=120.0, heartbeat_interval=10.0,
+                 poll_interval=5.0, max_attempts=3, store_results=False, quiet=True):
+        self.queue = WorkQueue(directory, lease_timeout)
+        self.worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}"
+        self.heartbeat_interval = heartbeat_interval
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts
+        self.cache = ResultCache(os.path.join(directory, "cache"))
+        self.store = None
+        if store_results:
+            stores_dir = os.path.join(directory, "stores")
+            os.makedirs(stores_dir, exist_ok=True)
+            # Only this worker writes the file, so it needs no WAL (which a network mount cannot share)
+            self.store = ResultsStore(os.path.join(stores_dir, f"{self.worker_id}.db"), wal=False)
+        self.completed = 0
+        if quiet:
+            # The trading loop logs every bar; keep worker output readable
+            logger.disable("trading_algorithm")
+            logger.disable("risk_management")
+            logger.disable("futures_engine")
+
+    def _run_with_heartbeat(self, task_id, task):
+        finished = threading.Event()
+
+        def beat():
+            while not finished.wait(self.heartbeat_interval):
+                self.queue.heartbeat(task_id)
+
+        beater = threading.Thread(target=beat, daemon=True)
+        beater.start()
+        try:
+            return run_task(task, self.cache, self.store)
+        finally:
+            finished.set()
+            beater.join()
+
+    def run(self):
+        while True:
+            claimed = self.queue.claim(self.worker_id)
+            if claimed is None:
+                if not self.queue.remaining():
+                    break
+                self.queue.requeue_stale()
+                time.sleep(self.poll_interval)
+                continue
+
+            task_id, task = claimed
+            try:
+                result = self._run_with_heartbeat(task_id, task)
+            except Exception as e:
+                logger.error(f"{self.worker_id}: task {task_id} failed: {e}")
+                if self.queue.fail(task_id, task, str(e), self.max_attempts):
+                    logger.error(f"{self.worker_id}: task {task_id} gave up after {self.max_attempts} attempts")
+                continue
+            if self.store is not None:
+                # The run is stored before the task counts as done
+                self.store.flush()
+            self.queue.complete(task_id, result)
+            self.completed += 1
+            logger.info(f"{self.worker_id}: task {task_id} done ({self.queue.progress()})")
+        if self.store is not None:
+            self.store.close()
+        logger.info(f"{self.worker_id}: no tasks left after {self.completed} completed")
+        return self.completed
+
+
+def run_worker(directory, **kwargs):
+    return Worker(directory, **kwargs).run()
+
+
+def collect_results(directory, results_db="results.db"):
+    """Merge the store files of every worker of `directory` into `results_db`; returns the store."""
+    store = ResultsStore(results_db)
+    for path in sorted(glob.glob(os.path.join(directory, "stores", "*.db"))):
+        store.merge(path)
+    return store
+
+
+if __name__ == "__main__":
+    directory = sys.argv[1] if len(sys.argv) > 1 else "sweep_queue"
+    n_workers = int(sys.argv[2]) if len(sys.argv) > 2 else os.cpu_count() or 1
+    shard_sweep(
+        directory,
+        base={"symbol": "kline_btc", "month": "2024-08", "initial_investment": 600},
+        param_grid={"target_profit": [2, 5, 10], "stoploss": [10, 30], "rsi_length": [8, 14]},
+    )
+    workers = [Process(target=run_worker, args=(directory,), kwargs={"store_results": True})
+               for _ in range(n_workers)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    top = collect_results(directory).top_runs("kline_btc", metric="final_balance", limit=5)
+    print(top[["final_balance", "sharpe", "params"]])
@@ -0,0 +1,43 @@
+"""
+Shared fixtures.
+
+The app modules are imported flat from app/ and connection.py reads DATABASE_URL
+on import, so both are set up here before any test module imports them. Klines are
+synthetic random walks, so no market data is needed.
+"""
+import os
+import sys
+import tempfile
+import numpy as np
+import pandas as pd
+import pytest
+
+DB_DIR = tempfile.mkdtemp(prefix="backtest-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(DB_DIR, 'klines.db')}"
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app"))
+
+
+def random_klines(start, periods, seed=0):
+    """1m klines of a random walk starting at `start`."""
+    rng = np.random.default_rng(seed)
+    open_time = pd.date_range(start, periods=periods, freq="1min")
+    close = 60_000 * np.exp(np.cumsum(rng.normal(0, 1.2e-3, periods)))
+    open_price = np.concatenate(([close[0]], close[:-1]))
+    return pd.DataFrame({
+        'open_time': open_time,
+        'close_time': open_time + pd.Timedelta(seconds=59.999),
+        'open_price': open_price,
+        'high_price': np.maximum(open_price, close) * (1 + np.abs(rng.normal(0, 5e-4, periods))),
+        'low_price': np.minimum(open_price, close) * (1 - np.abs(rng.normal(0, 5e-4, periods))),
+        'close_price': close,
+        'volume': rng.random(periods),
+    })
+
+
+@pytest.fixture(scope="session")
+def kline_table():
+    """Name of a kline table holding July and August 2024."""
+    from connection import engine
+
+    random_klines("2024-07-01", 62 * 24 * 60).to_sql("kline_test", engine, if_exists="replace", index=False)
+    return "kline_test"
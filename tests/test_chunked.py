@@ -0,0 +1,63 @@
+import pandas as pd
+import pytest
+from chunked import ChunkedTradingSystem, warmup_rows
+from refresh import refresh
+from trade_log import load_trades
+from trading_algorithm import TradingSystem
+from test_metrics import assert_metrics_close
+
+
+def test_strategy_backend_is_not_a_warmup_length(kline_table):
+    system = ChunkedTradingSystem(symbol=kline_table, start="2024-07-01", end="2024-07-04",
+                                  chunk_rows=1_000, strategy_params={'backend': "numpy"})
+    assert system.warmup == warmup_rows()
+    system.run_trading_cycle()
+    assert system.bars_read == 3 * 24 * 60
+
+
+@pytest.mark.parametrize("timeframe", [None, "15min"])
+def test_matches_in_memory_run(kline_table, timeframe):
+    params = dict(symbol=kline_table, start="2024-07-01", end="2024-07-15", timeframe=timeframe,
+                  initial_investment=600, stoploss=30, strategy_params={'backend': "numpy"})
+    expected = TradingSystem(**params)
+    expected.run_trading_cycle()
+    chunked = ChunkedTradingSystem(**params, chunk_rows=3_000)
+    chunked.run_trading_cycle()
+
+    assert chunked.chunks > 1
+    assert len(expected.trade_cycles) > 0
+    assert [(c['buy_time'], c['sell_time']) for c in chunked.trade_cycles] == \
+        [(c['buy_time'], c['sell_time']) for c in expected.trade_cycles]
+    assert chunked.current_balance == pytest.approx(expected.current_balance, rel=1e-9)
+    assert_metrics_close(expected.calculate_metrics(), chunked.calculate_metrics())
+
+
+def test_refresh_matches_full_run(kline_table, tmp_path):
+    from connection import engine
+
+    klines = pd.read_sql_table(kline_table, engine)
+    klines = klines[klines['open_time'] < "2024-07-15"]
+    config = dict(symbol="kline_refresh", start="2024-07-01", timeframe="15min", initial_investment=600,
+                  stoploss=30, strategy_params={'backend': "numpy"}, chunk_rows=3_000)
+    klines.iloc[:10_000].to_sql("kline_refresh", engine, if_exists="replace", index=False)
+    first = refresh(config, state_dir=tmp_path, trade_log_dir=tmp_path)
+    klines.iloc[10_000:].to_sql("kline_refresh", engine, if_exists="append", index=False)
+    second = refresh(config, state_dir=tmp_path, trade_log_dir=tmp_path)
+
+    full = ChunkedTradingSystem(**config)
+    full.run_trading_cycle()
+    assert first["new_bars"] + second["new_bars"] == full.bars_read
+    assert second["trades"] == len(full.trade_cycles) > first["trades"]
+    assert second["final_balance"] == pytest.approx(full.current_balance, rel=1e-9)
+    assert_metrics_close(full.calculate_metrics(), second["metrics"])
+
+
+def test_refresh_without_checkpoint_rewrites_the_trade_log(kline_table, tmp_path):
+    config = dict(symbol=kline_table, start="2024-07-01", end="2024-07-08", timeframe="15min",
+                  initial_investment=600, stoploss=30, strategy_params={'backend': "numpy"}, chunk_rows=3_000)
+    logs = tmp_path / "logs"
+    first = refresh(config, state_dir=tmp_path / "state", trade_log_dir=logs)
+    # A lost state_dir runs the whole range again under the same run_id
+    second = refresh(config, state_dir=tmp_path / "wiped", trade_log_dir=logs)
+    assert second["trades"] == first["trades"] > 0
+    assert len(load_trades(logs, [second["run_id"]])) == second["trades"]
@@ -0,0 +1,57 @@
+import numpy as np
+import pytest
+import kernels
+from conftest import random_klines
+from excursion import ExcursionIndex
+from trading_algorithm import TradingSystem
+
+PAIRS = [(0.5, 1.0), (2.0, 3.0), (1.0, 50.0)]
+AMOUNT = 100.0
+
+
+@pytest.fixture(scope="module")
+def data():
+    bars = random_klines("2024-01-01", 3_000, seed=4)
+    bars['ATR'] = kernels.atr(bars['high_price'].to_numpy(), bars['low_price'].to_numpy(),
+                              bars['close_price'].to_numpy(), 14)
+    bars = bars.dropna().reset_index(drop=True)
+    bars['Signal'] = np.nan
+    bars.loc[[1, 300, 800, 1_500, 2_700], 'Signal'] = 1
+    return bars
+
+
+def simulate(data, entry, tp, sl):
+    """Exit of one cycle entered at bar `entry`, checked bar by bar by TradingSystem.check_exit."""
+    system = TradingSystem(symbol="kline_test", stoploss=sl, trade_log=False)
+    cycle = {"buy_price": data['close_price'].iloc[entry], "profit": tp, "amount_invested": AMOUNT}
+    for j in range(entry, len(data)):
+        fill = system.check_exit(cycle, data.iloc[j])
+        if fill:
+            return j, "PROFIT" if fill[2] > 0 else "LOSS", fill[2]
+    return -1, None, 0.0
+
+
+@pytest.fixture(scope="module")
+def index(data):
+    return ExcursionIndex(data, tp_max=2.0, sl_max=50.0).build()
+
+
+@pytest.mark.parametrize("tp, sl", PAIRS)
+def test_exits_match_the_trading_loop(data, index, tp, sl):
+    exit_bar, reason, pnl = index.exits(tp, sl, amount=AMOUNT)
+    expected = [simulate(data, entry, tp, sl) for entry in index.entries]
+    assert list(exit_bar) == [bar for bar, _, _ in expected]
+    assert list(reason) == [why for _, why, _ in expected]
+    np.testing.assert_allclose(pnl, [profit for _, _, profit in expected], rtol=1e-9)
+    assert {"PROFIT", "LOSS"} & set(reason)
+
+
+def test_heatmap_matches_the_trading_loop(data, index):
+    tps, sls = sorted({tp for tp, _ in PAIRS}), sorted({sl for _, sl in PAIRS})
+    maps = index.heatmap(tps, sls, amount=AMOUNT)
+    for tp in tps:
+        for sl in sls:
+            expected = [simulate(data, entry, tp, sl) for entry in index.entries]
+            closed = [profit for bar, _, profit in expected if bar >= 0]
+            assert maps["trades"].loc[tp, sl] == len(closed)
+            assert maps["profit_loss"].loc[tp, sl] == pytest.approx(sum(closed), rel=1e-9, abs=1e-9)
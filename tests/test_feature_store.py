@@ -0,0 +1,40 @@
+import numpy as np
+import pandas as pd
+import pytest
+from feature_store import COLUMNS, FeatureStore
+from indicators import Strategy
+from trading_algorithm import kline_chunks, resample_klines
+
+PARAM_SETS = ({}, {'rsi_length': 7, 'atr_length': 21, 'sma_long_length': 100})
+
+
+@pytest.fixture(scope="module")
+def store(kline_table, tmp_path_factory):
+    store = FeatureStore(tmp_path_factory.mktemp("features"), intervals=["1m", "15min"], param_sets=PARAM_SETS)
+    store.build(kline_table, chunksize=20_000)
+    return store
+
+
+def run_bars(table, start, end, interval):
+    klines = pd.concat(kline_chunks(table, pd.Timestamp(start), pd.Timestamp(end)), ignore_index=True)
+    return klines if interval == "1m" else resample_klines(klines, interval)
+
+
+@pytest.mark.parametrize("interval", ["1m", "15min"])
+@pytest.mark.parametrize("params", PARAM_SETS)
+def test_lookup_matches_a_fresh_computation(store, kline_table, interval, params):
+    bars = run_bars(kline_table, "2024-08-03", "2024-08-10", interval)
+    served = store.view(kline_table, interval).indicators(Strategy(bars, backend="numpy", **params))
+    assert served is not None
+    expected = Strategy(bars.copy(), backend="numpy", **params).calculate_indicators()
+    for name in COLUMNS:
+        np.testing.assert_array_equal(np.isnan(served[name]), expected[name].isna(), err_msg=name)
+        np.testing.assert_allclose(served[name], expected[name], rtol=1e-9, err_msg=name)
+
+
+def test_lookup_misses_unknown_parameters_and_bars(store, kline_table):
+    bars = run_bars(kline_table, "2024-08-03", "2024-08-04", "1m")
+    assert store.lookup(kline_table, "1m", Strategy(None, rsi_length=9).params(), bars) is None
+    assert store.lookup(kline_table, "5min", Strategy(None).params(), bars) is None
+    changed = bars.assign(close_price=bars['close_price'] + 1)
+    assert store.lookup(kline_table, "1m", Strategy(None).params(), changed) is None
@@ -0,0 +1,49 @@
+import numpy as np
+import pandas as pd
+import pytest
+from futures_engine import FuturesTradingSystem
+
+# leverage 10, stoploss 30% of margin: stop 3% away from the entry, liquidation 9.6% away
+PARAMS = dict(symbol="kline_test", leverage=10, stoploss=30, target_profit=50, fees=0.0,
+              initial_investment=1_000, trade_log=False)
+
+
+def bars(prices, side=1):
+    """Bars of (open, high, low, close) with an entry signal on the second bar."""
+    open_time = pd.date_range("2024-01-01", periods=len(prices), freq="1min")
+    data = pd.DataFrame(prices, columns=['open_price', 'high_price', 'low_price', 'close_price'])
+    data['open_time'] = open_time
+    data['close_time'] = open_time + pd.Timedelta(seconds=59.999)
+    data['Signal'] = np.nan
+    data.loc[1, 'Signal'] = side
+    data['type'] = np.where(data['Signal'].notna(), "SIGNAL_1", None)
+    return data
+
+
+def run(data):
+    system = FuturesTradingSystem(**PARAMS)
+    system.run_trading_cycle(data)
+    return system, system.trade_cycles[0]
+
+
+def test_stop_inside_a_bar_fills_at_the_level():
+    _, trade = run(bars([(100, 100, 100, 100), (100, 100, 100, 100), (99, 99.5, 96, 96.5)]))
+    assert trade["exit_reason"] == "LOSS"
+    assert trade["sell_price"] == pytest.approx(97)
+
+
+@pytest.mark.parametrize("side, gap, fill", [(1, (95, 95.5, 94, 95), 95), (-1, (105, 106, 104.5, 105), 105)])
+def test_gap_through_the_stop_fills_at_the_open(side, gap, fill):
+    _, trade = run(bars([(100, 100, 100, 100), (100, 100, 100, 100), gap], side))
+    assert trade["exit_reason"] == "LOSS"
+    assert trade["sell_price"] == fill
+    margin = trade["amount_invested"]
+    assert trade["profit_loss"] == pytest.approx(-margin * 10 * abs(fill - 100) / 100)
+
+
+def test_gap_through_the_liquidation_price_liquidates():
+    system, trade = run(bars([(100, 100, 100, 100), (100, 100, 100, 100), (85, 86, 84, 85)]))
+    assert trade["exit_reason"] == "LIQUIDATION"
+    assert trade["sell_price"] == 85
+    assert trade["profit_loss"] == -trade["amount_invested"]
+    assert system.liquidations == 1
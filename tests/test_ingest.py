@@ -0,0 +1,77 @@
+import re
+import numpy as np
+import pandas as pd
+import pytest
+from sqlalchemy import select
+from conftest import random_klines
+from connection import engine
+from feature_store import COLUMNS, FeatureStore
+from indicators import Strategy
+from ingest import ingest_klines
+from partitions import partitions, rebuild_partitions
+from trading_algorithm import kline_chunks, resample_klines
+
+
+@pytest.fixture
+def symbol(request):
+    """An empty kline table of its own for each test."""
+    partitions.create(engine, checkfirst=True)
+    name = "kline_" + re.sub(r"\W", "_", request.node.name)
+    random_klines("2024-07-01", 1).iloc[:0].to_sql(name, engine, if_exists="replace", index=False)
+    with engine.begin() as connection:
+        connection.execute(partitions.delete().where(partitions.c.table_name == name))
+    return name
+
+
+@pytest.fixture(scope="module")
+def klines():
+    return random_klines("2024-07-29", 4 * 24 * 60, seed=3)
+
+
+def corrections(klines):
+    """A late batch re-sending klines 95-114: 100-109 were never ingested, 96 and 97 changed."""
+    late = klines.iloc[95:115].copy()
+    late.loc[[96, 97], 'close_price'] += 1.0
+    return late
+
+
+def stored_klines(symbol):
+    return pd.concat(kline_chunks(symbol), ignore_index=True)
+
+
+def partition_rows(symbol):
+    query = select(partitions.c.month, partitions.c.row_count, partitions.c.min_open_time,
+                   partitions.c.max_open_time, partitions.c.checksum).where(partitions.c.table_name == symbol)
+    with engine.connect() as connection:
+        return connection.execute(query.order_by(partitions.c.month)).fetchall()
+
+
+def test_late_klines_are_backfilled_and_corrected(symbol, klines):
+    assert ingest_klines(symbol, klines.drop(index=range(100, 110))) == len(klines) - 10
+    late = corrections(klines)
+    assert ingest_klines(symbol, late) == 12
+    assert ingest_klines(symbol, late) == 0  # Re-sent batches change nothing
+
+    expected = klines.copy()
+    expected.loc[late.index] = late
+    pd.testing.assert_frame_equal(stored_klines(symbol).astype(expected.dtypes.to_dict()), expected)
+
+    incremental = partition_rows(symbol)
+    rebuild_partitions(symbol)
+    assert incremental == partition_rows(symbol)
+
+
+@pytest.mark.parametrize("interval", ["1m", "15min"])
+def test_feature_store_is_rebuilt_after_a_correction(symbol, klines, tmp_path, interval):
+    store = FeatureStore(tmp_path, intervals=["1m", "15min"])
+    ingest_klines(symbol, klines.iloc[:3_000], feature_store=store)
+    ingest_klines(symbol, pd.concat([corrections(klines), klines.iloc[3_000:]]), feature_store=store)
+
+    bars = stored_klines(symbol)
+    bars = bars if interval == "1m" else resample_klines(bars, interval)
+    served = store.view(symbol, interval).indicators(Strategy(bars, backend="numpy"))
+    assert served is not None
+    expected = Strategy(bars.copy(), backend="numpy").calculate_indicators()
+    for name in COLUMNS:
+        np.testing.assert_array_equal(np.isnan(served[name]), expected[name].isna(), err_msg=name)
+        np.testing.assert_allclose(served[name], expected[name], rtol=1e-9, err_msg=name)
@@ -0,0 +1,35 @@
+import numpy as np
+import pandas as pd
+import pytest
+from intrabar import IntrabarTradingSystem
+
+# stoploss 3% and no ATR: stop at 97, target far above
+CYCLE = {"buy_price": 100.0, "buy_time": pd.Timestamp("2024-01-01 00:00:59.999"), "profit": 50,
+         "amount_invested": 1_000.0}
+
+
+def exit_of(minutes):
+    """check_exit over one bar made of `minutes` of (open, high, low)."""
+    system = IntrabarTradingSystem(symbol="kline_test", stoploss=3, trade_log=False)
+    system.minute_open, system.minute_high, system.minute_low = (np.array(c, dtype=float) for c in zip(*minutes))
+    system.minute_close_time = pd.date_range("2024-01-01 00:01:59.999", periods=len(minutes), freq="1min").to_numpy()
+    row = pd.Series({
+        "close_time": pd.Timestamp(system.minute_close_time[-1]), "high_price": system.minute_high.max(),
+        "low_price": system.minute_low.min(), "ATR_prev": 0.0, "minute_start": 0, "minute_end": len(minutes),
+    })
+    cycle = dict(CYCLE)
+    return system.check_exit(cycle, row), cycle
+
+
+def test_stop_inside_a_minute_fills_at_the_level():
+    (price, time, profit), cycle = exit_of([(100, 101, 99), (99, 99.5, 96)])
+    assert cycle["exit_reason"] == "LOSS"
+    assert price == pytest.approx(97)
+    assert time == pd.Timestamp("2024-01-01 00:02:59.999")
+
+
+def test_gap_through_the_stop_fills_at_the_open():
+    (price, _, profit), cycle = exit_of([(100, 101, 99), (95, 95.5, 94)])
+    assert cycle["exit_reason"] == "LOSS"
+    assert price == 95
+    assert profit == pytest.approx(-50)
@@ -0,0 +1,126 @@
+import numpy as np
+import pandas as pd
+import pytest
+import kernels
+from conftest import random_klines
+from indicator_graph import BACKENDS, IndicatorGraph
+from indicators import Strategy
+
+
+@pytest.fixture(scope="module")
+def bars():
+    return random_klines("2024-01-01", 5_000, seed=1)
+
+
+def assert_same(expected, actual, rtol=1e-9):
+    """Equal NaN positions and values within `rtol`."""
+    expected = np.asarray(expected, dtype=float)
+    np.testing.assert_array_equal(np.isnan(expected), np.isnan(actual))
+    np.testing.assert_allclose(actual, expected, rtol=rtol)
+
+
+def pandas_rma(values, length):
+    return pd.Series(values).ewm(alpha=1 / length, min_periods=length).mean()
+
+
+def test_rma_matches_ewm(bars):
+    close = bars['close_price'].to_numpy()
+    for length in (2, 14, 200):
+        assert_same(pandas_rma(close, length), kernels.rma(close, length))
+
+
+def test_rma_with_missing_values_matches_ewm(bars):
+    values = bars['close_price'].to_numpy().copy()
+    values[:3] = np.nan
+    values[100:120] = np.nan
+    values[2_000] = np.nan
+    assert_same(pandas_rma(values, 14), kernels.rma(values, 14))
+
+
+def test_rma_continue_matches_one_pass(bars):
+    close = bars['close_price'].to_numpy()
+    parts, state = [], None
+    for batch in np.array_split(close, [1, 10, 700, 701, 3_000]):
+        out, state = kernels.rma_continue(batch, 14, state)
+        parts.append(out)
+    assert_same(kernels.rma(close, 14), np.concatenate(parts))
+
+
+def test_rsi_matches_wilder(bars):
+    close = bars['close_price']
+    delta = close.diff()
+    gain = pandas_rma(delta.clip(lower=0), 14)
+    loss = pandas_rma(delta.clip(upper=0), 14)
+    assert_same(100 * gain / (gain + loss.abs()), kernels.rsi(close.to_numpy(), 14))
+
+
+def test_true_range_and_atr(bars):
+    high, low, close = bars['high_price'], bars['low_price'], bars['close_price']
+    previous = close.shift()
+    expected = pd.concat([high - low, (high - previous).abs(), (previous - low).abs()], axis=1).max(axis=1)
+    expected.iloc[0] = np.nan
+    true_range = kernels.true_range(high.to_numpy(), low.to_numpy(), close.to_numpy())
+    assert_same(expected, true_range)
+    assert_same(pandas_rma(expected, 14), kernels.atr(high.to_numpy(), low.to_numpy(), close.to_numpy(), 14))
+
+
+def test_sma_matches_rolling_mean(bars):
+    close = bars['close_price']
+    for length in (1, 50, 200, 4_999):
+        assert_same(close.rolling(length).mean(), kernels.sma(close.to_numpy(), length))
+
+
+def test_ema_is_seeded_with_the_sma(bars):
+    close = bars['close_price']
+    seeded = close.iloc[49:].copy()
+    seeded.iloc[0] = close.iloc[:50].mean()
+    expected = pd.concat([pd.Series(np.nan, index=close.index[:49]), seeded.ewm(span=50, adjust=False).mean()])
+    assert_same(expected, kernels.ema(close.to_numpy(), 50))
+
+
+def test_rolling_extremes(bars):
+    low, high = bars['low_price'], bars['high_price']
+    for window in (1, 10, 333):
+        assert_same(low.rolling(window).min(), kernels.rolling_min(low.to_numpy(), window), rtol=0)
+        assert_same(high.rolling(window).max(), kernels.rolling_max(high.to_numpy(), window), rtol=0)
+
+
+def test_short_series_are_all_nan():
+    assert np.isnan(kernels.sma(np.arange(5.0), 10)).all()
+    assert np.isnan(kernels.ema(np.arange(5.0), 10)).all()
+    assert np.isnan(kernels.rolling_max(np.arange(5.0), 10)).all()
+
+
+def test_kernels_match_pandas_ta(bars):
+    ta = pytest.importorskip("pandas_ta")
+    high, low, close = bars['high_price'], bars['low_price'], bars['close_price']
+    assert_same(ta.rsi(close, length=14), kernels.rsi(close.to_numpy(), 14))
+    assert_same(ta.atr(high, low, close, length=14), kernels.atr(high.to_numpy(), low.to_numpy(), close.to_numpy(), 14))
+    assert_same(ta.sma(close, length=200), kernels.sma(close.to_numpy(), 200))
+    assert_same(ta.ema(close, length=50), kernels.ema(close.to_numpy(), 50))
+
+
+def test_numpy_backend_matches_pandas_ta_backend(bars):
+    pytest.importorskip("pandas_ta")
+    assert "numpy" in BACKENDS
+    nodes = Strategy(None).indicator_nodes()
+    expected = IndicatorGraph(bars, "pandas_ta").evaluate(nodes)
+    actual = IndicatorGraph(bars, "numpy").evaluate(nodes)
+    for name in nodes:
+        assert_same(expected[name], actual[name])
+
+
+def test_macd_matches_its_definition(bars):
+    close = bars['close_price']
+
+    def seeded_ema(values, length):
+        seeded = values.iloc[length - 1:].copy()
+        seeded.iloc[0] = values.iloc[:length].mean()
+        return seeded.ewm(span=length, adjust=False).mean().reindex(values.index)
+
+    line = seeded_ema(close, 12) - seeded_ema(close, 26)
+    signal = seeded_ema(line.iloc[25:], 9).reindex(close.index)
+    # A difference of two close averages: compare against the price scale, not its own
+    for expected, actual in zip((line, signal), kernels.macd(close.to_numpy(), 12, 26, 9)):
+        np.testing.assert_array_equal(np.isnan(expected), np.isnan(actual))
+        np.testing.assert_allclose(actual, expected, atol=1e-9 * close.max())
@@ -0,0 +1,43 @@
+import numpy as np
+import pandas as pd
+import pytest
+from metrics import MetricsAccumulator, compute_metrics, trade_arrays
+
+
+def assert_metrics_close(expected, actual, rel=1e-9):
+    assert expected.keys() == actual.keys()
+    for name, value in expected.items():
+        if isinstance(value, float):
+            assert actual[name] == pytest.approx(value, rel=rel, abs=1e-12), name
+        else:
+            assert actual[name] == value, name
+
+
+def random_trades(bar_time, seed=0):
+    """Overlapping closed trades and one position still open at the end."""
+    rng = np.random.default_rng(seed)
+    cycles, i = [], 5
+    while i < len(bar_time) - 50:
+        j = i + int(rng.integers(1, 40))
+        cycles.append({"buy_time": bar_time[i], "sell_time": bar_time[j],
+                       "profit_loss": rng.normal(0, 5), "amount_invested": rng.uniform(10, 50)})
+        i = j + int(rng.integers(0, 30)) if rng.random() < 0.5 else i + int(rng.integers(1, 10))
+    return cycles, [{"buy_time": bar_time[-30], "amount_invested": 20.0}]
+
+
+@pytest.mark.parametrize("cuts", [[5_000], [1, 700, 701, 2_500, 5_000], list(range(250, 5_001, 250))])
+def test_accumulator_matches_compute_metrics(cuts):
+    bar_time = pd.date_range("2024-01-01", periods=5_000, freq="1min") + pd.Timedelta(seconds=59.999)
+    cycles, still_open = random_trades(bar_time)
+    trades = trade_arrays(cycles + still_open)
+    expected = compute_metrics(trades["pnl"], trades["buy_time"], trades["sell_time"], bar_time.to_numpy(),
+                               600, invested=trades["amount_invested"])
+
+    accumulator = MetricsAccumulator(600)
+    for start, end in zip([0] + cuts[:-1], cuts):
+        first, last = bar_time[start], bar_time[end - 1]
+        closed = [c for c in cycles if first <= c["sell_time"] <= last]
+        open_positions = [c for c in cycles + still_open
+                          if c["buy_time"] <= last and c.get("sell_time", pd.Timestamp.max) > last]
+        accumulator.update(bar_time[start:end].to_numpy(), closed, open_positions)
+    assert_metrics_close(expected, accumulator.result(still_open))
@@ -0,0 +1,33 @@
+import numpy as np
+import pytest
+from multi_timeframe import MultiTimeframeTradingSystem, timeframe_signals
+from conftest import random_klines
+
+
+@pytest.fixture(scope="module")
+def bars():
+    return random_klines("2024-01-01", 3_000, seed=2)
+
+
+def test_numpy_backend_runs_without_pandas_ta(kline_table):
+    system = MultiTimeframeTradingSystem(symbol=kline_table, month="2024-07", initial_investment=600,
+                                         strategy_params={'backend': "numpy"}, trade_log=False)
+    data = system.prepare_data()
+    assert not data.empty
+    assert not data[['RSI', 'MACD', 'MACD_signal', 'ATR']].isna().any().any()
+    system.run_trading_cycle(data)
+
+
+@pytest.mark.parametrize("role", ["trend", "intraday"])
+def test_numpy_backend_matches_pandas_ta(bars, role):
+    pytest.importorskip("pandas_ta")
+    expected = timeframe_signals(bars.copy(), role, "pandas_ta")
+    actual = timeframe_signals(bars.copy(), role, "numpy")
+    for name in expected.columns.difference(bars.columns):
+        np.testing.assert_allclose(actual[name], expected[name], rtol=1e-9, atol=1e-9 * bars['close_price'].max(),
+                                   err_msg=name)
+
+
+def test_unknown_role(bars):
+    with pytest.raises(ValueError):
+        timeframe_signals(bars.copy(), "scalping")
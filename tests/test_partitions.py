@@ -0,0 +1,50 @@
+import pandas as pd
+import pytest
+from sqlalchemy import select
+from conftest import random_klines
+from connection import engine
+from ingest import ingest_klines
+from partitions import partition_fingerprint, partitions, rebuild_partitions
+
+
+@pytest.fixture
+def symbol(request):
+    """A kline table of its own for each test, holding 2024-07-20 to 2024-08-09 without partition rows."""
+    partitions.create(engine, checkfirst=True)
+    name = f"kline_{request.node.name}"
+    random_klines("2024-07-20", 20 * 24 * 60, seed=5).to_sql(name, engine, if_exists="replace", index=False)
+    with engine.begin() as connection:
+        connection.execute(partitions.delete().where(partitions.c.table_name == name))
+    return name
+
+
+def partition_rows(symbol):
+    query = select(partitions.c.month, partitions.c.row_count, partitions.c.min_open_time,
+                   partitions.c.max_open_time, partitions.c.checksum).where(partitions.c.table_name == symbol)
+    with engine.connect() as connection:
+        return connection.execute(query.order_by(partitions.c.month)).fetchall()
+
+
+def test_first_ingest_of_a_month_covers_its_earlier_klines(symbol):
+    later = random_klines("2024-08-09", 30 * 24 * 60, seed=6).iloc[24 * 60:]
+    for batch in (later.iloc[:1_000], later.iloc[1_000:]):
+        ingest_klines(symbol, batch)
+    incremental = partition_rows(symbol)
+    assert [row.month for row in incremental] == ["2024-08", "2024-09"]
+    rebuild_partitions(symbol)
+    assert partition_rows(symbol)[1:] == incremental
+
+
+def test_fingerprint_needs_every_month_of_the_range(symbol):
+    assert partition_fingerprint(symbol, pd.Timestamp("2024-07-20"), pd.Timestamp("2024-08-05")) is None
+    rebuild_partitions(symbol)
+    fingerprint = partition_fingerprint(symbol, pd.Timestamp("2024-07-20"), pd.Timestamp("2024-08-05"))
+    assert fingerprint is not None
+    # June and September have no row, open ranges are not bounded by rows
+    assert partition_fingerprint(symbol, pd.Timestamp("2024-06-30"), pd.Timestamp("2024-08-05")) is None
+    assert partition_fingerprint(symbol, pd.Timestamp("2024-07-20"), pd.Timestamp("2024-09-01")) is None
+    assert partition_fingerprint(symbol, None, pd.Timestamp("2024-08-05")) is None
+    assert partition_fingerprint(symbol, pd.Timestamp("2024-07-20"), None) is None
+
+    ingest_klines(symbol, random_klines("2024-08-09 23:59", 2, seed=7))
+    assert partition_fingerprint(symbol, pd.Timestamp("2024-07-20"), pd.Timestamp("2024-08-05")) != fingerprint
@@ -0,0 +1,72 @@
+import threading
+import time
+import pandas as pd
+import pytest
+from pipeline import PipelinedRunner
+from trading_algorithm import TradingSystem
+
+MONTHS = ["2024-07", "2024-08"]
+PARAMS = dict(initial_investment=600, stoploss=30, timeframe="15min", strategy_params={'backend': "numpy"})
+
+
+def run_in_thread(runner, timeout=10):
+    """run() on a thread; fails the test instead of hanging when it does not return."""
+    outcome = {}
+
+    def target():
+        try:
+            outcome["stats"] = runner.run()
+        except Exception as e:
+            outcome["error"] = e
+
+    thread = threading.Thread(target=target, daemon=True)
+    thread.start()
+    thread.join(timeout)
+    assert not thread.is_alive(), "PipelinedRunner.run() did not return"
+    return outcome
+
+
+def test_matches_running_the_months_in_turn(kline_table):
+    runner = PipelinedRunner(kline_table, MONTHS, trade_log=False, **PARAMS)
+    stats = run_in_thread(runner)["stats"]
+
+    expected = TradingSystem(symbol=kline_table, trade_log=False, **PARAMS)
+    for month in MONTHS:
+        expected.run_trading_cycle(TradingSystem(symbol=kline_table, month=month, **PARAMS).prepare_data())
+    assert len(runner.system.trade_cycles) == len(expected.trade_cycles) > 0
+    assert runner.system.current_balance == pytest.approx(expected.current_balance, rel=1e-12)
+
+    assert stats["months"] == 2
+    assert stats["prepare_time"] > 0
+    assert stats["hidden_io_time"] == pytest.approx(max(stats["prepare_time"] - stats["wait_time"], 0.0))
+    assert stats["wall_time"] >= stats["simulate_time"] + stats["wait_time"]
+
+
+class StubRunner(PipelinedRunner):
+    """Months prepared instantly, so the producer is always ahead of the consumer."""
+
+    def _prepare(self, month):
+        return pd.DataFrame({'close_time': [pd.Timestamp(f"{month}-01")]})
+
+
+@pytest.mark.parametrize("months", [2, 5])
+def test_consumer_failure_does_not_hang(kline_table, months):
+    runner = StubRunner(kline_table, [f"2024-{m:02d}" for m in range(1, months + 1)], depth=1)
+
+    def fail(data):
+        time.sleep(0.5)  # Lets the producer fill the queue
+        raise RuntimeError("simulation failed")
+
+    runner.system.run_trading_cycle = fail
+    assert isinstance(run_in_thread(runner)["error"], RuntimeError)
+
+
+def test_liquidation_stops_without_hanging(kline_table):
+    runner = StubRunner(kline_table, MONTHS, depth=1)
+
+    def liquidate(data):
+        time.sleep(0.5)
+        runner.system.current_balance = 0
+
+    runner.system.run_trading_cycle = liquidate
+    assert run_in_thread(runner)["stats"]["months"] == 1
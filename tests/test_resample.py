@@ -0,0 +1,110 @@
+import numpy as np
+import pandas as pd
+import pytest
+from conftest import random_klines
+from resample import resample
+
+AGGREGATES = {'open_price': 'first', 'high_price': 'max', 'low_price': 'min',
+              'close_price': 'last', 'volume': 'sum', 'close_time': 'last'}
+
+
+@pytest.fixture(scope="module")
+def klines():
+    """Ten days of 1m klines starting mid-day, with missing minutes and a missing hour."""
+    klines = random_klines("2024-03-04 13:17", 10 * 24 * 60, seed=2)
+    rng = np.random.default_rng(2)
+    missing = rng.choice(len(klines), 500, replace=False)
+    keep = np.ones(len(klines), dtype=bool)
+    keep[missing] = False
+    keep[3_000:3_060] = False
+    return klines[keep].reset_index(drop=True)
+
+
+def pandas_resample(klines, timeframe, **kwargs):
+    return klines.resample(timeframe, on='open_time', **kwargs).agg(AGGREGATES).reset_index()
+
+
+def assert_bars_equal(expected, actual):
+    expected = expected[actual.columns].reset_index(drop=True)
+    # np.add.reduceat sums volume in order, pandas with compensation
+    pd.testing.assert_frame_equal(expected.drop(columns='volume'), actual.drop(columns='volume'),
+                                  check_dtype=False)
+    np.testing.assert_allclose(actual['volume'], expected['volume'], rtol=1e-12)
+
+
+@pytest.mark.parametrize("timeframe", ["1min", "5min", "7min", "15min", "1h", "4h", "1D"])
+def test_matches_pandas_from_start_day(klines, timeframe):
+    assert_bars_equal(pandas_resample(klines, timeframe).dropna(), resample(klines, timeframe))
+
+
+def test_microsecond_times(klines):
+    # Times read back from the database are datetime64[us]
+    klines = klines.astype({'open_time': "datetime64[us]", 'close_time': "datetime64[us]"})
+    bars = resample(klines, "15min")
+    assert bars['open_time'].dtype == "datetime64[us]"
+    assert_bars_equal(pandas_resample(klines, "15min").dropna(), bars)
+
+
+def test_epoch_origin_and_offset(klines):
+    assert_bars_equal(pandas_resample(klines, "7min", origin="epoch").dropna(),
+                      resample(klines, "7min", origin="epoch"))
+    assert_bars_equal(pandas_resample(klines, "1h", offset="30min").dropna(),
+                      resample(klines, "1h", offset="30min"))
+
+
+@pytest.mark.parametrize("timeframe, first_day", [("W-SUN", 0), ("W", 0), ("W-WED", 3), ("W-MON", 1)])
+def test_weekly_buckets_are_the_pandas_weeks(klines, timeframe, first_day):
+    bars = resample(klines, timeframe)
+    assert (bars['open_time'].dt.dayofweek == first_day).all()
+    # pandas labels a week with its last day, the bars with their first
+    expected = pandas_resample(klines, timeframe).dropna()
+    expected['open_time'] -= pd.Timedelta(days=6)
+    assert_bars_equal(expected, bars)
+
+
+def test_gaps_nan(klines):
+    expected = pandas_resample(klines, "15min")
+    bars = resample(klines, "15min", gaps="nan")
+    assert_bars_equal(expected.drop(columns='close_time'), bars.drop(columns='close_time'))
+    empty = expected['close_price'].isna().to_numpy()
+    assert empty.any()
+    np.testing.assert_array_equal(bars['close_time'][~empty], expected['close_time'][~empty])
+    np.testing.assert_array_equal(bars['close_time'][empty],
+                                  bars['open_time'][empty] + pd.Timedelta(minutes=15) - pd.Timedelta(milliseconds=1))
+
+
+def test_gaps_ffill(klines):
+    expected = pandas_resample(klines, "15min")
+    empty = expected['close_price'].isna()
+    carried = expected['close_price'].ffill()
+    for name in ('open_price', 'high_price', 'low_price', 'close_price'):
+        expected[name] = expected[name].fillna(carried)
+    bars = resample(klines, "15min", gaps="ffill")
+    assert_bars_equal(expected.drop(columns='close_time'), bars.drop(columns='close_time'))
+    assert not bars[['open_price', 'close_price']].isna().any().any()
+    assert (bars['volume'][empty.to_numpy()] == 0).all()
+
+
+def test_partial_last_bucket(klines):
+    cut = klines[klines['open_time'] < "2024-03-10 10:05"]
+    kept = resample(cut, "15min")
+    dropped = resample(cut, "15min", partial="drop")
+    assert kept['open_time'].iloc[-1] == pd.Timestamp("2024-03-10 10:00")
+    assert_bars_equal(kept.iloc[:-1], dropped)
+    # A complete last bucket is kept
+    complete = klines[klines['open_time'] < "2024-03-10 10:15"]
+    assert resample(complete, "15min", partial="drop")['open_time'].iloc[-1] == pd.Timestamp("2024-03-10 10:00")
+
+
+def test_empty_frame(klines):
+    bars = resample(klines.iloc[:0], "15min")
+    assert bars.empty
+    assert list(bars.columns) == ['open_time', 'open_price', 'high_price', 'low_price',
+                                  'close_price', 'volume', 'close_time']
+
+
+def test_rejects_bad_policies(klines):
+    with pytest.raises(ValueError):
+        resample(klines, "15min", gaps="zero")
+    with pytest.raises(ValueError):
+        resample(klines, "15min", partial="maybe")
@@ -0,0 +1,31 @@
+import pandas as pd
+import pytest
+from sqlalchemy.sql import text
+from conftest import random_klines
+from connection import engine
+from result_cache import data_fingerprint
+
+
+@pytest.mark.parametrize("column", ["open_price", "high_price", "low_price", "close_price", "volume"])
+def test_fallback_fingerprint_covers_every_column(column):
+    symbol = f"kline_fingerprint_{column}"
+    random_klines("2024-07-01", 3 * 24 * 60, seed=8).to_sql(symbol, engine, if_exists="replace", index=False)
+    start, end = pd.Timestamp("2024-07-01"), pd.Timestamp("2024-07-03")
+    before = data_fingerprint(symbol, start, end)
+    with engine.begin() as connection:
+        connection.execute(text(f"UPDATE {symbol} SET {column} = {column} * 1.01 "
+                                f"WHERE open_time = (SELECT MIN(open_time) FROM {symbol})"))
+    assert data_fingerprint(symbol, start, end) != before
+
+
+def test_code_version_covers_every_module(tmp_path, monkeypatch):
+    import result_cache
+
+    for name in ("result_cache.py", "intrabar.py", "multi_timeframe.py"):
+        (tmp_path / name).write_text(f"# {name}\n")
+    monkeypatch.setattr(result_cache, "__file__", str(tmp_path / "result_cache.py"))
+    monkeypatch.setattr(result_cache, "_code_version", None)
+    before = result_cache.code_version()
+    (tmp_path / "intrabar.py").write_text("# edited\n")
+    monkeypatch.setattr(result_cache, "_code_version", None)
+    assert result_cache.code_version() != before
@@ -0,0 +1,27 @@
+import pandas as pd
+from results_store import ResultsStore
+
+
+def result(run_id, final_balance, trades=1):
+    cycles = [{"buy_time": pd.Timestamp("2024-07-01") + pd.Timedelta(hours=i), "buy_price": 100.0,
+               "sell_time": pd.Timestamp("2024-07-01") + pd.Timedelta(hours=i, minutes=5), "sell_price": 101.0,
+               "profit_loss": 1.0} for i in range(trades)]
+    return {"run_id": run_id, "params": {"symbol": "kline_test", "start": "2024-07-01", "end": "2024-08-01"},
+            "final_balance": final_balance, "metrics": {"Sharpe Ratio": final_balance / 100},
+            "trade_cycles": cycles}
+
+
+def test_merge_replaces_runs_with_the_same_run_id(tmp_path):
+    first = ResultsStore(tmp_path / "first.db", wal=False)
+    first.add_many([result("a", 100, trades=2), result("b", 110)])
+    second = ResultsStore(tmp_path / "second.db", wal=False)
+    second.add_many([result("b", 120, trades=3), result("c", 130)])
+
+    merged = ResultsStore(tmp_path / "merged.db")
+    assert merged.merge(str(tmp_path / "first.db")) == 2
+    assert merged.merge(str(tmp_path / "second.db")) == 2
+    assert merged.count() == 3
+    top = merged.top_runs("kline_test", metric="final_balance")
+    assert list(top["run_id"]) == ["c", "b", "a"]
+    assert len(merged.run_trades("b")) == 3
+    assert len(merged.run_trades("a")) == 2
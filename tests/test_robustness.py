@@ -0,0 +1,18 @@
+import numpy as np
+import pytest
+from robustness import MonteCarloAnalysis
+
+PNL = [12.0, -5.0, 8.0, -20.0, 3.0]
+
+
+def test_shuffle_keeps_the_final_balance():
+    analysis = MonteCarloAnalysis(PNL, 100, seed=0)
+    analysis.run(n_simulations=50, chunk_size=20, max_workers=1)
+    assert analysis.final_balance.shape == (50,)
+    np.testing.assert_allclose(analysis.final_balance, 100 + sum(PNL))
+
+
+@pytest.mark.parametrize("n_simulations", [0, -1])
+def test_no_simulations_is_rejected(n_simulations):
+    with pytest.raises(ValueError, match="n_simulations"):
+        MonteCarloAnalysis(PNL, 100).run(n_simulations=n_simulations)
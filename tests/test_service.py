@@ -0,0 +1,34 @@
+import pytest
+from fastapi.encoders import jsonable_encoder
+from fastapi.testclient import TestClient
+import service
+from result_cache import ResultCache
+from service import BacktestRequest
+
+REQUEST = {"symbol": "kline_test", "start": "2024-07-01", "end": "2024-07-08", "timeframe": "15min",
+           "initial_investment": 600, "strategy_params": {"backend": "numpy", "short_signals": True}}
+
+
+@pytest.fixture
+def client(kline_table, tmp_path, monkeypatch):
+    monkeypatch.setattr(service, "_result_cache", ResultCache(tmp_path / "cache"))
+    monkeypatch.setattr(service, "manager", service.JobManager(workers=1))
+    return TestClient(service.app)  # No lifespan: no process pool is started
+
+
+def test_strategy_params_accept_every_strategy_option():
+    params = {"rsi_length": 9, "backend": "numpy", "short_signals": True}
+    assert BacktestRequest(symbol="kline_test", strategy_params=params).strategy_params == params
+
+
+def test_cached_backtest_is_answered_inline(client):
+    expected = service.run_backtest(jsonable_encoder(BacktestRequest(**REQUEST)))
+
+    response = client.post("/backtests", json=REQUEST)
+    assert response.status_code == 200
+    job = response.json()
+    assert job["status"] == "done"
+    assert job["result"]["run_id"] == expected["run_id"]
+    assert job["result"]["final_balance"] == expected["final_balance"]
+    assert client.get(f"/jobs/{job['job_id']}").json() == job
+    assert not service.manager.in_flight
@@ -0,0 +1,32 @@
+import pytest
+from successive_halving import SuccessiveHalving
+
+GRID = {"target_profit": [2, 5, 10], "stoploss": [10, 30], "rsi_length": [8, 14], "backend": ["numpy"]}
+RUNGS = [(0.25, "1h"), (0.5, "30min"), (1.0, "15min")]
+
+
+@pytest.fixture(scope="module")
+def search(kline_table):
+    search = SuccessiveHalving(kline_table, "2024-07-01", "2024-09-01", GRID, rungs=RUNGS, eta=3,
+                               initial_investment=600, max_workers=2)
+    return search, search.run()
+
+
+def test_finds_the_best_configuration_of_the_full_grid(search, kline_table):
+    exhaustive = SuccessiveHalving(kline_table, "2024-07-01", "2024-09-01", GRID, rungs=RUNGS,
+                                   initial_investment=600, max_workers=2)
+    exhaustive.load_data()
+    scores = exhaustive.evaluate(exhaustive.candidates, *RUNGS[-1])
+    best = max(score["net_profit"] for score in scores)
+    winners = [params for params, score in zip(exhaustive.candidates, scores) if score["net_profit"] == best]
+
+    params, score = search[1][0]
+    assert score["net_profit"] == pytest.approx(best)
+    assert params in winners
+    assert len(set(score["net_profit"] for score in scores)) > 1  # The grid is not trivially flat
+
+
+def test_costs_a_fraction_of_the_full_grid(search):
+    search, _ = search
+    assert [len(rung["scores"]) for rung in search.history] == [12, 4, 2]
+    assert search.cost_ratio() < 1
@@ -0,0 +1,73 @@
+import os
+import time
+from results_store import ResultsStore
+from work_queue import Worker, WorkQueue, collect_results, shard_sweep
+
+
+def test_failed_task_is_retried_before_it_gets_an_error_result(tmp_path):
+    queue = WorkQueue(tmp_path)
+    task_id = queue.add({"symbol": "kline_test"})
+    for attempt in range(1, 3):
+        claimed_id, task = queue.claim("worker")
+        assert claimed_id == task_id
+        assert not queue.fail(task_id, task, f"error {attempt}", max_attempts=3)
+        assert not queue.is_done(task_id)
+    _, task = queue.claim("worker")
+    assert queue.fail(task_id, task, "error 3", max_attempts=3)
+    assert queue.results()[0]["attempts"] == 3
+    assert queue.claim("worker") is None
+
+
+def test_requeue_stale_drops_only_stale_leases(tmp_path):
+    queue = WorkQueue(tmp_path, lease_timeout=60)
+    stale_id = queue.add({"symbol": "a"})
+    fresh_id = queue.add({"symbol": "b"})
+    queue.claim("worker")
+    queue.claim("worker")
+    old = time.time() - 120
+    os.utime(queue._lease_path(stale_id), (old, old))
+    assert queue.requeue_stale() == 1
+    assert not os.path.exists(queue._lease_path(stale_id))
+    assert os.path.exists(queue._lease_path(fresh_id))
+    assert os.listdir(queue.leases_dir) == [f"{fresh_id}.lease"]
+
+
+def test_requeue_stale_restores_a_lease_claimed_again_after_the_stat(tmp_path, monkeypatch):
+    queue = WorkQueue(tmp_path, lease_timeout=60)
+    task_id = queue.add({"symbol": "a"})
+    queue.claim("dead worker")
+    path = queue._lease_path(task_id)
+    old = time.time() - 120
+    os.utime(path, (old, old))
+
+    rename = os.rename
+
+    def reclaimed_before_rename(source, target):
+        # Another worker requeues the stale lease and a third one claims the task
+        os.remove(source)
+        queue.claim("new worker")
+        rename(source, target)
+
+    monkeypatch.setattr(os, "rename", reclaimed_before_rename)
+    assert queue.requeue_stale() == 0
+    with open(path) as file:
+        assert file.read() == "new worker"
+    assert os.listdir(queue.leases_dir) == [f"{task_id}.lease"]
+
+
+def test_workers_store_runs_before_completing_and_merge(kline_table, tmp_path, monkeypatch):
+    shard_sweep(tmp_path, base={"symbol": kline_table, "month": "2024-07", "timeframe": "1h",
+                                "strategy_params": {"backend": "numpy"}},
+                param_grid={"stoploss": [10, 30]})
+    worker = Worker(tmp_path, worker_id="worker-1", poll_interval=0, store_results=True)
+    complete = worker.queue.complete
+
+    def complete_after_store(task_id, result):
+        assert result["run_id"] in set(ResultsStore(worker.store.path, wal=False).top_runs(
+            kline_table, metric="final_balance")["run_id"])
+        complete(task_id, result)
+
+    monkeypatch.setattr(worker.queue, "complete", complete_after_store)
+    assert worker.run() == 2
+    store = collect_results(tmp_path, tmp_path / "results.db")
+    assert store.count() == 2